@@ -0,0 +1,125 @@
+"""
+Compare smart HTTP throughput of the ASGI app against the quart helpers,
+both apps are called in-process so only the server side overhead is measured.
+
+    python benchmarks/smart_http.py /path/to/repo.git --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import subprocess
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from quart import Quart, request
+
+from git_interface.pack import UPLOAD_PACK_TYPE
+from git_interface.pkt_line import FLUSH_PKT, encode_pkt_line
+from git_interface.smart_http.asgi import SmartHTTPApp, resolve_from_root
+from git_interface.smart_http.quart import get_info_refs_response, post_pack_response
+
+
+def create_quart_app(repo_path: Path) -> Quart:
+    app = Quart(__name__)
+    app.config["BODY_TIMEOUT"] = 60
+
+    @app.get(f"/{repo_path.name}/info/refs")
+    async def info_refs():
+        return await get_info_refs_response(repo_path, request.args["service"])
+
+    @app.post(f"/{repo_path.name}/<pack_type>")
+    async def exchange(pack_type: str):
+        return await post_pack_response(repo_path, pack_type)
+
+    return app
+
+
+async def call_asgi(app: Callable, method: str, path: str, query_string: bytes, body: bytes) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string,
+        "headers": [(b"host", b"localhost"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    received = 0
+    done = asyncio.Event()
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received
+        received += len(message.get("body", b""))
+        if message["type"] == "http.response.body" and not message.get("more_body"):
+            done.set()
+
+    await app(scope, receive, send)
+    return received
+
+
+async def run(app: Callable, repo_path: Path, requests: int, concurrency: int) -> tuple[float, int]:
+    head = subprocess.check_output(
+        ["git", "-C", str(repo_path), "rev-parse", "HEAD"], text=True
+    ).strip()
+    upload_body = (
+        encode_pkt_line(f"want {head} side-band-64k\n".encode())
+        + FLUSH_PKT
+        + encode_pkt_line(b"done\n")
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    received = 0
+
+    async def clone():
+        nonlocal received
+        async with semaphore:
+            received += await call_asgi(
+                app, "GET", f"/{repo_path.name}/info/refs", b"service=git-upload-pack", b""
+            )
+            received += await call_asgi(
+                app, "POST", f"/{repo_path.name}/{UPLOAD_PACK_TYPE}", b"", upload_body
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(clone() for _ in range(requests)))
+    return time.perf_counter() - start, received
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("repo_path", type=Path)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    repo_path = args.repo_path.resolve()
+
+    quart_app = create_quart_app(repo_path)
+    await quart_app.startup()
+    apps = {
+        "asgi": SmartHTTPApp(resolve_from_root(repo_path.parent)),
+        "quart": quart_app,
+    }
+    try:
+        for name, app in apps.items():
+            elapsed, received = await run(app, repo_path, args.requests, args.concurrency)
+            print(
+                f"{name:>6}: {args.requests / elapsed:8.1f} clones/s"
+                f" {received / elapsed / 1024 / 1024:8.1f} MiB/s"
+            )
+    finally:
+        await quart_app.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,7 +6,7 @@ from pathlib import Path
 
 from .datatypes import ArchiveTypes
 from .exceptions import BufferedProcessError, GitException
-from .helpers import subprocess_run, subprocess_run_buffered
+from .helpers import QoSClass, QoSProfile, subprocess_run, subprocess_run_buffered
 
 __all__ = [
     "get_archive",
@@ -15,7 +15,10 @@ __all__ = [
 
 
 async def get_archive(
-    git_repo: Path | str, archive_type: ArchiveTypes | str, tree_ish: str = "HEAD"
+    git_repo: Path | str,
+    archive_type: ArchiveTypes | str,
+    tree_ish: str = "HEAD",
+    qos: QoSClass | QoSProfile | None = QoSClass.BATCH,
 ) -> bytes:
     """
     get a archive of a git repo
@@ -23,6 +26,7 @@ async def get_archive(
         :param git_repo: Where the repo is
         :param archive_type: What archive type will be created
         :param tree_ish: What commit/branch to save, defaults to "HEAD"
+        :param qos: Resource class or profile to run with, defaults to QoSClass.BATCH
         :raises GitException: Error to do with git
         :return: The content of the archive ready to write to a file
     """
@@ -31,6 +35,7 @@ async def get_archive(
         archive_type = archive_type.value
     process = await subprocess_run(
         ["git", "-C", str(git_repo), "archive", f"--format={archive_type}", tree_ish],
+        qos=qos,
     )
     if process.returncode != 0:
         raise GitException(process.stderr.decode())
@@ -38,7 +43,10 @@ async def get_archive(
 
 
 async def get_archive_buffered(
-    git_repo: Path | str, archive_type: ArchiveTypes | str, tree_ish: str = "HEAD"
+    git_repo: Path | str,
+    archive_type: ArchiveTypes | str,
+    tree_ish: str = "HEAD",
+    qos: QoSClass | QoSProfile | None = QoSClass.BATCH,
 ) -> AsyncGenerator[bytes, None]:
     """
     get a archive of a git repo, but using a buffered read
@@ -46,6 +54,7 @@ async def get_archive_buffered(
         :param git_repo: Where the repo is
         :param archive_type: What archive type will be created
         :param tree_ish: What commit/branch to save, defaults to "HEAD"
+        :param qos: Resource class or profile to run with, defaults to QoSClass.BATCH
         :raises GitException: Error to do with git
         :yield: Each read content section
     """
@@ -56,7 +65,7 @@ async def get_archive_buffered(
     args = ["git", "-C", str(git_repo), "archive", f"--format={archive_type}", tree_ish]
 
     try:
-        async for content in subprocess_run_buffered(args):
+        async for content in subprocess_run_buffered(args, qos):
             yield content
     except BufferedProcessError as err:
         raise GitException(err.args[0].decode()) from err
@@ -0,0 +1,139 @@
+"""
+Methods for using the 'blame' command
+"""
+import re
+from collections.abc import AsyncGenerator, AsyncIterable
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from .cache import LRUCache
+from .constants import NO_SUCH_PATH_RE
+from .datatypes import BlameRange
+from .exceptions import BufferedProcessError, GitException, PathDoesNotExistInRevException
+from .helpers import line_yielder, subprocess_run_buffered
+from .rev_parse import resolve_revision
+
+__all__ = [
+    "blame_cache",
+    "blame_incremental",
+    "get_blame",
+]
+
+blame_cache: LRUCache[tuple[str, str], tuple[BlameRange, ...]] = LRUCache(256)
+"""
+Completed blames, keyed by (commit hash, file path)
+"""
+
+
+def _parse_date(timestamp: str, tz: str) -> datetime:
+    offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5]))
+    if tz[0] == "-":
+        offset = -offset
+    return datetime.fromtimestamp(int(timestamp), timezone(offset))
+
+
+async def _parse_incremental(lines: AsyncIterable[bytes]) -> AsyncGenerator[BlameRange, None]:
+    """
+    Parse the output of 'blame --incremental',
+    commit details are only given the first time
+    a commit is seen so they are remembered for later ranges
+    """
+    commits: dict[str, dict[str, str]] = {}
+    current: tuple[str, int, int, int] | None = None
+    details: dict[str, str] = {}
+
+    async for line in lines:
+        line = line.decode(errors="replace")
+        if current is None:
+            commit_hash, original_line, final_line, line_count = line.split(" ")
+            current = (commit_hash, int(original_line), int(final_line), int(line_count))
+            details = commits.setdefault(commit_hash, {})
+            continue
+
+        key, _, value = line.partition(" ")
+        if key != "filename":
+            details[key] = value
+            continue
+
+        previous = details.get("previous")
+        yield BlameRange(
+            commit_hash=current[0],
+            original_line=current[1],
+            final_line=current[2],
+            line_count=current[3],
+            author_name=details.get("author", ""),
+            author_email=details.get("author-mail", "").removeprefix("<").removesuffix(">"),
+            author_date=_parse_date(details["author-time"], details["author-tz"]),
+            summary=details.get("summary", ""),
+            filename=value,
+            previous_hash=previous.split(" ", 1)[0] if previous else None,
+            boundary="boundary" in details,
+        )
+        current = None
+
+
+async def blame_incremental(
+    git_repo: Path | str, tree_ish: str, file_path: str, use_cache: bool = True
+) -> AsyncGenerator[BlameRange, None]:
+    """
+    Blame a file, yielding each line range as soon as git attributes it,
+    ranges are not in line order. Completed blames are cached
+    by the resolved commit and path.
+
+        :param git_repo: Path to the repo
+        :param tree_ish: The tree ish (branch name, HEAD)
+        :param file_path: The file in the repo to blame
+        :param use_cache: Whether to use the blame cache, defaults to True
+        :raises UnknownRevisionException: Unknown tree_ish
+        :raises PathDoesNotExistInRevException: File not found in repo
+        :raises GitException: Error to do with git
+        :yield: Each attributed line range
+    """
+    commit_hash = await resolve_revision(git_repo, f"{tree_ish}^{{commit}}")
+    cache_key = (commit_hash, file_path)
+
+    if use_cache and (cached := blame_cache.get(cache_key)) is not None:
+        for blame_range in cached:
+            yield blame_range
+        return
+
+    args = ["git", "-C", str(git_repo), "blame", "--incremental", commit_hash, "--", file_path]
+    blame_ranges = []
+
+    try:
+        async with aclosing(subprocess_run_buffered(args)) as chunks:
+            async for blame_range in _parse_incremental(line_yielder(chunks)):
+                blame_ranges.append(blame_range)
+                yield blame_range
+    except BufferedProcessError as err:
+        stderr = err.args[0].decode()
+        if re.match(NO_SUCH_PATH_RE, stderr):
+            msg = f"'{file_path}' not found in repo"
+            raise PathDoesNotExistInRevException(msg) from err
+        raise GitException(stderr) from err
+
+    if use_cache:
+        blame_cache.put(cache_key, tuple(blame_ranges))
+
+
+async def get_blame(
+    git_repo: Path | str, tree_ish: str, file_path: str, use_cache: bool = True
+) -> list[BlameRange]:
+    """
+    Blame a whole file
+
+        :param git_repo: Path to the repo
+        :param tree_ish: The tree ish (branch name, HEAD)
+        :param file_path: The file in the repo to blame
+        :param use_cache: Whether to use the blame cache, defaults to True
+        :raises UnknownRevisionException: Unknown tree_ish
+        :raises PathDoesNotExistInRevException: File not found in repo
+        :raises GitException: Error to do with git
+        :return: The attributed line ranges, in line order
+    """
+    blame_ranges = [
+        blame_range
+        async for blame_range in blame_incremental(git_repo, tree_ish, file_path, use_cache)
+    ]
+    return sorted(blame_ranges, key=lambda blame_range: blame_range.final_line)
@@ -2,11 +2,14 @@
 Methods for using the 'branch' command
 """
 import re
+from collections.abc import Iterable, Mapping
 from pathlib import Path
 
 from .constants import BRANCH_ALREADY_EXISTS_RE, BRANCH_NOT_FOUND_RE, BRANCH_REFNAME_NOT_FOUND_RE
+from .datatypes import RefUpdateFailure
 from .exceptions import AlreadyExistsException, GitException, NoBranchesException
 from .helpers import ensure_path, subprocess_run
+from .update_ref import RefTransaction
 
 __all__ = [
     "get_branches",
@@ -15,6 +18,7 @@ __all__ = [
     "copy_branch",
     "rename_branch",
     "delete_branch",
+    "delete_branches",
 ]
 
 
@@ -151,3 +155,26 @@ async def delete_branch(git_repo: Path | str, branch_name: str):
             msg = f"no branch found with name '{branch_name}'"
             raise NoBranchesException(msg)
         raise GitException(stderr)
+
+
+async def delete_branches(
+    git_repo: Path | str,
+    branch_names: Iterable[str],
+    old_commits: Mapping[str, str] | None = None,
+) -> list[RefUpdateFailure]:
+    """
+    Delete many branches with a single process,
+    missing branches are ignored and their config is kept
+
+        :param git_repo: Path to the repo
+        :param branch_names: Branch names
+        :param old_commits: Only delete a branch if it is still
+                            at this commit, by branch name, defaults to None
+        :raises GitException: Error to do with git
+        :return: The branches that were not deleted (e.g. changed since being read)
+    """
+    old_commits = old_commits or {}
+    transaction = RefTransaction(git_repo, "branch: deleted", atomic=False)
+    for branch_name in branch_names:
+        transaction.delete(f"refs/heads/{branch_name}", old_commits.get(branch_name))
+    return await transaction.commit()
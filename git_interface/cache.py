@@ -0,0 +1,212 @@
+"""
+Caches for storing results of git commands,
+intended for results keyed by immutable values (e.g. object ids)
+"""
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from pathlib import Path
+from secrets import token_hex
+from typing import Generic, TypeVar
+
+import aiofiles
+import aiofiles.os
+
+from .helpers import ensure_path
+
+__all__ = [
+    "CacheStats",
+    "LRUCache",
+    "DiskCache",
+]
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    """
+    Counters for how a cache has been used
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    rejections: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A least recently used cache, that will discard the oldest used
+    entries once max_size (or the optional max_weight) is reached
+    """
+
+    def __init__(
+        self,
+        max_size: int = 128,
+        max_weight: int | None = None,
+        weigher: Callable[[V], int] | None = None,
+        max_item_weight: int | None = None,
+    ):
+        """
+            :param max_size: Maximum number of entries to store, defaults to 128
+            :param max_weight: Maximum total weight of entries to store, defaults to None
+            :param weigher: Gets the weight of a value, required with max_weight, defaults to None
+            :param max_item_weight: Values heavier than this are not stored, defaults to None
+            :raises ValueError: max_size is less than 1 or a weight given without weigher
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if (max_weight is not None or max_item_weight is not None) and weigher is None:
+            raise ValueError("weigher must be given when using max_weight or max_item_weight")
+        self._max_size = max_size
+        self._max_weight = max_weight
+        self._weigher = weigher
+        if max_item_weight is None or (max_weight is not None and max_item_weight > max_weight):
+            max_item_weight = max_weight
+        self._max_item_weight = max_item_weight
+        self.stats = CacheStats()
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._weights: dict[K, int] = {}
+        self._total_weight = 0
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_weight(self) -> int:
+        """
+        The total weight of stored entries, always 0 without a weigher
+        """
+        return self._total_weight
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        """
+        Get a stored value, marking it as recently used
+
+            :param key: The key
+            :param default: Returned when key is not stored, defaults to None
+            :return: The stored value or default
+        """
+        try:
+            self._entries.move_to_end(key)
+        except KeyError:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return self._entries[key]
+
+    def admits(self, weight: int) -> bool:
+        """
+        Whether a value of a weight can be stored, so large values
+        can be skipped before they are fetched (counted as a rejection when not)
+
+            :param weight: The weight of the value
+            :return: Whether it can be stored
+        """
+        if self._max_item_weight is not None and weight > self._max_item_weight:
+            self.stats.rejections += 1
+            return False
+        return True
+
+    def put(self, key: K, value: V):
+        """
+        Store a value, discarding the least recently used
+        entries if the cache is full. A value heavier than
+        max_item_weight (or max_weight) will not be stored.
+
+            :param key: The key
+            :param value: The value to store
+        """
+        weight = self._weigher(value) if self._weigher is not None else 0
+        self.pop(key)
+        if self._max_item_weight is not None and weight > self._max_item_weight:
+            self.stats.rejections += 1
+            return
+        self._entries[key] = value
+        self._weights[key] = weight
+        self._total_weight += weight
+        while len(self._entries) > self._max_size or (
+            self._max_weight is not None and self._total_weight > self._max_weight
+        ):
+            self._discard_oldest()
+
+    def _discard_oldest(self):
+        key, _ = self._entries.popitem(last=False)
+        self._total_weight -= self._weights.pop(key)
+        self.stats.evictions += 1
+
+    def pop(self, key: K, default: V | None = None) -> V | None:
+        """
+        Remove a stored value
+
+            :param key: The key
+            :param default: Returned when key is not stored, defaults to None
+            :return: The removed value or default
+        """
+        if key not in self._entries:
+            return default
+        self._total_weight -= self._weights.pop(key)
+        return self._entries.pop(key)
+
+    def clear(self):
+        """
+        Remove all stored values
+        """
+        self._entries.clear()
+        self._weights.clear()
+        self._total_weight = 0
+
+
+class DiskCache:
+    """
+    A cache storing each value as a file in a directory,
+    as values are never discarded it should only be used
+    for values that are keyed by an immutable value (e.g. object id)
+    """
+
+    def __init__(self, directory: Path | str):
+        """
+            :param directory: Where to store the values, created when needed
+        """
+        self._directory = ensure_path(directory)
+
+    def _path(self, key: str) -> Path:
+        # spread values over sub-directories, like git does with loose objects
+        return self._directory / key[:2] / key[2:]
+
+    async def get(self, key: str) -> bytes | None:
+        """
+        Get a stored value
+
+            :param key: The key, must be safe to use as a filename
+            :return: The stored value or None
+        """
+        try:
+            async with aiofiles.open(self._path(key), "rb") as fo:
+                return await fo.read()
+        except FileNotFoundError:
+            return None
+
+    async def put(self, key: str, value: bytes):
+        """
+        Store a value, replacing any existing value
+
+            :param key: The key, must be safe to use as a filename
+            :param value: The value to store
+        """
+        path = self._path(key)
+        await aiofiles.os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{token_hex(4)}.tmp")
+        async with aiofiles.open(tmp_path, "wb") as fo:
+            await fo.write(value)
+        await aiofiles.os.replace(tmp_path, path)
@@ -1,15 +1,39 @@
 """
 Methods for using the 'cat-file' command
 """
+import asyncio
 import re
 from pathlib import Path
 
-from .constants import NOT_VALID_OBJECT_NAME_RE
-from .datatypes import TreeContentTypes
+from typing_extensions import Self
+
+from .cache import LRUCache
+from .constants import NOT_VALID_OBJECT_NAME_RE, OBJECT_ID_RE
+from .datatypes import GitObject, TreeContentTypes
 from .exceptions import GitException, UnknownRevisionException
-from .helpers import subprocess_run
+from .helpers import create_subprocess, kill_process_group, subprocess_run
+
+__all__ = [
+    "get_object_size",
+    "get_object_type",
+    "get_pretty_print",
+    "get_pretty_print_cached",
+    "get_blob_cached",
+    "object_cache",
+    "BatchObjectReader",
+]
+
+object_cache: LRUCache[str, bytes] = LRUCache(
+    max_size=65536, max_weight=64 * 1024 * 1024, weigher=len, max_item_weight=1024 * 1024
+)
+"""
+Content of blobs shared between repos, keyed by object id.
+Uses at most 64MiB, blobs larger than 1MiB are not cached.
+"""
 
-__all__ = ["get_object_size", "get_object_type", "get_pretty_print"]
+# (object id, size) of names that can never change (e.g. '<commit id>:README.md'),
+# keyed by repo as the object may only exist in the repo it was resolved in
+_resolved_blobs: LRUCache[tuple[str, str], tuple[str, int]] = LRUCache(65536)
 
 
 async def __cat_file_command(git_repo: Path | str, tree_ish: str, file_path: str, *flags) -> bytes:
@@ -69,3 +93,169 @@ async def get_pretty_print(git_repo: Path | str, tree_ish: str, file_path: str)
         :return: The object type
     """
     return await __cat_file_command(git_repo, tree_ish, file_path, "-p")
+
+
+async def get_blob_cached(
+    git_repo: Path | str, object_name: str, cache: LRUCache[str, bytes] | None = None
+) -> memoryview:
+    """
+    Gets the content of a blob from repo, using a cache keyed
+    by object id. The content is returned as a read-only
+    memoryview, so it is not copied from the cache.
+
+    Names are resolved (with the blob's size, so blobs too large
+    for the cache are not stored) by one 'cat-file --batch-check',
+    names that cannot change (object ids) are only resolved once per repo.
+
+        :param git_repo: Path to the repo
+        :param object_name: A object id or other object name (e.g. 'HEAD:README.md')
+        :param cache: The cache to use, defaults to None (uses object_cache)
+        :raises UnknownRevisionException: Invalid object name
+        :raises GitException: Error to do with git, including object not being a blob
+        :return: The blob content
+    """
+    cache = object_cache if cache is None else cache
+    # also checks the blob exists in this repo, as the cache is shared between repos
+    object_, object_size = await _resolve_blob(git_repo, object_name)
+
+    if (content := cache.get(object_)) is None:
+        args = ["git", "-C", str(git_repo), "cat-file", "blob", object_]
+        process_status = await subprocess_run(args)
+        if process_status.returncode != 0:
+            raise GitException(process_status.stderr.decode())
+        content = process_status.stdout
+        if cache.admits(object_size):
+            cache.put(object_, content)
+
+    return memoryview(content)
+
+
+async def _resolve_blob(git_repo: Path | str, object_name: str) -> tuple[str, int]:
+    """
+    Resolve a object name into its object id and size, with a single
+    'cat-file --batch-check' (memoized when the name cannot change)
+    """
+    # a object id, or a path in a object id
+    immutable = re.match(OBJECT_ID_RE, object_name.split(":", 1)[0]) is not None
+    memo_key = (str(git_repo), object_name)
+    if immutable and (resolved := _resolved_blobs.get(memo_key)) is not None:
+        return resolved
+    if "\n" in object_name:
+        msg = f"Invalid object name '{object_name}'"
+        raise UnknownRevisionException(msg)
+
+    args = ["git", "-C", str(git_repo), "cat-file", "--batch-check"]
+    process_status = await subprocess_run(args, input=object_name.encode() + b"\n")
+    if process_status.returncode != 0:
+        raise GitException(process_status.stderr.decode())
+    parts = process_status.stdout.decode().split()
+    if len(parts) != 3 or not parts[2].isdigit():
+        # e.g. '<name> missing' or '<name> ambiguous'
+        msg = f"Invalid object name '{object_name}'"
+        raise UnknownRevisionException(msg)
+    if parts[1] != TreeContentTypes.BLOB.value:
+        msg = f"'{object_name}' is a {parts[1]}, not a blob"
+        raise GitException(msg)
+
+    resolved = (parts[0], int(parts[2]))
+    if immutable:
+        _resolved_blobs.put(memo_key, resolved)
+    return resolved
+
+
+async def get_pretty_print_cached(
+    git_repo: Path | str,
+    tree_ish: str,
+    file_path: str,
+    cache: LRUCache[str, bytes] | None = None,
+) -> memoryview:
+    """
+    Gets a file from repo, using a cache keyed by object id
+
+        :param git_repo: Path to the repo
+        :param tree_ish: The tree ish (branch name, HEAD)
+        :param file_path: The file in the repo to read
+        :param cache: The cache to use, defaults to None (uses object_cache)
+        :raises UnknownRevisionException: Invalid tree_ish or file_path
+        :raises GitException: Error to do with git, including file_path not being a file
+        :return: The file content
+    """
+    return await get_blob_cached(git_repo, f"{tree_ish}:{file_path}", cache)
+
+
+class BatchObjectReader:
+    """
+    Reads many objects from a repo using a single 'cat-file --batch' process,
+    use as an async context manager:
+
+    .. code-block:: python
+
+        async with BatchObjectReader(git_repo) as reader:
+            readme = await reader.read("HEAD:README.md")
+    """
+
+    def __init__(self, git_repo: Path | str):
+        self._git_repo = git_repo
+        self._process: asyncio.subprocess.Process | None = None
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, *_):
+        if exc_type is not None and self._process is not None:
+            # may have been interrupted mid-read, so cannot be reused
+            await kill_process_group(self._process)
+            self._process = None
+        await self.close()
+
+    async def start(self):
+        """
+        Start the git process, called automatically when used as a context manager
+        """
+        args = ["git", "-C", str(self._git_repo), "cat-file", "--batch"]
+        self._process = await create_subprocess(args, stdin=asyncio.subprocess.PIPE)
+
+    async def close(self):
+        """
+        Stop the git process, called automatically when used as a context manager
+        """
+        if self._process is None:
+            return
+        if self._process.returncode is None:
+            self._process.stdin.close()
+            await self._process.wait()
+        self._process = None
+
+    async def read(self, object_name: str) -> GitObject:
+        """
+        Read a object
+
+            :param object_name: A object id or other object name (e.g. 'HEAD:README.md')
+            :raises UnknownRevisionException: Invalid object name
+            :raises GitException: Error to do with git
+            :return: The read object
+        """
+        if self._process is None:
+            raise GitException("reader has not been started")
+        if "\n" in object_name:
+            msg = f"Invalid object name '{object_name}'"
+            raise UnknownRevisionException(msg)
+
+        async with self._lock:
+            self._process.stdin.write(object_name.encode() + b"\n")
+            await self._process.stdin.drain()
+
+            header = await self._process.stdout.readline()
+            if not header:
+                raise GitException((await self._process.stderr.read()).decode())
+            parts = header.decode().split()
+            if len(parts) != 3 or not parts[2].isdigit():
+                msg = f"Invalid object name '{object_name}'"
+                raise UnknownRevisionException(msg)
+            content = await self._process.stdout.readexactly(int(parts[2]))
+            # each object ends with a new line
+            await self._process.stdout.readexactly(1)
+
+        return GitObject(parts[0], parts[1], content)
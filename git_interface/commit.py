@@ -0,0 +1,286 @@
+"""
+Methods for creating commits in (bare) repos without a working tree,
+using git's plumbing commands
+"""
+import asyncio
+import os
+import re
+from collections.abc import AsyncIterable, Mapping, Sequence
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from .cat_file import BatchObjectReader
+from .constants import REF_UPDATE_CONFLICT_RE
+from .exceptions import GitException, RefUpdateConflictException
+from .fast_import import FastImportWriter
+from .helpers import create_subprocess, kill_process_group, quote_path, subprocess_run
+from .rev_parse import resolve_revision
+
+__all__ = [
+    "FileContent",
+    "write_blobs",
+    "commit_tree",
+    "create_commit",
+]
+
+FileContent = bytes | AsyncIterable[bytes] | None
+"""
+Content of a file to commit, None removes the path
+"""
+
+_TREE_MODE = b"40000"
+_BLOB_MODES = (b"100644", b"100755")
+
+
+async def write_blobs(
+    git_repo: Path | str, contents: Sequence[bytes | AsyncIterable[bytes]]
+) -> list[str]:
+    """
+    Write many blobs using a single 'fast-import' process,
+    content from async sources is streamed (via a temporary file)
+    so it is never fully in memory.
+
+        :param git_repo: Path to the repo
+        :param contents: The content of each blob
+        :raises GitException: Error to do with git
+        :return: The object id of each blob, in the same order
+    """
+    if not contents:
+        return []
+
+    with TemporaryDirectory() as tmp_dir:
+        writer = FastImportWriter(git_repo, Path(tmp_dir) / "marks", checkpoint_interval=None)
+        async with writer:
+            for mark, content in enumerate(contents, 1):
+                await writer.write_blob(mark, content)
+        marks = await writer.get_marks()
+
+    return [marks[mark] for mark in range(1, len(contents) + 1)]
+
+
+class _TreeChanges:
+    def __init__(self):
+        self.files: dict[bytes, str | None] = {}
+        self.dirs: dict[bytes, _TreeChanges] = {}
+
+    def add(self, parts: list[bytes], object_id: str | None):
+        name = parts[0]
+        if len(parts) == 1:
+            if name in self.dirs:
+                msg = f"'{name.decode(errors='replace')}' is both a file and directory"
+                raise ValueError(msg)
+            self.files[name] = object_id
+            return
+        if name in self.files:
+            msg = f"'{name.decode(errors='replace')}' is both a file and directory"
+            raise ValueError(msg)
+        self.dirs.setdefault(name, _TreeChanges()).add(parts[1:], object_id)
+
+
+def _split_path(path: str) -> list[bytes]:
+    parts = path.encode().split(b"/")
+    if any(part in (b"", b".", b"..", b".git") for part in parts):
+        msg = f"invalid path '{path}'"
+        raise ValueError(msg)
+    return parts
+
+
+def _parse_tree(content: bytes, object_id_size: int) -> dict[bytes, tuple[bytes, str]]:
+    """
+    Parse a raw tree object, into (mode, object id) by name
+    """
+    entries = {}
+    position = 0
+    while position < len(content):
+        space = content.index(b" ", position)
+        nul = content.index(b"\0", space)
+        object_id = content[nul + 1 : nul + 1 + object_id_size]
+        entries[content[space + 1 : nul]] = (content[position:space], object_id.hex())
+        position = nul + 1 + object_id_size
+    return entries
+
+
+def _get_type(mode: bytes) -> bytes:
+    if mode == _TREE_MODE:
+        return b"tree"
+    if mode == b"160000":
+        return b"commit"
+    return b"blob"
+
+
+class _TreeWriter:
+    """
+    Writes changed trees bottom-up, reading the base trees
+    with a single 'cat-file' and writing with a single 'mktree' process
+    """
+
+    def __init__(self, reader: BatchObjectReader, mktree: asyncio.subprocess.Process):
+        self._reader = reader
+        self._mktree = mktree
+
+    async def _make_tree(self, entries: dict[bytes, tuple[bytes, str]]) -> str:
+        for name, (mode, object_id) in entries.items():
+            self._mktree.stdin.write(
+                b"%s %s %s\t%s\n"
+                % (mode, _get_type(mode), object_id.encode(), quote_path(name))
+            )
+        # a blank line ends each tree
+        self._mktree.stdin.write(b"\n")
+        await self._mktree.stdin.drain()
+        line = await self._mktree.stdout.readline()
+        if not line:
+            raise GitException((await self._mktree.stderr.read()).decode())
+        return line.decode().strip()
+
+    async def write(
+        self, base_tree: str | None, changes: _TreeChanges, is_root: bool = False
+    ) -> str | None:
+        entries = {}
+        if base_tree is not None:
+            tree = await self._reader.read(base_tree)
+            entries = _parse_tree(tree.content, len(base_tree) // 2)
+
+        for name, sub_changes in changes.dirs.items():
+            existing = entries.get(name)
+            sub_base = existing[1] if existing and existing[0] == _TREE_MODE else None
+            sub_tree = await self.write(sub_base, sub_changes)
+            if sub_tree is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = (_TREE_MODE, sub_tree)
+
+        for name, object_id in changes.files.items():
+            if object_id is None:
+                entries.pop(name, None)
+                continue
+            # keep whether a existing file is executable
+            existing = entries.get(name)
+            mode = existing[0] if existing and existing[0] in _BLOB_MODES else b"100644"
+            entries[name] = (mode, object_id)
+
+        if not entries and not is_root:
+            return None
+        return await self._make_tree(entries)
+
+
+async def _write_tree(git_repo: Path | str, base_tree: str | None, changes: _TreeChanges) -> str:
+    args = ["git", "-C", str(git_repo), "mktree", "--batch"]
+    mktree = await create_subprocess(args, stdin=asyncio.subprocess.PIPE)
+    try:
+        async with BatchObjectReader(git_repo) as reader:
+            tree = await _TreeWriter(reader, mktree).write(base_tree, changes, is_root=True)
+        mktree.stdin.write_eof()
+        await mktree.wait()
+    except BaseException:
+        await kill_process_group(mktree)
+        raise
+    return tree
+
+
+def _get_identity_env(prefix: str, identity: tuple[str, str] | None) -> dict[str, str]:
+    if identity is None:
+        return {}
+    return {f"GIT_{prefix}_NAME": identity[0], f"GIT_{prefix}_EMAIL": identity[1]}
+
+
+async def commit_tree(
+    git_repo: Path | str,
+    tree: str,
+    parents: Sequence[str],
+    message: str,
+    author: tuple[str, str] | None = None,
+    committer: tuple[str, str] | None = None,
+) -> str:
+    """
+    Create a commit object from a existing tree, without updating any ref
+
+        :param git_repo: Path to the repo
+        :param tree: The tree's object id
+        :param parents: The parent commits
+        :param message: The commit message
+        :param author: Author (name, email), defaults to git's config
+        :param committer: Committer (name, email), defaults to the author
+        :raises GitException: Error to do with git
+        :return: The new commit's id
+    """
+    args = ["git", "-C", str(git_repo), "commit-tree", tree, "-F", "-"]
+    for parent in parents:
+        args.extend(("-p", parent))
+    env = {
+        **os.environ,
+        **_get_identity_env("AUTHOR", author),
+        **_get_identity_env("COMMITTER", committer or author),
+    }
+    process_status = await subprocess_run(args, input=message.encode(), env=env)
+    if process_status.returncode != 0:
+        raise GitException(process_status.stderr.decode())
+    return process_status.stdout.decode().strip()
+
+
+async def create_commit(
+    git_repo: Path | str,
+    ref: str,
+    files: Mapping[str, FileContent],
+    message: str,
+    base: str | None,
+    author: tuple[str, str] | None = None,
+    committer: tuple[str, str] | None = None,
+) -> str:
+    """
+    Commit files on top of a base commit without a working tree,
+    then update the ref only if it is still at the base commit.
+
+    Blobs are written in bulk, only the trees
+    containing changed paths are rewritten.
+
+        :param git_repo: Path to the repo
+        :param ref: The full ref to update (e.g. 'refs/heads/main')
+        :param files: Content by path ('dir/file.txt'), None removes the path
+        :param message: The commit message
+        :param base: The parent commit, None to create the ref with a root commit
+        :param author: Author (name, email), defaults to git's config
+        :param committer: Committer (name, email), defaults to the author
+        :raises ValueError: Invalid path given
+        :raises UnknownRevisionException: Unknown base
+        :raises RefUpdateConflictException: The ref was not at base
+        :raises GitException: Error to do with git
+        :return: The new commit's id
+    """
+    split_paths = {path: _split_path(path) for path in files}
+    paths = [path for path, content in files.items() if content is not None]
+    blob_ids = dict(zip(paths, await write_blobs(git_repo, [files[path] for path in paths])))
+    changes = _TreeChanges()
+    for path, parts in split_paths.items():
+        changes.add(parts, blob_ids.get(path))
+
+    base_tree = None
+    if base is not None:
+        base = await resolve_revision(git_repo, f"{base}^{{commit}}")
+        base_tree = await resolve_revision(git_repo, f"{base}^{{tree}}")
+    tree = await _write_tree(git_repo, base_tree, changes)
+
+    parents = [] if base is None else [base]
+    commit = await commit_tree(git_repo, tree, parents, message, author, committer)
+
+    # an all zero old value means the ref must not exist yet
+    old_value = base or "0" * len(commit)
+    summary = message.split("\n", 1)[0]
+    args = [
+        "git",
+        "-C",
+        str(git_repo),
+        "update-ref",
+        "-m",
+        f"commit: {summary}",
+        ref,
+        commit,
+        old_value,
+    ]
+    process_status = await subprocess_run(args)
+    if process_status.returncode != 0:
+        stderr = process_status.stderr.decode()
+        if re.search(REF_UPDATE_CONFLICT_RE, stderr):
+            raise RefUpdateConflictException(stderr)
+        raise GitException(stderr)
+
+    return commit
@@ -0,0 +1,251 @@
+"""
+Language and line count breakdown of a repo,
+with totals memoized per tree so unchanged directories are never re-read
+"""
+import json
+from pathlib import Path, PurePosixPath
+
+from .cache import DiskCache, LRUCache
+from .cat_file import BatchObjectReader
+from .datatypes import LanguageStat, TreeContent, TreeContentTypes
+from .ls import ls_tree_cached
+from .rev_parse import resolve_revision
+
+__all__ = [
+    "LANGUAGE_EXTENSIONS",
+    "LANGUAGE_FILENAMES",
+    "LANGUAGE_INTERPRETERS",
+    "composition_cache",
+    "detect_language",
+    "get_composition",
+]
+
+COMPOSITION_VERSION = 2
+DEFAULT_MAX_BLOB_SIZE = 1024 * 1024
+# same check git uses to detect binary content
+BINARY_CHECK_SIZE = 8000
+SYMLINK_MODE = "120000"
+
+LANGUAGE_EXTENSIONS = {
+    ".c": "C",
+    ".h": "C",
+    ".cc": "C++",
+    ".cpp": "C++",
+    ".cxx": "C++",
+    ".hpp": "C++",
+    ".cs": "C#",
+    ".css": "CSS",
+    ".dart": "Dart",
+    ".go": "Go",
+    ".html": "HTML",
+    ".htm": "HTML",
+    ".java": "Java",
+    ".js": "JavaScript",
+    ".mjs": "JavaScript",
+    ".cjs": "JavaScript",
+    ".jsx": "JavaScript",
+    ".kt": "Kotlin",
+    ".kts": "Kotlin",
+    ".lua": "Lua",
+    ".md": "Markdown",
+    ".rst": "reStructuredText",
+    ".m": "Objective-C",
+    ".php": "PHP",
+    ".pl": "Perl",
+    ".pm": "Perl",
+    ".py": "Python",
+    ".pyi": "Python",
+    ".r": "R",
+    ".rb": "Ruby",
+    ".rs": "Rust",
+    ".scala": "Scala",
+    ".scss": "SCSS",
+    ".sh": "Shell",
+    ".bash": "Shell",
+    ".zsh": "Shell",
+    ".sql": "SQL",
+    ".swift": "Swift",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".vue": "Vue",
+    ".zig": "Zig",
+}
+"""
+Language by lowercase file extension
+"""
+LANGUAGE_FILENAMES = {
+    "Dockerfile": "Dockerfile",
+    "Makefile": "Makefile",
+    "GNUmakefile": "Makefile",
+    "CMakeLists.txt": "CMake",
+    "Rakefile": "Ruby",
+    "Gemfile": "Ruby",
+}
+"""
+Language by exact filename
+"""
+LANGUAGE_INTERPRETERS = {
+    "python": "Python",
+    "python3": "Python",
+    "sh": "Shell",
+    "bash": "Shell",
+    "zsh": "Shell",
+    "node": "JavaScript",
+    "ruby": "Ruby",
+    "perl": "Perl",
+    "php": "PHP",
+    "lua": "Lua",
+}
+"""
+Language by the interpreter of a '#!' line, for files without a known extension
+"""
+
+composition_cache: LRUCache[tuple[str, int], dict[str, tuple[int, int, int]]] = LRUCache(
+    max_size=8192
+)
+"""
+(files, lines, bytes) by language of each tree, keyed by (tree hash, max_blob_size)
+"""
+# (is binary, lines, language from a '#!' line) of each read blob
+_blob_cache: LRUCache[str, tuple[bool, int, str | None]] = LRUCache(65536)
+
+
+def detect_language(filename: str, content: bytes | None = None) -> str | None:
+    """
+    Detect the language of a file by its name,
+    falling back to the '#!' line of its content
+
+        :param filename: The filename (without directories)
+        :param content: The content, or the start of it, defaults to None
+        :return: The language, or None when unknown
+    """
+    if (language := LANGUAGE_FILENAMES.get(filename)) is not None:
+        return language
+    if (language := LANGUAGE_EXTENSIONS.get(PurePosixPath(filename).suffix.lower())) is not None:
+        return language
+    if content is None or not content.startswith(b"#!"):
+        return None
+    interpreter_line = content[2:].split(b"\n", 1)[0].decode(errors="replace").split()
+    if not interpreter_line:
+        return None
+    interpreter = PurePosixPath(interpreter_line[0]).name
+    if interpreter == "env" and len(interpreter_line) > 1:
+        interpreter = interpreter_line[1]
+    return LANGUAGE_INTERPRETERS.get(interpreter)
+
+
+class _Analyzer:
+    def __init__(
+        self,
+        git_repo: Path | str,
+        reader: BatchObjectReader,
+        max_blob_size: int,
+        disk_cache: DiskCache | None,
+    ):
+        self._git_repo = git_repo
+        self._reader = reader
+        self._max_blob_size = max_blob_size
+        self._disk_cache = disk_cache
+
+    async def _blob_totals(self, entry: TreeContent) -> tuple[str, int] | None:
+        """
+        Get the language and line count of a blob, None when unknown or binary
+        """
+        filename = entry.file.name
+        language = detect_language(filename)
+        if not entry.object_size or entry.object_size > self._max_blob_size:
+            # empty or too large to read, so lines are not counted
+            return (language, 0) if language is not None else None
+
+        if (blob := _blob_cache.get(entry.object_)) is None:
+            content = (await self._reader.read(entry.object_)).content
+            lines = content.count(b"\n")
+            if content and not content.endswith(b"\n"):
+                lines += 1
+            blob = (
+                b"\0" in content[:BINARY_CHECK_SIZE],
+                lines,
+                detect_language("", content),
+            )
+            _blob_cache.put(entry.object_, blob)
+
+        is_binary, lines, content_language = blob
+        language = language or content_language
+        if is_binary or language is None:
+            return None
+        return language, lines
+
+    async def tree_totals(self, tree_hash: str) -> dict[str, tuple[int, int, int]]:
+        key = (tree_hash, self._max_blob_size)
+        if (cached := composition_cache.get(key)) is not None:
+            return cached
+        # versioned, totals stored before paths were unquoted are not used
+        disk_key = f"composition-{tree_hash}-{self._max_blob_size}-v{COMPOSITION_VERSION}"
+        if self._disk_cache is not None and (raw := await self._disk_cache.get(disk_key)):
+            totals = {language: tuple(values) for language, values in json.loads(raw).items()}
+            composition_cache.put(key, totals)
+            return totals
+
+        sums: dict[str, list[int]] = {}
+
+        def add(language: str, files: int, lines: int, size: int):
+            total = sums.setdefault(language, [0, 0, 0])
+            total[0] += files
+            total[1] += lines
+            total[2] += size
+
+        # listed with '-z', so names are unquoted and have their real extension
+        tree = await ls_tree_cached(self._git_repo, tree_hash, False, True)
+        for entry in tree:
+            if entry.type_ == TreeContentTypes.TREE:
+                for language, values in (await self.tree_totals(entry.object_)).items():
+                    add(language, *values)
+            elif (
+                entry.type_ == TreeContentTypes.BLOB
+                and entry.mode != SYMLINK_MODE
+                and (blob_totals := await self._blob_totals(entry)) is not None
+            ):
+                add(blob_totals[0], 1, blob_totals[1], entry.object_size or 0)
+
+        totals = {language: tuple(values) for language, values in sums.items()}
+        composition_cache.put(key, totals)
+        if self._disk_cache is not None:
+            await self._disk_cache.put(disk_key, json.dumps(totals).encode())
+        return totals
+
+
+async def get_composition(
+    git_repo: Path | str,
+    tree_ish: str = "HEAD",
+    max_blob_size: int = DEFAULT_MAX_BLOB_SIZE,
+    disk_cache: DiskCache | None = None,
+) -> list[LanguageStat]:
+    """
+    Get the files, lines and bytes of each language in a revision.
+
+    Totals are memoized per tree, so after a push only directories
+    that changed are listed and their changed files read
+    (using a single 'cat-file' process). Binary files, symlinks,
+    submodules and files of unknown languages are not counted.
+
+        :param git_repo: Path to the repo
+        :param tree_ish: The tree ish (branch name, HEAD), defaults to "HEAD"
+        :param max_blob_size: Lines of larger files are not counted, defaults to 1MiB
+        :param disk_cache: Also cache totals on disk, defaults to None
+        :raises UnknownRevisionException: Unknown tree_ish
+        :raises GitException: Error to do with git
+        :return: The totals of each language, most bytes first
+    """
+    tree_hash = await resolve_revision(git_repo, f"{tree_ish}^{{tree}}")
+    key = (tree_hash, max_blob_size)
+    # avoid starting 'cat-file' when nothing changed
+    if key in composition_cache:
+        totals = composition_cache.get(key)
+    else:
+        async with BatchObjectReader(git_repo) as reader:
+            analyzer = _Analyzer(git_repo, reader, max_blob_size, disk_cache)
+            totals = await analyzer.tree_totals(tree_hash)
+    return sorted(
+        (LanguageStat(language, *values) for language, values in totals.items()),
+        key=lambda stat: (-stat.bytes, stat.language),
+    )
@@ -17,6 +17,12 @@ INVALID_OBJECT_NAME = r"fatal: invalid object name '.+'"
 PATH_DOES_NOT_EXIST = r"fatal: path '.+' does not exist in '.+'"
 TAG_ALREADY_EXISTS_RE = r"fatal: tag '.+' already exists"
 TAG_NOT_FOUND_RE = r"error: tag '.+' not found"
+UNABLE_TO_RESOLVE_REV_RE = r"fatal: unable to resolve revision: .+"
+NO_SUCH_PATH_RE = r"fatal: no such path .+ in .+"
+BAD_REVISION_RE = r"fatal: bad revision '.+'"
+REF_UPDATE_CONFLICT_RE = r"cannot lock ref|reference already exists|but expected"
+# full sha1 or sha256 object id
+OBJECT_ID_RE = r"^([0-9a-f]{40}|[0-9a-f]{64})$"
 # git ls-tree <tree-ish>
 LS_TREE_RE = r"^(\d{6}) (\w+) (\w{40})\t(.+)$"
 # git ls-tree <tree-ish> -l
@@ -0,0 +1,179 @@
+"""
+Compact columnar export of a repo's commit graph for analytics,
+stored in stdlib arrays so no extra dependencies are needed
+(they support the buffer protocol, e.g. numpy.frombuffer(dag.timestamps, "int64"))
+"""
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from contextlib import aclosing
+from datetime import date, timedelta
+from pathlib import Path
+
+from .exceptions import BufferedProcessError, GitException
+from .helpers import QoSClass, QoSProfile, line_yielder, subprocess_run_buffered
+
+__all__ = [
+    "CommitDAG",
+    "load_commit_dag",
+]
+
+_EPOCH = date(1970, 1, 1)
+
+
+class CommitDAG:
+    """
+    A commit graph stored as columns indexed by commit number.
+
+    Commits are numbered in topological order (parents before children),
+    so every parent index is lower than its children's.
+    Parents are stored CSR-style: the parents of commit i are
+    parents[parent_offsets[i]:parent_offsets[i + 1]].
+    """
+
+    def __init__(self):
+        self.object_ids: list[str] = []
+        """commit hash by index"""
+        self.indexes: dict[str, int] = {}
+        """index by commit hash"""
+        self.parent_offsets = array("I", [0])
+        self.parents = array("I")
+        self.timestamps = array("q")
+        """committer date by index, as seconds since the epoch"""
+        self.author_ids = array("I")
+        self.authors: list[str] = []
+        """author email by author id"""
+        self.generations = array("I")
+        """1 for root commits, otherwise 1 more than the highest parent"""
+        self._author_ids: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.object_ids)
+
+    def _add(self, object_id: str, parents: Iterable[str], timestamp: int, author: str):
+        generation = 0
+        for parent in parents:
+            # parents outside the loaded revisions (e.g. shallow) are left out
+            if (parent_index := self.indexes.get(parent)) is not None:
+                self.parents.append(parent_index)
+                generation = max(generation, self.generations[parent_index])
+        self.parent_offsets.append(len(self.parents))
+        self.indexes[object_id] = len(self.object_ids)
+        self.object_ids.append(object_id)
+        self.timestamps.append(timestamp)
+        if (author_id := self._author_ids.get(author)) is None:
+            author_id = self._author_ids[author] = len(self.authors)
+            self.authors.append(author)
+        self.author_ids.append(author_id)
+        self.generations.append(generation + 1)
+
+    def get_parents(self, index: int) -> array:
+        """
+        Get a commit's parents
+
+            :param index: The commit index
+            :return: The parent indexes
+        """
+        return self.parents[self.parent_offsets[index] : self.parent_offsets[index + 1]]
+
+    def topo_order(self, newest_first: bool = False) -> array:
+        """
+        Get the commits in topological order
+
+            :param newest_first: Children before parents instead, defaults to False
+            :return: The commit indexes
+        """
+        order = array("I", range(len(self)))
+        if newest_first:
+            order.reverse()
+        return order
+
+    def reachable(self, tips: Iterable[int]) -> bytearray:
+        """
+        Find the commits reachable from tips, with a single
+        pass as parents always have lower indexes
+
+            :param tips: The commit indexes to start from
+            :return: A mask of 1 for reachable commits, by index
+        """
+        mask = bytearray(len(self))
+        for tip in tips:
+            mask[tip] = 1
+        parents = self.parents
+        offsets = self.parent_offsets
+        for index in range(len(self) - 1, -1, -1):
+            if mask[index]:
+                for position in range(offsets[index], offsets[index + 1]):
+                    mask[parents[position]] = 1
+        return mask
+
+    def commits_per_day(self, mask: bytearray | None = None) -> dict[date, int]:
+        """
+        Count the commits made each (UTC) day
+
+            :param mask: Only count commits where this is 1 (e.g. from reachable),
+                         defaults to None
+            :return: The count by day, ordered by day
+        """
+        days = (timestamp // 86400 for timestamp in self.timestamps)
+        if mask is not None:
+            days = (day for day, selected in zip(days, mask, strict=True) if selected)
+        counts = Counter(days)
+        return {_EPOCH + timedelta(days=day): counts[day] for day in sorted(counts)}
+
+    def commits_per_author(self, mask: bytearray | None = None) -> dict[str, int]:
+        """
+        Count the commits of each author
+
+            :param mask: Only count commits where this is 1, defaults to None
+            :return: The count by author email, most commits first
+        """
+        author_ids = self.author_ids
+        if mask is not None:
+            author_ids = (
+                author_id for author_id, selected in zip(author_ids, mask, strict=True) if selected
+            )
+        return {
+            self.authors[author_id]: count for author_id, count in Counter(author_ids).most_common()
+        }
+
+
+async def load_commit_dag(
+    git_repo: Path | str,
+    revisions: Sequence[str] | None = None,
+    qos: QoSClass | QoSProfile | None = QoSClass.BATCH,
+) -> CommitDAG:
+    """
+    Load the commit graph with a single streamed 'log'
+
+        :param git_repo: Path to the repo
+        :param revisions: Revisions or ranges to load, defaults to None (all refs)
+        :param qos: Resource class or profile to run with, defaults to QoSClass.BATCH
+        :raises GitException: Error to do with git (e.g. unknown revision)
+        :return: The graph
+    """
+    args = [
+        "git",
+        "-C",
+        str(git_repo),
+        "log",
+        "--topo-order",
+        "--reverse",
+        "--format=%H %P%x1f%ct%x1f%aE",
+    ]
+    if revisions is None:
+        args.append("--all")
+    args.append("--end-of-options")
+    args.extend(revisions or ())
+    args.append("--")
+
+    dag = CommitDAG()
+    try:
+        async with aclosing(subprocess_run_buffered(args, qos)) as chunks:
+            async for line in line_yielder(chunks):
+                commits, timestamp, author = line.decode().split("\x1f")
+                object_id, *parents = commits.split()
+                dag._add(object_id, parents, int(timestamp), author)
+    except BufferedProcessError as err:
+        raise GitException(err.args[0].decode()) from err
+    return dag
@@ -6,7 +6,24 @@ from datetime import datetime
 from enum import Enum
 from pathlib import Path
 
-__all__ = ["Log", "ArchiveTypes"]
+__all__ = [
+    "Log",
+    "ArchiveTypes",
+    "BlameRange",
+    "GrepMatch",
+    "GitObject",
+    "PushEvent",
+    "RepoInfo",
+    "ReplicationStatus",
+    "FastImportProgress",
+    "RefUpdateFailure",
+    "MergeConflict",
+    "MergeResult",
+    "StatsPeriod",
+    "ContributorStat",
+    "PeriodStat",
+    "LanguageStat",
+]
 
 
 class ArchiveTypes(Enum):
@@ -26,6 +43,7 @@ class TreeContentTypes(Enum):
 
     TREE = "tree"
     BLOB = "blob"
+    COMMIT = "commit"
 
 
 @dataclass
@@ -65,3 +83,196 @@ class TreeContent:
                 kwargs["object_size"] = int(kwargs["object_size"])
         kwargs["file"] = Path(kwargs["file"])
         return cls(**kwargs)
+
+
+@dataclass
+class BlameRange:
+    """
+    Represents a range of lines attributed
+    to a single commit by 'blame'
+    """
+
+    commit_hash: str
+    original_line: int
+    final_line: int
+    line_count: int
+    author_name: str
+    author_email: str
+    author_date: datetime
+    summary: str
+    filename: str
+    previous_hash: str | None = None
+    boundary: bool = False
+
+
+@dataclass
+class GrepMatch:
+    """
+    Represents a single line matched by 'grep'
+    """
+
+    path: str
+    line_number: int
+    column: int
+    line: str
+
+
+@dataclass
+class GitObject:
+    """
+    Represents a single object read from the object database
+    """
+
+    object_: str
+    type_: str
+    content: bytes
+
+
+@dataclass
+class PushEvent:
+    """
+    Represents a ref update requested by a push
+    """
+
+    git_repo: Path
+    ref: str
+    old_hash: str
+    new_hash: str
+    success: bool
+    reason: str | None = None
+
+
+@dataclass
+class RepoInfo:
+    """
+    Represents a repo known by a registry
+    """
+
+    name: str
+    """path relative to the registry root, e.g. 'user/project.git'"""
+    path: Path
+    head: str | None
+    """what HEAD points to, a ref or a commit hash when detached"""
+    description: str
+    size: int
+    """size of the object database in bytes"""
+    last_push: datetime | None = None
+
+
+@dataclass
+class ReplicationStatus:
+    """
+    Represents a repo waiting to be replicated
+    """
+
+    name: str
+    queued_at: datetime
+    """when the oldest push not yet on every replica was received"""
+    lag: float
+    """seconds since queued_at"""
+    attempts: int = 0
+    last_error: str | None = None
+
+
+@dataclass
+class FastImportProgress:
+    """
+    Represents the progress of a fast-import
+    """
+
+    commits: int
+    blobs: int
+    bytes_written: int
+    """bytes of commands and data written to git"""
+    checkpoints: int
+    elapsed: float
+    """seconds since the import started"""
+    commits_per_second: float
+    bytes_per_second: float
+
+
+@dataclass
+class RefUpdateFailure:
+    """
+    Represents a ref that could not be changed
+    """
+
+    ref: str
+    reason: str
+
+
+@dataclass
+class MergeConflict:
+    """
+    Represents a conflict found when merging
+    """
+
+    conflict_type: str
+    """e.g. 'contents' or 'modify/delete'"""
+    paths: tuple[str, ...]
+    message: str
+
+
+@dataclass
+class MergeResult:
+    """
+    Represents the result of merging two commits
+    """
+
+    ours: str
+    theirs: str
+    tree: str
+    """merged tree, conflicted files contain conflict markers"""
+    clean: bool
+    conflicts: tuple[MergeConflict, ...] = ()
+    conflicted_paths: tuple[str, ...] = ()
+
+
+class StatsPeriod(Enum):
+    """
+    Periods statistics can be grouped by
+    """
+
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+    YEAR = "year"
+
+
+@dataclass
+class ContributorStat:
+    """
+    Represents the totals of a single author
+    """
+
+    email: str
+    name: str
+    commits: int
+    additions: int
+    deletions: int
+    first_commit: datetime
+    last_commit: datetime
+
+
+@dataclass
+class PeriodStat:
+    """
+    Represents the totals of a period (e.g. '2024-01' for a month, '2024-W01' for a week)
+    """
+
+    period: str
+    commits: int
+    additions: int
+    deletions: int
+
+
+@dataclass
+class LanguageStat:
+    """
+    Represents the totals of a single language in a revision
+    """
+
+    language: str
+    files: int
+    lines: int
+    bytes: int
@@ -64,3 +64,35 @@ class PathDoesNotExistInRevException(GitException):
     """
     Raised when a path does not exist in a repository
     """
+
+
+class PayloadTooLargeError(Exception):
+    """
+    Raised when a received payload is larger than allowed
+    """
+
+
+class UnsupportedEncodingError(Exception):
+    """
+    Raised when a payload uses an unsupported (or invalid) encoding
+    """
+
+
+class MigrationException(GitException):
+    """
+    Raised when a repository could not be
+    migrated between storage roots
+    """
+
+
+class RefUpdateConflictException(GitException):
+    """
+    Raised when a ref is not at the expected
+    value when updating it (compare-and-swap)
+    """
+
+
+class MergeConflictException(GitException):
+    """
+    Raised when commits can not be merged without conflicts
+    """
@@ -0,0 +1,403 @@
+"""
+Streaming of history into a repo with a single long-lived
+'fast-import' process, for bulk imports (e.g. from other VCSes)
+"""
+import asyncio
+import time
+from collections.abc import AsyncIterable, Callable, Mapping, Sequence
+from datetime import datetime
+from pathlib import Path
+
+import aiofiles
+import aiofiles.os
+import aiofiles.tempfile
+from typing_extensions import Self
+
+from .constants import DEFAULT_BUFFER_SIZE
+from .datatypes import FastImportProgress
+from .exceptions import GitException
+from .helpers import (
+    create_subprocess,
+    ensure_path,
+    get_data_dir,
+    kill_process_group,
+    quote_path,
+    subprocess_run,
+)
+
+__all__ = [
+    "Identity",
+    "FileContent",
+    "FileChange",
+    "FILE_MODE",
+    "EXECUTABLE_MODE",
+    "SYMLINK_MODE",
+    "FastImportWriter",
+]
+
+Identity = tuple[str, str, datetime]
+"""
+(name, email, date) of a author or committer, date must be timezone aware
+"""
+FileContent = bytes | AsyncIterable[bytes] | str
+"""
+Content of a file, or a ':<mark>' or object id of a existing blob
+"""
+FileChange = FileContent | tuple[str, FileContent] | None
+"""
+A file's content, a (mode, content) pair for other modes than a regular file
+(e.g. '100755' for a executable or '120000' for a symlink), or None to remove the path
+"""
+
+FILE_MODE = "100644"
+EXECUTABLE_MODE = "100755"
+SYMLINK_MODE = "120000"
+
+
+def _format_identity(identity: Identity) -> bytes:
+    name, email, date = identity
+    offset = int(date.utcoffset().total_seconds() // 60)
+    sign = "-" if offset < 0 else "+"
+    offset = abs(offset)
+    return (
+        f"{name} <{email}> {int(date.timestamp())} {sign}{offset // 60:02d}{offset % 60:02d}"
+    ).encode()
+
+
+def _format_object(object_: int | str) -> bytes:
+    if isinstance(object_, int):
+        return b":%d" % object_
+    return object_.encode()
+
+
+class FastImportWriter:
+    """
+    Writes blobs, commits and ref updates to one 'fast-import' process,
+    waiting for git to read each part so memory stays bounded.
+
+    Marks (numbers given to written objects) are saved at every
+    checkpoint, so a interrupted import can be resumed by skipping
+    anything where is_imported() is True.
+
+    .. code-block:: python
+
+        async with FastImportWriter(git_repo) as writer:
+            for mark, commit in enumerate(exported_commits, 1):
+                if not writer.is_imported(mark):
+                    await writer.write_commit("refs/heads/main", mark, ...)
+    """
+
+    def __init__(
+        self,
+        git_repo: Path | str,
+        marks_file: Path | str | None = None,
+        checkpoint_interval: int | None = 10000,
+        on_progress: Callable[[FastImportProgress], None] | None = None,
+        force: bool = False,
+    ):
+        """
+            :param git_repo: Path to the repo
+            :param marks_file: Where marks are saved,
+                               defaults to 'fast-import.marks' in the repo's data directory
+            :param checkpoint_interval: Commits between automatic checkpoints,
+                                        None to only checkpoint when asked, defaults to 10000
+            :param on_progress: Called with the progress after each checkpoint, defaults to None
+            :param force: Allow ref updates that are not fast-forwards, defaults to False
+        """
+        self._git_repo = git_repo
+        self._marks_file = ensure_path(marks_file) if marks_file else None
+        self._checkpoint_interval = checkpoint_interval
+        self._on_progress = on_progress
+        self._force = force
+        self._null_object_id: str | None = None
+        self._written_refs: set[str] = set()
+        self._process: asyncio.subprocess.Process | None = None
+        self._imported_marks: set[int] = set()
+        self._progress_lines: asyncio.Queue[bytes] = asyncio.Queue()
+        self._reader: asyncio.Task | None = None
+        self._started_at = 0.0
+        self._commits = 0
+        self._blobs = 0
+        self._bytes_written = 0
+        self._checkpoints = 0
+        self._commits_since_checkpoint = 0
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, *_):
+        if exc_type is not None:
+            await self.abort()
+        else:
+            await self.close()
+
+    @property
+    def marks_file(self) -> Path:
+        """
+        Where marks are saved
+        """
+        if self._marks_file is None:
+            self._marks_file = get_data_dir(self._git_repo) / "fast-import.marks"
+        return self._marks_file
+
+    @property
+    def progress(self) -> FastImportProgress:
+        """
+        The progress of this import
+        """
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return FastImportProgress(
+            commits=self._commits,
+            blobs=self._blobs,
+            bytes_written=self._bytes_written,
+            checkpoints=self._checkpoints,
+            elapsed=elapsed,
+            commits_per_second=self._commits / elapsed if elapsed else 0.0,
+            bytes_per_second=self._bytes_written / elapsed if elapsed else 0.0,
+        )
+
+    async def get_marks(self) -> dict[int, str]:
+        """
+        Read the saved marks, only complete after a checkpoint or close
+
+            :return: The object id of each mark
+        """
+        if not await aiofiles.os.path.exists(self.marks_file):
+            return {}
+        async with aiofiles.open(self.marks_file, "rb") as fo:
+            lines = (await fo.read()).splitlines()
+        return {int(mark[1:]): object_id.decode() for mark, object_id in map(bytes.split, lines)}
+
+    def is_imported(self, mark: int) -> bool:
+        """
+        Whether a mark was saved by a previous import (as of its last checkpoint)
+
+            :param mark: The mark
+            :return: Whether it was imported
+        """
+        return mark in self._imported_marks
+
+    async def start(self):
+        """
+        Start the git process, called automatically when used as a context manager
+        """
+        await aiofiles.os.makedirs(self.marks_file.parent, exist_ok=True)
+        self._imported_marks = set(await self.get_marks())
+        # relative paths would be relative to the repo
+        marks_file = self.marks_file.absolute()
+        args = [
+            "git",
+            "-C",
+            str(self._git_repo),
+            "fast-import",
+            "--quiet",
+            "--done",
+            f"--import-marks-if-exists={marks_file}",
+            f"--export-marks={marks_file}",
+        ]
+        if self._force:
+            args.append("--force")
+        self._process = await create_subprocess(args, stdin=asyncio.subprocess.PIPE)
+        self._reader = asyncio.create_task(self._read_progress())
+        self._started_at = time.monotonic()
+
+    async def _read_progress(self):
+        while line := await self._process.stdout.readline():
+            await self._progress_lines.put(line)
+
+    async def _raise_exited(self, err: Exception | None = None):
+        await self._process.wait()
+        raise GitException((await self._process.stderr.read()).decode()) from err
+
+    async def _write(self, *parts: bytes):
+        if self._process is None:
+            raise GitException("writer has not been started")
+        for part in parts:
+            self._process.stdin.write(part)
+            self._bytes_written += len(part)
+        try:
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as err:
+            await self._raise_exited(err)
+
+    async def _write_data(self, content: bytes | AsyncIterable[bytes]):
+        """
+        Write a 'data' command, async sources are spooled
+        to a temporary file as the size must be known first
+        """
+        if isinstance(content, bytes | bytearray | memoryview):
+            await self._write(b"data %d\n" % len(content), content, b"\n")
+            return
+
+        async with aiofiles.tempfile.TemporaryFile("w+b") as spool:
+            size = 0
+            async for chunk in content:
+                size += len(chunk)
+                await spool.write(chunk)
+            await spool.seek(0)
+            await self._write(b"data %d\n" % size)
+            while chunk := await spool.read(DEFAULT_BUFFER_SIZE):
+                await self._write(chunk)
+        await self._write(b"\n")
+
+    async def write_blob(self, mark: int, content: bytes | AsyncIterable[bytes]):
+        """
+        Write a blob, so it can be used by commits
+
+            :param mark: The mark to give the blob
+            :param content: The content
+            :raises GitException: Error to do with git
+        """
+        await self._write(b"blob\nmark :%d\n" % mark)
+        await self._write_data(content)
+        self._blobs += 1
+
+    async def write_commit(
+        self,
+        ref: str,
+        mark: int,
+        message: str,
+        committer: Identity,
+        files: Mapping[str, FileChange],
+        parents: Sequence[int | str] = (),
+        author: Identity | None = None,
+    ):
+        """
+        Write a commit, updating the ref to it
+
+            :param ref: The full ref (e.g. 'refs/heads/main')
+            :param mark: The mark to give the commit
+            :param message: The commit message
+            :param committer: The committer
+            :param files: Changes from the first parent by path,
+                          content can be given with a mode as (mode, content)
+            :param parents: Marks or object ids of the parents, when empty the commit
+                            follows the ref's current commit (if any), defaults to ()
+            :param author: The author, defaults to the committer
+            :raises GitException: Error to do with git
+        """
+        # fast-import only follows refs it has written, existing refs
+        # (e.g. when resuming with a new process) must be given as the parent
+        follow_existing = (
+            not parents and ref not in self._written_refs and await self._ref_exists(ref)
+        )
+        self._written_refs.add(ref)
+        await self._write(
+            b"commit %s\nmark :%d\n" % (ref.encode(), mark),
+            b"author %s\n" % _format_identity(author or committer),
+            b"committer %s\n" % _format_identity(committer),
+        )
+        await self._write_data(message.encode())
+        if follow_existing:
+            await self._write(b"from %s^0\n" % ref.encode())
+        elif parents:
+            await self._write(b"from %s\n" % _format_object(parents[0]))
+            for parent in parents[1:]:
+                await self._write(b"merge %s\n" % _format_object(parent))
+
+        for path, change in files.items():
+            quoted_path = quote_path(path.encode())
+            if change is None:
+                await self._write(b"D %s\n" % quoted_path)
+                continue
+            mode, content = change if isinstance(change, tuple) else (FILE_MODE, change)
+            if isinstance(content, str):
+                await self._write(b"M %s %s %s\n" % (mode.encode(), content.encode(), quoted_path))
+            else:
+                await self._write(b"M %s inline %s\n" % (mode.encode(), quoted_path))
+                await self._write_data(content)
+                self._blobs += 1
+        await self._write(b"\n")
+
+        self._commits += 1
+        self._commits_since_checkpoint += 1
+        if (
+            self._checkpoint_interval is not None
+            and self._commits_since_checkpoint >= self._checkpoint_interval
+        ):
+            await self.checkpoint()
+
+    async def reset(self, ref: str, commit: int | str | None = None):
+        """
+        Point a ref at a commit, or delete it when None
+
+            :param ref: The full ref (e.g. 'refs/tags/v1')
+            :param commit: The mark or object id, defaults to None
+            :raises GitException: Error to do with git
+        """
+        self._written_refs.add(ref)
+        if commit is None:
+            # only the null object id deletes, 'reset' without 'from' leaves the ref
+            commit = await self._get_null_object_id()
+        await self._write(b"reset %s\nfrom %s\n\n" % (ref.encode(), _format_object(commit)))
+
+    async def _ref_exists(self, ref: str) -> bool:
+        args = ["git", "-C", str(self._git_repo), "rev-parse", "--verify", "--quiet"]
+        process_status = await subprocess_run([*args, "--end-of-options", f"{ref}^{{commit}}"])
+        return process_status.returncode == 0
+
+    async def _get_null_object_id(self) -> str:
+        """
+        Get the null object id, its length depends on the repo's hash (sha1 or sha256)
+        """
+        if self._null_object_id is None:
+            args = ["git", "-C", str(self._git_repo), "rev-parse", "--show-object-format"]
+            process_status = await subprocess_run(args)
+            if process_status.returncode != 0:
+                raise GitException(process_status.stderr.decode())
+            object_format = process_status.stdout.decode().strip()
+            self._null_object_id = "0" * (64 if object_format == "sha256" else 40)
+        return self._null_object_id
+
+    async def checkpoint(self):
+        """
+        Wait for git to write everything so far (objects, refs and marks) to disk
+
+            :raises GitException: Error to do with git
+        """
+        self._checkpoints += 1
+        await self._write(b"checkpoint\n\nprogress checkpoint %d\n\n" % self._checkpoints)
+        line = await self._wait_progress()
+        if line != b"progress checkpoint %d\n" % self._checkpoints:
+            msg = f"unexpected fast-import output: {line!r}"
+            raise GitException(msg)
+        self._commits_since_checkpoint = 0
+        if self._on_progress is not None:
+            self._on_progress(self.progress)
+
+    async def _wait_progress(self) -> bytes:
+        get_line = asyncio.ensure_future(self._progress_lines.get())
+        await asyncio.wait((get_line, self._reader), return_when=asyncio.FIRST_COMPLETED)
+        if not get_line.done():
+            # stdout closed, so git has exited
+            get_line.cancel()
+            await self._raise_exited()
+        return get_line.result()
+
+    async def close(self):
+        """
+        Finish the import, called automatically when used as a context manager
+
+            :raises GitException: Error to do with git
+        """
+        if self._process is None:
+            return
+        await self._write(b"done\n")
+        self._process.stdin.write_eof()
+        await self._reader
+        process, self._process = self._process, None
+        if await process.wait() != 0:
+            raise GitException((await process.stderr.read()).decode())
+        if self._on_progress is not None:
+            self._on_progress(self.progress)
+
+    async def abort(self):
+        """
+        Stop git without finishing, anything after the last checkpoint is discarded
+        """
+        if self._process is None:
+            return
+        await kill_process_group(self._process)
+        self._reader.cancel()
+        self._process = None
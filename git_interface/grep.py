@@ -0,0 +1,152 @@
+"""
+Methods for using the 'grep' command
+"""
+import asyncio
+import re
+from collections.abc import AsyncGenerator, Iterable, Sequence
+from contextlib import aclosing
+from pathlib import Path
+
+from .constants import UNABLE_TO_RESOLVE_REV_RE
+from .datatypes import GrepMatch
+from .exceptions import BufferedProcessError, GitException, UnknownRevisionException
+from .helpers import line_yielder, subprocess_run_buffered
+
+__all__ = [
+    "grep",
+    "grep_repos",
+]
+
+
+def _process_match(line: bytes, path_prefix: str) -> GrepMatch:
+    path, line_number, column, content = line.split(b"\0", 3)
+    return GrepMatch(
+        path=path.decode(errors="surrogateescape").removeprefix(path_prefix),
+        line_number=int(line_number),
+        column=int(column),
+        line=content.decode(errors="replace"),
+    )
+
+
+async def grep(
+    git_repo: Path | str,
+    pattern: str,
+    tree_ish: str = "HEAD",
+    pathspecs: Sequence[str] = (),
+    ignore_case: bool = False,
+    fixed_strings: bool = False,
+    max_results: int | None = None,
+    threads: int = 0,
+) -> AsyncGenerator[GrepMatch, None]:
+    """
+    Search the files of a revision (does not require a working tree),
+    yielding matches as git finds them. Closing the generator
+    early will stop git searching.
+
+        :param git_repo: Path to the repo
+        :param pattern: The (extended) regular expression to search for
+        :param tree_ish: The tree ish to search (branch name, HEAD), defaults to "HEAD"
+        :param pathspecs: Limit search to these paths, defaults to ()
+        :param ignore_case: Whether to ignore case, defaults to False
+        :param fixed_strings: Treat pattern as a fixed string, defaults to False
+        :param max_results: Stop after this many matches, defaults to None
+        :param threads: Worker threads git will use, 0 uses all cores, defaults to 0
+        :raises UnknownRevisionException: Unknown tree_ish
+        :raises GitException: Error to do with git, including an invalid pattern
+        :yield: Each match
+    """
+    args = [
+        "git",
+        "-C",
+        str(git_repo),
+        "grep",
+        f"--threads={threads}",
+        "--line-number",
+        "--column",
+        "--null",
+        "-I",
+        "--fixed-strings" if fixed_strings else "--extended-regexp",
+    ]
+    if ignore_case:
+        args.append("--ignore-case")
+    args.extend(("-e", pattern, tree_ish, "--", *pathspecs))
+
+    path_prefix = f"{tree_ish}:"
+    result_count = 0
+
+    try:
+        async with aclosing(subprocess_run_buffered(args)) as chunks:
+            async for line in line_yielder(chunks):
+                yield _process_match(line, path_prefix)
+                result_count += 1
+                if max_results is not None and result_count >= max_results:
+                    return
+    except BufferedProcessError as err:
+        stderr = err.args[0].decode()
+        if err.args[1] == 1 and not stderr:
+            # nothing matched
+            return
+        if re.match(UNABLE_TO_RESOLVE_REV_RE, stderr):
+            msg = f"Unknown tree-ish '{tree_ish}'"
+            raise UnknownRevisionException(msg) from err
+        raise GitException(stderr) from err
+
+
+async def grep_repos(
+    git_repos: Iterable[Path | str],
+    pattern: str,
+    tree_ish: str = "HEAD",
+    max_concurrency: int = 4,
+    max_results: int | None = None,
+    **kwargs,
+) -> AsyncGenerator[tuple[Path | str, GrepMatch], None]:
+    """
+    Search many repos concurrently, yielding matches from
+    each repo as they are found (so repos will be interleaved).
+    Closing the generator early will stop all searches.
+
+        :param git_repos: Paths to the repos
+        :param pattern: The (extended) regular expression to search for
+        :param tree_ish: The tree ish to search in each repo, defaults to "HEAD"
+        :param max_concurrency: Max repos searched at once, defaults to 4
+        :param max_results: Stop after this many matches in total, defaults to None
+        :param kwargs: Other arguments given to grep()
+        :raises UnknownRevisionException: Unknown tree_ish in one of the repos
+        :raises GitException: Error to do with git
+        :yield: The repo and match
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results: asyncio.Queue = asyncio.Queue(max_concurrency * 64)
+    finished = object()
+
+    async def search_repo(git_repo: Path | str):
+        try:
+            async with semaphore, aclosing(grep(git_repo, pattern, tree_ish, **kwargs)) as matches:
+                async for match in matches:
+                    await results.put((git_repo, match))
+        except Exception as err:  # noqa: BLE001
+            # re-raised by the consumer, ending the search
+            await results.put(err)
+        else:
+            await results.put(finished)
+
+    tasks = [asyncio.create_task(search_repo(git_repo)) for git_repo in git_repos]
+    remaining = len(tasks)
+    result_count = 0
+
+    try:
+        while remaining:
+            result = await results.get()
+            if result is finished:
+                remaining -= 1
+                continue
+            if isinstance(result, Exception):
+                raise result
+            yield result
+            result_count += 1
+            if max_results is not None and result_count >= max_results:
+                return
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
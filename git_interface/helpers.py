@@ -3,21 +3,143 @@ Methods not related to git commands,
 but to help the program function
 """
 import asyncio
-from collections.abc import AsyncGenerator, Sequence
+import os
+import re
+import shutil
+import signal
+from collections.abc import AsyncGenerator, AsyncIterable, Sequence
+from dataclasses import dataclass, field
+from enum import Enum
 from pathlib import Path
 from subprocess import CompletedProcess
 
 from .constants import DEFAULT_BUFFER_SIZE
 from .exceptions import BufferedProcessError
+from .shared import logger
 
 __all__ = [
+    "QoSClass",
+    "QoSProfile",
+    "QOS_PROFILES",
+    "SubprocessStats",
+    "subprocess_stats",
     "ensure_path",
+    "quote_path",
+    "get_data_dir",
     "chunk_yielder",
+    "line_yielder",
+    "create_subprocess",
+    "kill_process_group",
     "subprocess_run",
     "subprocess_run_buffered",
 ]
 
 
+@dataclass
+class SubprocessStats:
+    """
+    Counters for the git processes that have been started
+    """
+
+    started: int = 0
+    aborted: int = 0
+    timed_out: int = 0
+
+
+subprocess_stats = SubprocessStats()
+
+
+class QoSClass(Enum):
+    """
+    Resource classes a git process can be run with
+    """
+
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+    BACKGROUND = "background"
+
+
+@dataclass
+class QoSProfile:
+    """
+    Resource limits applied to a git process (and the processes it starts),
+    limits that are not supported by the system are skipped
+    """
+
+    nice: int = 0
+    """nice level to add"""
+    ionice_class: int | None = None
+    """io scheduling class (1=realtime, 2=best-effort, 3=idle), requires 'ionice'"""
+    ionice_level: int | None = None
+    """io scheduling priority (0-7) for the class"""
+    memory_limit: int | None = None
+    """max virtual memory in bytes, requires 'prlimit'"""
+    cgroup: Path | None = None
+    """cgroup (v2) directory to run in, e.g. one with 'memory.max' set"""
+    git_config: dict[str, str] = field(default_factory=dict)
+    """config given to git with '-c'"""
+
+
+QOS_PROFILES: dict[QoSClass, QoSProfile] = {
+    QoSClass.INTERACTIVE: QoSProfile(),
+    QoSClass.BATCH: QoSProfile(
+        nice=10,
+        ionice_class=2,
+        ionice_level=7,
+        git_config={
+            "pack.threads": "2",
+            "pack.windowMemory": "256m",
+            "core.deltaBaseCacheLimit": "64m",
+        },
+    ),
+    QoSClass.BACKGROUND: QoSProfile(
+        nice=19,
+        ionice_class=3,
+        git_config={
+            "pack.threads": "1",
+            "pack.windowMemory": "64m",
+            "core.deltaBaseCacheLimit": "16m",
+        },
+    ),
+}
+"""
+Profile used for each class, can be changed to suit the system
+"""
+
+
+def _apply_qos(args: Sequence[str], qos: QoSClass | QoSProfile | None) -> list[str]:
+    """
+    Wrap the arguments with commands that apply the profile,
+    so the limits are inherited by any processes git starts
+    """
+    args = list(args)
+    if qos is None:
+        return args
+    profile = QOS_PROFILES[qos] if isinstance(qos, QoSClass) else qos
+
+    if args[0] == "git":
+        for name, value in profile.git_config.items():
+            args[1:1] = ["-c", f"{name}={value}"]
+
+    prefix = []
+    if profile.cgroup is not None:
+        # moves itself into the cgroup before becoming the command
+        cgroup_procs = str(profile.cgroup / "cgroup.procs")
+        prefix.extend(("sh", "-c", 'echo $$ > "$0" && exec "$@"', cgroup_procs))
+    if profile.nice and shutil.which("nice"):
+        prefix.extend(("nice", "-n", str(profile.nice)))
+    if profile.ionice_class is not None and shutil.which("ionice"):
+        prefix.extend(("ionice", "-c", str(profile.ionice_class)))
+        if profile.ionice_level is not None:
+            prefix.extend(("-n", str(profile.ionice_level)))
+    if profile.memory_limit is not None and shutil.which("prlimit"):
+        prefix.extend(("prlimit", f"--as={profile.memory_limit}"))
+
+    if not prefix and (profile.nice or profile.ionice_class or profile.memory_limit):
+        logger.debug("no supported commands found to apply qos for: %s", args[0])
+    return prefix + args
+
+
 def ensure_path(path_or_str: Path | str) -> Path:
     """
     Ensures that given value is a pathlib.Path object.
@@ -28,6 +150,46 @@ def ensure_path(path_or_str: Path | str) -> Path:
     return path_or_str if isinstance(path_or_str, Path) else Path(path_or_str)
 
 
+def quote_path(path: bytes) -> bytes:
+    """
+    C-style quote a path when needed, as expected by
+    commands reading paths (e.g. 'fast-import', 'mktree')
+
+        :param path: The path
+        :return: The path, quoted if it has special characters
+    """
+    if not re.search(rb'[\x00-\x1f"\\\x7f]', path):
+        return path
+    quoted = bytearray(b'"')
+    for byte in path:
+        if byte in b'"\\':
+            quoted += b"\\" + bytes((byte,))
+        elif byte == ord("\t"):
+            quoted += b"\\t"
+        elif byte == ord("\n"):
+            quoted += b"\\n"
+        elif byte < 0x20 or byte == 0x7F:
+            quoted += b"\\%03o" % byte
+        else:
+            quoted.append(byte)
+    return bytes(quoted + b'"')
+
+
+def get_data_dir(git_repo: Path | str) -> Path:
+    """
+    Get the directory where data generated for a repo (e.g. indexes)
+    is stored, this is inside the git directory so it is
+    kept with the repo but never committed or pushed.
+
+        :param git_repo: Path to the repo (bare or not)
+        :return: The data directory (may not exist yet)
+    """
+    git_repo = ensure_path(git_repo)
+    if (git_repo / ".git").is_dir():
+        git_repo = git_repo / ".git"
+    return git_repo / "git-interface"
+
+
 async def chunk_yielder(input_stream: asyncio.StreamReader) -> AsyncGenerator[bytes, None]:
     """
     reads from a stream chunk by chunk until EOF.
@@ -40,37 +202,125 @@ async def chunk_yielder(input_stream: asyncio.StreamReader) -> AsyncGenerator[by
         yield chunk
 
 
-async def subprocess_run(args: Sequence[str], **kwargs) -> CompletedProcess[bytes]:
+async def line_yielder(
+    chunks: AsyncIterable[bytes], separator: bytes = b"\n"
+) -> AsyncGenerator[bytes, None]:
     """
-    Asynchronous alternative to using subprocess.run
+    splits chunks of a stream into lines (without the separator),
+    a final line without a trailing separator is also yielded
+
+        :param chunks: The chunks to split
+        :param separator: What separates each line, defaults to b"\n"
+        :yield: Each line
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(separator)
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def create_subprocess(
+    args: Sequence[str], qos: QoSClass | QoSProfile | None = None, **kwargs
+) -> asyncio.subprocess.Process:
+    """
+    Start a process in its own process group, so it and any
+    processes it starts (e.g. pack-objects) can be stopped together
+    using kill_process_group. stdout and stderr are piped by default.
 
         :param args: The arguments to run (len must be at least 1)
-        :return: The completed process
+        :param qos: Resource class or profile to run with, defaults to None
+        :return: The started process
     """
+    args = _apply_qos(args, qos)
+    kwargs.setdefault("stdout", asyncio.subprocess.PIPE)
+    kwargs.setdefault("stderr", asyncio.subprocess.PIPE)
     process = await asyncio.create_subprocess_exec(
-        args[0], *args[1:], stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **kwargs
+        args[0], *args[1:], start_new_session=True, **kwargs
     )
-    stdout, stderr = await process.communicate()
+    subprocess_stats.started += 1
+    return process
+
+
+async def kill_process_group(process: asyncio.subprocess.Process):
+    """
+    Kill a process started by create_subprocess along with
+    any processes it started, waiting for it so no zombie is left.
+    Does nothing when the process has already been reaped.
+
+        :param process: The process
+    """
+    if process.returncode is not None:
+        # once reaped its pid (and group id) can be reused by a unrelated process
+        return
+    subprocess_stats.aborted += 1
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+    await process.wait()
+
+
+async def subprocess_run(
+    args: Sequence[str],
+    timeout: float | None = None,
+    qos: QoSClass | QoSProfile | None = None,
+    input: bytes | None = None,  # noqa: A002
+    **kwargs,
+) -> CompletedProcess[bytes]:
+    """
+    Asynchronous alternative to using subprocess.run,
+    the process is killed if cancelled or the timeout is reached
+
+        :param args: The arguments to run (len must be at least 1)
+        :param timeout: Seconds to wait for the process, defaults to None
+        :param qos: Resource class or profile to run with, defaults to None
+        :param input: Data to send to stdin, defaults to None
+        :raises asyncio.TimeoutError: The timeout was reached
+        :return: The completed process
+    """
+    if input is not None:
+        kwargs["stdin"] = asyncio.subprocess.PIPE
+    process = await create_subprocess(args, qos, **kwargs)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(input), timeout)
+    except asyncio.TimeoutError:
+        subprocess_stats.timed_out += 1
+        await kill_process_group(process)
+        raise
+    except BaseException:
+        await kill_process_group(process)
+        raise
     return CompletedProcess(list(args), process.returncode or 0, stdout, stderr)
 
 
-async def subprocess_run_buffered(args: Sequence[str]) -> AsyncGenerator[bytes, None]:
+async def subprocess_run_buffered(
+    args: Sequence[str], qos: QoSClass | QoSProfile | None = None
+) -> AsyncGenerator[bytes, None]:
     """
-    Asynchronous alternative to using subprocess.Popen using buffered reading
+    Asynchronous alternative to using subprocess.Popen using buffered reading,
+    the process is killed if cancelled or the generator is closed before it finishes
 
         :param args: The arguments to run (len must be at least 1)
+        :param qos: Resource class or profile to run with, defaults to None
         :raises BufferedProcessError: Raised a non-zero return code is provided
         :yield: Each read content section
     """
-    process = await asyncio.create_subprocess_exec(
-        args[0],
-        *args[1:],
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    async for chunk in chunk_yielder(process.stdout):
-        yield chunk
+    process = await create_subprocess(args, qos)
+    try:
+        async for chunk in chunk_yielder(process.stdout):
+            yield chunk
+        return_code = await process.wait()
+    except BaseException:
+        # generator was closed early, stop the process doing any more work
+        await kill_process_group(process)
+        raise
 
-    return_code = await process.wait()
     if return_code != 0:
         raise BufferedProcessError(await process.stderr.read(), return_code)
@@ -1,21 +1,39 @@
 """
 Methods for using the 'log' command
 """
+import asyncio
 import re
 from collections.abc import Iterator
+from contextlib import aclosing
 from datetime import datetime
 from pathlib import Path
 
+from .cache import LRUCache
 from .constants import EMPTY_REPO_RE, UNKNOWN_REV_RE
 from .datatypes import Log
-from .exceptions import GitException, NoCommitsException, NoLogsException, UnknownRevisionException
-from .helpers import subprocess_run
+from .exceptions import (
+    BufferedProcessError,
+    GitException,
+    NoCommitsException,
+    NoLogsException,
+    UnknownRevisionException,
+)
+from .helpers import line_yielder, subprocess_run, subprocess_run_buffered
+from .ls import ls_tree_cached
+from .rev_parse import resolve_revision
 
-__all__ = ["get_logs"]
+__all__ = ["get_logs", "get_last_commits", "last_commits_cache"]
 
 # formats: https://git-scm.com/docs/pretty-formats
 LOG_FMT_STRING = "%H;;%P;;%ae;;%an;;%cI;;%s"
 LOG_PARTS_COUNT = LOG_FMT_STRING.count("%")
+# marks the start of each commit when also listing changed files
+LOG_START_MARKER = "\x01"
+
+last_commits_cache: LRUCache[tuple[str, str], dict[str, Log]] = LRUCache(1024)
+"""
+Complete results of get_last_commits(), keyed by (commit hash, directory path)
+"""
 
 
 def __process_log(stdout_line: str) -> Log:
@@ -85,3 +103,74 @@ async def get_logs(
         raise NoLogsException(msg)
     stdout = process_status.stdout.decode()
     return __process_logs(stdout)
+
+
+async def get_last_commits(
+    git_repo: Path | str,
+    tree_ish: str,
+    path: Path | str | None = None,
+    time_budget: float | None = None,
+) -> tuple[dict[str, Log], bool]:
+    """
+    Get the last commit that modified each entry of a directory,
+    using a single walk of the history that stops once every entry is found.
+    Complete results are cached by the resolved commit and path.
+
+        :param git_repo: Path to the repo
+        :param tree_ish: The tree ish (branch name, HEAD)
+        :param path: The directory, defaults to None (root directory)
+        :param time_budget: Seconds to search for before giving up
+                            and returning partial results, defaults to None
+        :raises UnknownRevisionException: Unknown tree_ish or path is not a directory
+        :raises GitException: Error to do with git
+        :return: The last commit of each entry name and whether every entry was found
+    """
+    commit_hash = await resolve_revision(git_repo, f"{tree_ish}^{{commit}}")
+    path = str(path or "").strip("/")
+    cache_key = (commit_hash, path)
+    if (cached := last_commits_cache.get(cache_key)) is not None:
+        return dict(cached), True
+
+    tree = await ls_tree_cached(git_repo, commit_hash, False, False, path)
+    # listed with '-z', so names are unquoted like the names from 'log -z'
+    pending = {str(entry.file) for entry in tree}
+    last_commits: dict[str, Log] = {}
+    prefix = f"{path}/" if path else ""
+
+    args = ["git", "-C", str(git_repo), "log", "-z", "--name-only", "--no-renames"]
+    args.extend((f"--pretty={LOG_START_MARKER}{LOG_FMT_STRING}", commit_hash, "--"))
+    if path:
+        args.append(path)
+
+    loop = asyncio.get_running_loop()
+    deadline = None if time_budget is None else loop.time() + time_budget
+    current_log = None
+
+    try:
+        async with aclosing(subprocess_run_buffered(args)) as chunks:
+            records = line_yielder(chunks, b"\0")
+            while pending:
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                try:
+                    record = await asyncio.wait_for(records.__anext__(), timeout)
+                except (StopAsyncIteration, asyncio.TimeoutError):
+                    break
+                record = record.lstrip(b"\n")
+                if record.startswith(LOG_START_MARKER.encode()):
+                    # messages may use a legacy encoding, they are only displayed
+                    log_record = record.decode(errors="replace")
+                    current_log = __process_log(log_record.removeprefix(LOG_START_MARKER))
+                    continue
+                # matches the names listed by 'ls-tree', which are not always valid UTF-8
+                name = record.decode(errors="surrogateescape").removeprefix(prefix)
+                name = name.split("/", 1)[0]
+                if name in pending:
+                    pending.remove(name)
+                    last_commits[name] = current_log
+    except BufferedProcessError as err:
+        raise GitException(err.args[0].decode()) from err
+
+    if pending:
+        return last_commits, False
+    last_commits_cache.put(cache_key, last_commits)
+    return dict(last_commits), True
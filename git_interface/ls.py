@@ -1,20 +1,37 @@
 """
 Methods for using the 'ls-tree' command
 """
+import json
 import re
 from collections.abc import Iterator
 from pathlib import Path
 
-from .constants import LS_TREE_LONG_RE, LS_TREE_RE, NOT_VALID_OBJECT_NAME_RE
+from .cache import DiskCache, LRUCache
+from .constants import LS_TREE_LONG_RE, LS_TREE_RE, NOT_VALID_OBJECT_NAME_RE, OBJECT_ID_RE
 from .datatypes import TreeContent
 from .exceptions import GitException, UnknownRevisionException
 from .helpers import subprocess_run
+from .rev_parse import resolve_revision
 
-__all__ = ["ls_tree"]
+__all__ = ["ls_tree", "ls_tree_cached", "tree_cache"]
+
+TREE_CACHE_VERSION = 2
+
+tree_cache: LRUCache[tuple[str, bool, bool], tuple[TreeContent, ...]] = LRUCache(
+    max_size=4096, max_weight=250_000, weigher=len
+)
+"""
+Parsed tree listings, keyed by (tree hash, recursive, use_long),
+the total number of listed entries is used to bound memory use
+"""
+
+# keyed by repo as the commit may only exist in the repo it was resolved in
+_resolved_trees: LRUCache[tuple[str, str], str] = LRUCache(4096)
 
 
 def __ls_tree_process_line(line: str) -> TreeContent:
-    match = re.match(LS_TREE_RE, line)
+    # paths may contain new lines
+    match = re.match(LS_TREE_RE, line, re.DOTALL)
     if match is None:
         raise ValueError("regex must have match")
     groups = match.groups()
@@ -28,7 +45,8 @@ def __ls_tree_process_line(line: str) -> TreeContent:
 
 
 def __ls_tree_process_line_long(line: str) -> TreeContent:
-    match = re.match(LS_TREE_LONG_RE, line)
+    # paths may contain new lines
+    match = re.match(LS_TREE_LONG_RE, line, re.DOTALL)
     if match is None:
         raise ValueError("regex must have match")
     groups = match.groups()
@@ -57,7 +75,8 @@ async def ls_tree(
         :raises GitException: Error to do with git
         :return: The git tree
     """
-    args = ["git", "-C", str(git_repo), "ls-tree"]
+    # '-z' so paths are not C-quoted (e.g. non-ASCII names)
+    args = ["git", "-C", str(git_repo), "ls-tree", "-z"]
 
     if use_long:
         args.append("-l")
@@ -75,8 +94,92 @@ async def ls_tree(
             raise UnknownRevisionException(msg)
         raise GitException(stderr)
 
-    split_lines = process_status.stdout.decode().strip().split("\n")
+    if not process_status.stdout:
+        # an empty tree
+        return iter(())
+
+    stdout = process_status.stdout.decode(errors="surrogateescape")
+    split_lines = stdout.removesuffix("\0").split("\0")
 
     if use_long:
         return map(__ls_tree_process_line_long, split_lines)
     return map(__ls_tree_process_line, split_lines)
+
+
+def _tree_to_json(tree: tuple[TreeContent, ...]) -> bytes:
+    return json.dumps(
+        [
+            (entry.mode, entry.type_.value, entry.object_, str(entry.file), entry.object_size)
+            for entry in tree
+        ]
+    ).encode()
+
+
+def _tree_from_json(raw: bytes) -> tuple[TreeContent, ...]:
+    return tuple(
+        TreeContent.from_str_values(
+            mode=mode, type_=type_, object_=object_, file=file, object_size=object_size
+        )
+        for mode, type_, object_, file, object_size in json.loads(raw)
+    )
+
+
+async def _resolve_tree(git_repo: Path | str, tree_ish: str, path: Path | str | None) -> str:
+    path = str(path or "").strip("/")
+    # trailing slash ensures the path is a directory
+    revision = f"{tree_ish}:{path}/" if path else f"{tree_ish}^{{tree}}"
+    # when given a object id the resolved tree can never change
+    immutable = re.match(OBJECT_ID_RE, tree_ish) is not None
+    memo_key = (str(git_repo), revision)
+    if immutable and (tree_hash := _resolved_trees.get(memo_key)) is not None:
+        return tree_hash
+    tree_hash = await resolve_revision(git_repo, revision)
+    if immutable:
+        _resolved_trees.put(memo_key, tree_hash)
+    return tree_hash
+
+
+async def ls_tree_cached(
+    git_repo: Path | str,
+    tree_ish: str,
+    recursive: bool,
+    use_long: bool,
+    path: Path | str | None = None,
+    disk_cache: DiskCache | None = None,
+) -> tuple[TreeContent, ...]:
+    """
+    Get the contents of a directory in repo, using a cache keyed by tree hash,
+    so identical directories across branches (and repos) are only listed once.
+
+    Unlike ls_tree, path must be a directory and listed
+    files are relative to it (not the repo root).
+
+        :param git_repo: Path to the repo
+        :param tree_ish: The tree ish (branch name, HEAD)
+        :param recursive: Whether tree is recursive
+        :param use_long: Whether to get object sizes
+        :param path: The directory to list, defaults to None (root directory)
+        :param disk_cache: Also cache listings on disk, defaults to None
+        :raises UnknownRevisionException: Unknown tree_ish or path is not a directory
+        :raises GitException: Error to do with git
+        :return: The git tree
+    """
+    tree_hash = await _resolve_tree(git_repo, tree_ish, path)
+
+    # a listing with sizes can also be used when sizes are not needed
+    for key in ((tree_hash, recursive, True), (tree_hash, recursive, use_long)):
+        if (tree := tree_cache.get(key)) is not None:
+            return tree
+
+    key = (tree_hash, recursive, use_long)
+    # versioned, listings stored before paths were unquoted are not used
+    disk_key = f"{tree_hash}-{int(recursive)}{int(use_long)}-v{TREE_CACHE_VERSION}"
+    if disk_cache is not None and (raw := await disk_cache.get(disk_key)) is not None:
+        tree = _tree_from_json(raw)
+    else:
+        tree = tuple(await ls_tree(git_repo, tree_hash, recursive, use_long))
+        if disk_cache is not None:
+            await disk_cache.put(disk_key, _tree_to_json(tree))
+
+    tree_cache.put(key, tree)
+    return tree
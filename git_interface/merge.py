@@ -0,0 +1,162 @@
+"""
+Methods for merging in (bare) repos without a working tree,
+using 'merge-tree --write-tree' (git 2.38+)
+"""
+import asyncio
+from collections.abc import Iterable
+from pathlib import Path
+
+from .cache import LRUCache
+from .commit import commit_tree
+from .datatypes import MergeConflict, MergeResult
+from .exceptions import GitException, MergeConflictException
+from .helpers import subprocess_run
+from .rev_parse import resolve_revision
+from .update_ref import RefTransaction
+
+__all__ = [
+    "merge_cache",
+    "merge_commits",
+    "check_mergeable",
+    "create_merge_commit",
+]
+
+# keyed by repo as the merged tree is only written to the repo that merged
+merge_cache: LRUCache[tuple[str, str, str], MergeResult] = LRUCache(1024)
+
+
+def _parse_merge_tree(ours: str, theirs: str, stdout: bytes, clean: bool) -> MergeResult:
+    """
+    Parse the '-z' output of 'merge-tree --write-tree', which is the tree,
+    then when not clean the conflicted files and messages sections
+    """
+    tree, _, rest = stdout.partition(b"\0")
+    if clean:
+        return MergeResult(ours, theirs, tree.decode(), True)
+
+    if rest.startswith(b"\0"):
+        # no conflicted files, e.g. only a rename conflict
+        files_section, messages_section = b"", rest[1:]
+    else:
+        files_section, _, messages_section = rest.partition(b"\0\0")
+    conflicted_paths = []
+    for line in files_section.split(b"\0"):
+        if not line:
+            continue
+        path = line.split(b"\t", 1)[1].decode()
+        if path not in conflicted_paths:
+            conflicted_paths.append(path)
+
+    conflicts = []
+    fields = messages_section.split(b"\0")
+    position = 0
+    # each message is: <path count>, <paths...>, <type>, <message>
+    while position < len(fields) and fields[position]:
+        path_count = int(fields[position])
+        paths = tuple(field.decode() for field in fields[position + 1 : position + 1 + path_count])
+        conflict_type = fields[position + 1 + path_count].decode()
+        message = fields[position + 2 + path_count].decode().strip()
+        position += path_count + 3
+        if conflict_type.startswith("CONFLICT ("):
+            conflict_type = conflict_type.removeprefix("CONFLICT (").removesuffix(")")
+            conflicts.append(MergeConflict(conflict_type, paths, message))
+
+    return MergeResult(
+        ours, theirs, tree.decode(), False, tuple(conflicts), tuple(conflicted_paths)
+    )
+
+
+async def _merge(git_repo: Path | str, ours: str, theirs: str) -> MergeResult:
+    args = ["git", "-C", str(git_repo), "merge-tree", "--write-tree", "-z", ours, theirs]
+    process_status = await subprocess_run(args)
+    # 1 is also returned for errors, which have no output
+    if process_status.returncode not in (0, 1) or not process_status.stdout:
+        raise GitException(process_status.stderr.decode())
+    return _parse_merge_tree(ours, theirs, process_status.stdout, process_status.returncode == 0)
+
+
+async def merge_commits(git_repo: Path | str, ours: str, theirs: str) -> MergeResult:
+    """
+    Merge two commits without changing any ref,
+    results are cached by the repo and commits
+
+        :param git_repo: Path to the repo
+        :param ours: The commit (or revision) being merged into, e.g. the base branch
+        :param theirs: The commit (or revision) to merge, e.g. the head branch
+        :raises UnknownRevisionException: Unknown commit
+        :raises GitException: Error to do with git (e.g. no common history)
+        :return: The merged tree and any conflicts
+    """
+    ours = await resolve_revision(git_repo, f"{ours}^{{commit}}")
+    theirs = await resolve_revision(git_repo, f"{theirs}^{{commit}}")
+    cache_key = (str(git_repo), ours, theirs)
+    if (cached := merge_cache.get(cache_key)) is not None:
+        return cached
+    result = await _merge(git_repo, ours, theirs)
+    merge_cache.put(cache_key, result)
+    return result
+
+
+async def check_mergeable(
+    git_repo: Path | str, pairs: Iterable[tuple[str, str]], max_concurrency: int = 8
+) -> list[MergeResult]:
+    """
+    Merge many pairs of commits concurrently, e.g. to check
+    which pull requests can be merged after a push
+
+        :param git_repo: Path to the repo
+        :param pairs: The (ours, theirs) commits (or revisions) to merge
+        :param max_concurrency: Max merges running at once, defaults to 8
+        :raises UnknownRevisionException: Unknown commit
+        :raises GitException: Error to do with git
+        :return: The results, in the same order
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def merge(ours: str, theirs: str) -> MergeResult:
+        async with semaphore:
+            return await merge_commits(git_repo, ours, theirs)
+
+    return await asyncio.gather(*(merge(ours, theirs) for ours, theirs in pairs))
+
+
+async def create_merge_commit(
+    git_repo: Path | str,
+    ref: str,
+    theirs: str,
+    message: str,
+    author: tuple[str, str] | None = None,
+    committer: tuple[str, str] | None = None,
+) -> str:
+    """
+    Merge a commit into a ref, only updating
+    the ref if it has not changed while merging
+
+        :param git_repo: Path to the repo
+        :param ref: The full ref to merge into (e.g. 'refs/heads/main')
+        :param theirs: The commit (or revision) to merge
+        :param message: The commit message
+        :param author: Author (name, email), defaults to git's config
+        :param committer: Committer (name, email), defaults to the author
+        :raises UnknownRevisionException: Unknown ref or commit
+        :raises MergeConflictException: The merge has conflicts
+        :raises RefUpdateConflictException: The ref changed while merging
+        :raises GitException: Error to do with git
+        :return: The merge commit's id
+    """
+    ours = await resolve_revision(git_repo, f"{ref}^{{commit}}")
+    theirs = await resolve_revision(git_repo, f"{theirs}^{{commit}}")
+    # not cached, a cached tree may have since been removed by gc
+    result = await _merge(git_repo, ours, theirs)
+    if not result.clean:
+        msg = f"merge has conflicts in: {', '.join(result.conflicted_paths)}"
+        raise MergeConflictException(msg)
+
+    commit = await commit_tree(
+        git_repo, result.tree, [result.ours, result.theirs], message, author, committer
+    )
+    summary = message.split("\n", 1)[0]
+    transaction = RefTransaction(git_repo, f"merge: {summary}")
+    transaction.update(ref, commit, result.ours)
+    await transaction.commit()
+    return commit
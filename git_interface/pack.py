@@ -2,12 +2,16 @@
 Methods for using commands relating to git packs
 """
 import asyncio
-from collections.abc import AsyncGenerator
+import os
+from collections.abc import AsyncGenerator, AsyncIterable, Awaitable, Callable
+from contextlib import suppress
 from pathlib import Path
 
 from .constants import ALLOWED_PACK_TYPES, RECEIVE_PACK_TYPE, UPLOAD_PACK_TYPE
+from .datatypes import PushEvent
 from .exceptions import BufferedProcessError
-from .helpers import chunk_yielder
+from .helpers import chunk_yielder, create_subprocess, ensure_path, kill_process_group
+from .pkt_line import FLUSH_PKT, PktLineReader, encode_pkt_line
 from .shared import logger
 
 __all__ = [
@@ -17,17 +21,139 @@ __all__ = [
     "exchange_pack",
     "advertise_pack",
     "ssh_pack_exchange",
+    "ssh_pack_session",
+    "subscribe_push_events",
+    "unsubscribe_push_events",
 ]
 
+PushSubscriber = Callable[[PushEvent], Awaitable[None]]
+
+_push_subscribers: list[PushSubscriber] = []
+
+_SIDE_BAND_CAPABILITIES = ("side-band", "side-band-64k")
+_REPORT_STATUS_CAPABILITIES = ("report-status", "report-status-v2")
+
+
+def subscribe_push_events(subscriber: PushSubscriber):
+    """
+    Register a async callback that will receive a event
+    for each ref update, once a 'git-receive-pack' exchange completes.
+    Callbacks should be quick (e.g. queue work) as the
+    exchange waits for them before finishing.
+
+        :param subscriber: The callback
+    """
+    _push_subscribers.append(subscriber)
+
+
+def unsubscribe_push_events(subscriber: PushSubscriber):
+    """
+    Remove a registered push event callback
+
+        :param subscriber: The callback
+    """
+    _push_subscribers.remove(subscriber)
+
+
+async def _publish_push_events(events: list[PushEvent]):
+    for event in events:
+        results = await asyncio.gather(
+            *(subscriber(event) for subscriber in tuple(_push_subscribers)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("push event subscriber failed: %r", result)
+
+
+class _PushParser:
+    """
+    Reads the ref update commands sent to 'git-receive-pack'
+    and the report-status it responds with
+    """
+
+    def __init__(self):
+        self._request = PktLineReader()
+        self._response = PktLineReader()
+        self._band = PktLineReader()
+        self._commands_done = False
+        self._invalid = False
+        self._unpack_error: str | None = None
+        self.capabilities: set[str] = set()
+        self.commands: list[tuple[str, str, str]] = []
+        self.statuses: dict[str, str | None] = {}
+
+    def feed_request(self, chunk: bytes):
+        if self._commands_done or self._invalid:
+            return
+        try:
+            # the pack may follow the commands in the same chunk
+            packets = self._request.feed(chunk, stop_at_flush=True)
+        except ValueError:
+            self._invalid = True
+            return
+        for packet in packets:
+            if packet is None:
+                # pack data follows the commands
+                self._commands_done = True
+                return
+            line, _, capabilities = packet.rstrip(b"\n").partition(b"\0")
+            self.capabilities.update(capabilities.decode().split())
+            parts = line.decode(errors="replace").split(" ")
+            if len(parts) == 3 and len(parts[0]) == len(parts[1]):
+                self.commands.append((parts[0], parts[1], parts[2]))
+
+    def feed_response(self, chunk: bytes):
+        if self._invalid:
+            return
+        try:
+            for packet in self._response.feed(chunk):
+                if packet is None:
+                    continue
+                if self.capabilities.isdisjoint(_SIDE_BAND_CAPABILITIES):
+                    self._read_status(packet)
+                elif packet[:1] == b"\x01":
+                    for inner_packet in self._band.feed(packet[1:]):
+                        self._read_status(inner_packet)
+        except ValueError:
+            self._invalid = True
+
+    def _read_status(self, packet: bytes | None):
+        if packet is None:
+            return
+        line = packet.decode(errors="replace").rstrip("\n")
+        if line.startswith("ok "):
+            self.statuses[line[3:]] = None
+        elif line.startswith("ng "):
+            ref, _, reason = line[3:].partition(" ")
+            self.statuses[ref] = reason
+        elif line.startswith("unpack ") and line != "unpack ok":
+            self._unpack_error = line.removeprefix("unpack ")
+
+    def get_events(self, git_repo: Path, succeeded: bool) -> list[PushEvent]:
+        """
+        Create the events, succeeded is used when no
+        report-status was available for a ref
+        """
+        reported = not self.capabilities.isdisjoint(_REPORT_STATUS_CAPABILITIES)
+        events = []
+        for old_hash, new_hash, ref in self.commands:
+            if self._unpack_error is not None:
+                success, reason = False, self._unpack_error
+            elif reported and ref in self.statuses:
+                reason = self.statuses[ref]
+                success = reason is None
+            else:
+                success, reason = succeeded, None
+            events.append(PushEvent(git_repo, ref, old_hash, new_hash, success, reason))
+        return events
+
 
 def _create_advertisement(pack_type: str) -> bytes:
     """
     Service type prefixed with the total line length
     """
-    advertisement = f"# service={pack_type}\n".encode()
-    hex_len = hex(len(advertisement) + 4)[2:]
-    hex_len = hex_len.zfill(4)
-    return hex_len.encode() + advertisement + b"0000"
+    return encode_pkt_line(f"# service={pack_type}\n".encode()) + FLUSH_PKT
 
 
 async def _pack_handler(
@@ -51,28 +177,68 @@ async def _pack_handler(
         args.append("--http-backend-info-refs")
     args.append(git_repo)
 
-    process = await asyncio.create_subprocess_exec(
-        args[0],
-        *args[1:],
-        stdin=asyncio.subprocess.PIPE,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
+    push_parser = None
+    if pack_type == RECEIVE_PACK_TYPE and input_stream is not None:
+        push_parser = _PushParser()
+
+    process = await create_subprocess(args, stdin=asyncio.subprocess.PIPE)
 
+    async def feed_stdin():
+        try:
+            async for chunk in input_stream:
+                if push_parser is not None:
+                    push_parser.feed_request(chunk)
+                process.stdin.write(chunk)
+                # wait for git to read it, so the body is never buffered in memory
+                await process.stdin.drain()
+                if chunk.endswith(b"done\n"):
+                    # allows for ssh style pack exchange
+                    break
+            process.stdin.write_eof()
+        except (BrokenPipeError, ConnectionResetError):
+            # git exited without reading all input, its output will have the error
+            logger.debug("git stopped reading input for: %s", git_repo)
+        except Exception:
+            # git would otherwise wait for input that will never come
+            await kill_process_group(process)
+            raise
+
+    # input is fed while output is read, as git may respond
+    # during negotiation (e.g. a 'ACK' for each 'have') and would
+    # stop reading once its output pipe is full
+    feeder = None
     if input_stream is not None:
-        async for chunk in input_stream:
-            process.stdin.write(chunk)
-            if chunk.endswith(b"done\n"):
-                # allows for ssh style pack exchange
-                break
-        process.stdin.write_eof()
-    else:
-        yield _create_advertisement(pack_type)
-
-    async for chunk in chunk_yielder(process.stdout):
-        yield chunk
+        feeder = asyncio.create_task(feed_stdin())
+
+    try:
+        if input_stream is None:
+            yield _create_advertisement(pack_type)
+
+        async for chunk in chunk_yielder(process.stdout):
+            if push_parser is not None:
+                push_parser.feed_response(chunk)
+            yield chunk
+
+        if feeder is not None:
+            # raises any error reading the input (e.g. body too large)
+            await feeder
+        return_code = await process.wait()
+    except BaseException:
+        # client went away or request was cancelled,
+        # stop git (and pack-objects) doing any more work
+        logger.debug("pack exchange aborted for: %s", git_repo)
+        await kill_process_group(process)
+        raise
+    finally:
+        if feeder is not None:
+            feeder.cancel()
+            # any error feeding was already raised above, or another error is being raised
+            with suppress(asyncio.CancelledError, Exception):
+                await feeder
+
+    if push_parser is not None and push_parser.commands:
+        await _publish_push_events(push_parser.get_events(ensure_path(git_repo), return_code == 0))
 
-    return_code = await process.wait()
     if return_code != 0:
         raise BufferedProcessError(await process.stderr.read(), return_code)
 
@@ -81,7 +247,9 @@ def exchange_pack(
     git_repo: Path | str, pack_type: str, input_stream: AsyncGenerator[bytes, None]
 ) -> AsyncGenerator[bytes, None]:
     """
-    Used to exchange packs between client and remote.
+    Used to exchange packs between client and remote,
+    a 'git-receive-pack' exchange will publish a event
+    for each ref update (see subscribe_push_events).
 
     :param git_repo: Path to the repo
     :param pack_type: The pack-type ('git-upload-pack' or 'git-receive-pack')
@@ -126,3 +294,81 @@ async def ssh_pack_exchange(
         yield chunk
 
     logger.debug("git pack exchange done for: %s", git_repo)
+
+
+async def ssh_pack_session(
+    git_repo: Path | str,
+    pack_type: str,
+    stdin: AsyncIterable[bytes],
+    git_protocol: str | None = None,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Used to handle git pack exchange for a ssh connection,
+    using a single stateful git process for the advertisement
+    and every round of negotiation. Input is fed while output is
+    read, so git waits for the client instead of buffering.
+
+    A 'git-receive-pack' exchange will publish a event
+    for each ref update (see subscribe_push_events).
+
+        :param git_repo: Path to the repo
+        :param pack_type: The pack-type ('git-upload-pack' or 'git-receive-pack')
+        :param stdin: Input to feed from client
+        :param git_protocol: The client's 'GIT_PROTOCOL' value (e.g. 'version=2'),
+                             defaults to None
+        :raises BufferedProcessError: git exited with a error
+        :yield: Output to send to client
+    """
+    if pack_type not in ALLOWED_PACK_TYPES:
+        raise ValueError("Invalid pack_type argument")
+
+    args = ["git", pack_type.removeprefix("git-"), str(git_repo)]
+    env = None
+    if git_protocol is not None:
+        env = {**os.environ, "GIT_PROTOCOL": git_protocol}
+    push_parser = _PushParser() if pack_type == RECEIVE_PACK_TYPE else None
+
+    process = await create_subprocess(args, stdin=asyncio.subprocess.PIPE, env=env)
+
+    async def feed_stdin():
+        try:
+            async for chunk in stdin:
+                if push_parser is not None:
+                    push_parser.feed_request(chunk)
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+            process.stdin.write_eof()
+        except (BrokenPipeError, ConnectionResetError):
+            # git exited without reading all input
+            logger.debug("git stopped reading input for: %s", git_repo)
+        except Exception:
+            # git would otherwise wait for input that will never come
+            await kill_process_group(process)
+            raise
+
+    feeder = asyncio.create_task(feed_stdin())
+
+    try:
+        async for chunk in chunk_yielder(process.stdout):
+            if push_parser is not None:
+                push_parser.feed_response(chunk)
+            yield chunk
+
+        return_code = await process.wait()
+    except BaseException:
+        logger.debug("pack session aborted for: %s", git_repo)
+        await kill_process_group(process)
+        raise
+    finally:
+        # clients keep the channel open until told git has exited
+        feeder.cancel()
+        with suppress(asyncio.CancelledError):
+            await feeder
+
+    logger.debug("git pack session done for: %s", git_repo)
+
+    if push_parser is not None and push_parser.commands:
+        await _publish_push_events(push_parser.get_events(ensure_path(git_repo), return_code == 0))
+
+    if return_code != 0:
+        raise BufferedProcessError(await process.stderr.read(), return_code)
@@ -0,0 +1,59 @@
+"""
+Methods for handling git's pkt-line format,
+used by the pack protocol
+"""
+__all__ = [
+    "FLUSH_PKT",
+    "encode_pkt_line",
+    "PktLineReader",
+]
+
+FLUSH_PKT = b"0000"
+# lengths below this are special packets (flush, delim, response-end)
+_MIN_PKT_LENGTH = 4
+
+
+def encode_pkt_line(data: bytes) -> bytes:
+    """
+    Prefix data with its total line length
+
+        :param data: The data for the line
+        :return: The encoded pkt-line
+    """
+    return f"{len(data) + 4:04x}".encode() + data
+
+
+class PktLineReader:
+    """
+    Incrementally splits a stream into pkt-lines
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes, stop_at_flush: bool = False) -> list[bytes | None]:
+        """
+        Add more of the stream, returning any lines that are now complete
+
+            :param data: The next part of the stream
+            :param stop_at_flush: Leave anything after a flush packet unread,
+                                  for data that is not pkt-lines (e.g. a pack),
+                                  defaults to False
+            :raises ValueError: The stream is not in pkt-line format
+            :return: Each line's data, or None for flush (and other special) packets
+        """
+        self._buffer += data
+        packets = []
+        while len(self._buffer) >= _MIN_PKT_LENGTH:
+            length = int(self._buffer[:4], 16)
+            if length < _MIN_PKT_LENGTH:
+                packets.append(None)
+                del self._buffer[:4]
+                if stop_at_flush:
+                    break
+                continue
+            if len(self._buffer) < length:
+                break
+            packets.append(bytes(self._buffer[4:length]))
+            del self._buffer[:length]
+        return packets
@@ -0,0 +1,390 @@
+"""
+Index of the bare repos under a directory,
+for lookups and listing without touching the filesystem.
+
+Changes are watched for with inotify when the 'asyncinotify'
+package is installed (inotify extra), otherwise the
+directory is rescanned periodically.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .datatypes import PushEvent, RepoInfo
+from .helpers import QoSClass, ensure_path, subprocess_run
+from .pack import subscribe_push_events, unsubscribe_push_events
+from .shared import logger
+from .utils import get_description
+
+try:
+    from asyncinotify import Inotify, Mask
+
+    _DIR_MASK = Mask.CREATE | Mask.DELETE | Mask.MOVED_FROM | Mask.MOVED_TO | Mask.ONLYDIR
+    # HEAD is replaced with a rename, description is written in place
+    _REPO_MASK = Mask.CLOSE_WRITE | Mask.MOVED_TO | Mask.ONLYDIR
+except ImportError:  # pragma: no cover
+    Inotify = None
+
+__all__ = [
+    "is_bare_repo",
+    "RepositoryRegistry",
+]
+
+
+def is_bare_repo(path: Path) -> bool:
+    """
+    Check whether a directory looks like a bare repo
+
+        :param path: The directory
+        :return: Whether it is a bare repo
+    """
+    return (path / "HEAD").is_file() and (path / "objects").is_dir() and (path / "refs").is_dir()
+
+
+def _scan_dir(directory: Path) -> tuple[list[Path], list[Path]]:
+    """
+    Split the child directories into repos and other directories
+    """
+    repos = []
+    dirs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                path = Path(entry.path)
+                if is_bare_repo(path):
+                    repos.append(path)
+                else:
+                    dirs.append(path)
+    except OSError as err:
+        logger.warning("unable to scan '%s' for repos: %s", directory, err)
+    return repos, dirs
+
+
+def _read_head(repo_path: Path) -> str | None:
+    """
+    Read where HEAD points
+    """
+    try:
+        return (repo_path / "HEAD").read_text().strip().removeprefix("ref: ")
+    except OSError:
+        return None
+
+
+async def _get_size(repo_path: Path) -> int:
+    """
+    Get the object database size with 'git count-objects',
+    so packs are not walked object by object
+    """
+    args = ["git", "-C", str(repo_path), "count-objects", "-v"]
+    process_status = await subprocess_run(args, qos=QoSClass.BACKGROUND)
+    if process_status.returncode != 0:
+        logger.warning(
+            "unable to count objects of '%s': %s", repo_path, process_status.stderr.decode()
+        )
+        return 0
+    counts = dict(line.split(": ", 1) for line in process_status.stdout.decode().splitlines())
+    # loose and packed sizes are in KiB
+    return (int(counts["size"]) + int(counts["size-pack"])) * 1024
+
+
+class RepositoryRegistry:
+    """
+    In-memory index of the bare repos under a directory,
+    repos are found by their path relative to the root (e.g. 'user/project.git').
+
+    .. code-block:: python
+
+        async with RepositoryRegistry(Path("/srv/git")) as registry:
+            repo_path = registry.resolve("user/project.git")
+    """
+
+    def __init__(
+        self,
+        root_repo_path: Path | str,
+        max_depth: int = 2,
+        max_concurrency: int = 16,
+        poll_interval: float = 60,
+        debounce: float = 0.5,
+    ):
+        """
+            :param root_repo_path: The directory containing repos
+            :param max_depth: How many directories deep repos can be, defaults to 2
+            :param max_concurrency: Max directories/repos read at once, defaults to 16
+            :param poll_interval: Seconds between rescans when inotify is unavailable,
+                                  defaults to 60
+            :param debounce: Seconds to collect inotify events before updating,
+                             defaults to 0.5
+        """
+        self._root = ensure_path(root_repo_path).absolute()
+        self._max_depth = max_depth
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._poll_interval = poll_interval
+        self._debounce = debounce
+        self._repos: dict[str, RepoInfo] = {}
+        self._watch_task: asyncio.Task | None = None
+        self._refresh_tasks: set[asyncio.Task] = set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    def __len__(self) -> int:
+        return len(self._repos)
+
+    def __contains__(self, name: str) -> bool:
+        return self._normalize(name) in self._repos
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        return name.strip("/")
+
+    def _get_name(self, path: Path) -> str | None:
+        try:
+            return path.relative_to(self._root).as_posix()
+        except ValueError:
+            return None
+
+    def _get_depth(self, path: Path) -> int:
+        return len(path.relative_to(self._root).parts)
+
+    async def _load_info(self, repo_path: Path) -> RepoInfo:
+        async with self._semaphore:
+            head = await asyncio.to_thread(_read_head, repo_path)
+            size = await _get_size(repo_path)
+            try:
+                description = await get_description(repo_path)
+            except OSError:
+                description = ""
+        name = self._get_name(repo_path)
+        last_push = None
+        if (previous := self._repos.get(name)) is not None:
+            last_push = previous.last_push
+        return RepoInfo(name, repo_path, head, description, size, last_push)
+
+    async def _find_repos(self, directory: Path, depth: int) -> tuple[list[Path], list[Path]]:
+        """
+        Find repos under a directory, returning them
+        and the directories that were scanned
+        """
+        async with self._semaphore:
+            repos, dirs = await asyncio.to_thread(_scan_dir, directory)
+        scanned = [directory]
+        if depth > 1 and dirs:
+            results = await asyncio.gather(*(self._find_repos(path, depth - 1) for path in dirs))
+            for nested_repos, nested_scanned in results:
+                repos.extend(nested_repos)
+                scanned.extend(nested_scanned)
+        return repos, scanned
+
+    async def scan(self) -> list[Path]:
+        """
+        Scan the root directory in parallel, replacing the index
+
+            :return: The directories that were scanned
+        """
+        repo_paths, scanned = await self._find_repos(self._root, self._max_depth)
+        infos = await asyncio.gather(*(self._load_info(path) for path in repo_paths))
+        self._repos = {info.name: info for info in infos}
+        logger.debug("registry found %d repos in: %s", len(self._repos), self._root)
+        return scanned
+
+    async def refresh(self, name: str) -> RepoInfo | None:
+        """
+        Reload the metadata of a repo, adding or removing it from the index
+
+            :param name: The repo name
+            :return: The updated info, or None when it is not a repo
+        """
+        name = self._normalize(name)
+        repo_path = self._root / name
+        if ".." in name.split("/") or not await asyncio.to_thread(is_bare_repo, repo_path):
+            self._repos.pop(name, None)
+            return None
+        info = await self._load_info(repo_path)
+        self._repos[name] = info
+        return info
+
+    def get(self, name: str) -> RepoInfo | None:
+        """
+        Get a repo's info
+
+            :param name: The repo name
+            :return: The info, or None when not known
+        """
+        return self._repos.get(self._normalize(name))
+
+    def resolve(self, name: str) -> Path | None:
+        """
+        Get a repo's path
+
+            :param name: The repo name
+            :return: The path, or None when not known
+        """
+        if (info := self.get(name)) is not None:
+            return info.path
+        return None
+
+    def list_repos(self, prefix: str = "") -> list[RepoInfo]:
+        """
+        List the known repos
+
+            :param prefix: Only include names starting with this, defaults to ""
+            :return: The repos, ordered by name
+        """
+        return sorted(
+            (info for name, info in self._repos.items() if name.startswith(prefix)),
+            key=lambda info: info.name,
+        )
+
+    async def _on_push(self, event: PushEvent):
+        name = self._get_name(event.git_repo.absolute())
+        if name is None or (info := self._repos.get(name)) is None:
+            return
+        info.last_push = datetime.now(timezone.utc)
+        # size and HEAD may have changed, but subscribers should not block the push
+        task = asyncio.create_task(self.refresh(name))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def start(self, watch: bool = True):
+        """
+        Scan the root directory and start following changes
+
+            :param watch: Whether to watch for repos being added or removed,
+                          defaults to True
+        """
+        inotify = None
+        if watch and Inotify is not None:
+            # changes made while scanning are queued, instead of being missed
+            inotify = Inotify()
+            root_watch = inotify.add_watch(self._root, _DIR_MASK)
+        scanned = await self.scan()
+        subscribe_push_events(self._on_push)
+        if inotify is not None:
+            self._watch_task = asyncio.create_task(
+                self._watch_inotify(inotify, {self._root: (root_watch, _DIR_MASK)}, scanned)
+            )
+        elif watch:
+            self._watch_task = asyncio.create_task(self._poll())
+
+    async def close(self):
+        """
+        Stop following changes
+        """
+        unsubscribe_push_events(self._on_push)
+        tasks = [*self._refresh_tasks]
+        if self._watch_task is not None:
+            tasks.append(self._watch_task)
+            self._watch_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            await self.scan()
+
+    async def _watch_inotify(
+        self, inotify: "Inotify", watches: dict[Path, tuple], scanned: list[Path]
+    ):
+        with inotify:
+
+            def unwatch(path: Path):
+                for watched in [watched for watched in watches if watched.is_relative_to(path)]:
+                    try:
+                        inotify.rm_watch(watches.pop(watched)[0])
+                    except (OSError, ValueError):
+                        # already removed by the kernel
+                        pass
+
+            def watch(path: Path, mask: Mask):
+                if path in watches:
+                    if watches[path][1] == mask:
+                        return
+                    unwatch(path)
+                try:
+                    watches[path] = (inotify.add_watch(path, mask), mask)
+                except OSError as err:
+                    logger.warning("unable to watch '%s': %s", path, err)
+
+            def watch_all(scanned: list[Path]):
+                for path in scanned:
+                    watch(path, _DIR_MASK)
+                for info in self._repos.values():
+                    watch(info.path, _REPO_MASK)
+
+            async def update(path: Path):
+                if not path.is_dir():
+                    return
+                if path.parent != self._root and is_bare_repo(path.parent):
+                    # part of a repo that was being created
+                    path = path.parent
+                if is_bare_repo(path):
+                    await self.refresh(self._get_name(path))
+                    watch(path, _REPO_MASK)
+                    return
+                depth = self._get_depth(path)
+                # may become a repo later, e.g. while 'git init' is running
+                watch(path, _DIR_MASK)
+                if depth < self._max_depth:
+                    repo_paths, nested_scanned = await self._find_repos(
+                        path, self._max_depth - depth
+                    )
+                    for repo_path in repo_paths:
+                        if (name := self._get_name(repo_path)) not in self._repos:
+                            await self.refresh(name)
+                        watch(repo_path, _REPO_MASK)
+                    for scanned_path in nested_scanned:
+                        watch(scanned_path, _DIR_MASK)
+
+            watch_all(scanned)
+            pending: set[Path] = set()
+            events = aiter(inotify)
+
+            while True:
+                try:
+                    if pending:
+                        event = await asyncio.wait_for(anext(events), self._debounce)
+                    else:
+                        event = await anext(events)
+                except asyncio.TimeoutError:
+                    for path in pending:
+                        await update(path)
+                    pending.clear()
+                    continue
+
+                if event.mask & Mask.Q_OVERFLOW:
+                    logger.warning("registry missed events, rescanning: %s", self._root)
+                    pending.clear()
+                    unwatch(self._root)
+                    watch_all(await self.scan())
+                    continue
+                if event.watch is None or event.path is None:
+                    continue
+
+                parent = event.watch.path
+                if is_bare_repo(parent):
+                    if event.name is not None and event.name.name in ("HEAD", "description"):
+                        pending.add(parent)
+                elif event.mask & (Mask.DELETE | Mask.MOVED_FROM):
+                    name = self._get_name(event.path)
+                    for repo_name in [
+                        repo_name
+                        for repo_name in self._repos
+                        if repo_name == name or repo_name.startswith(name + "/")
+                    ]:
+                        del self._repos[repo_name]
+                    unwatch(event.path)
+                    pending.discard(event.path)
+                elif event.mask & Mask.ISDIR and self._get_depth(parent) < self._max_depth:
+                    pending.add(event.path)
+                elif event.name is not None and event.name.name == "HEAD" and parent != self._root:
+                    # repo files being created in a watched directory
+                    pending.add(parent)
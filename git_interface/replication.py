@@ -0,0 +1,270 @@
+"""
+Replication of pushed repos to replica copies (e.g. on other nodes),
+done in the background after each successful push.
+"""
+import asyncio
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+import aiofiles
+import aiofiles.os
+
+from .datatypes import PushEvent, ReplicationStatus
+from .exceptions import GitException
+from .helpers import ensure_path, subprocess_run
+from .pack import subscribe_push_events, unsubscribe_push_events
+from .shared import logger
+
+__all__ = [
+    "Replicator",
+]
+
+
+@dataclass
+class _PendingRepo:
+    queued_at: datetime
+    generation: int = 0
+    attempts: int = 0
+    last_error: str | None = None
+    requeued_at: datetime | None = None
+    replicating: bool = False
+    task: asyncio.Task | None = None
+
+
+class Replicator:
+    """
+    Replicates repos under a source root to the same
+    relative paths under each replica root, using 'git push --mirror'.
+
+    Repos waiting to be replicated are recorded in the queue directory,
+    so they are still replicated after a restart. Pushes to the same repo
+    that arrive close together are replicated once.
+
+    .. code-block:: python
+
+        async with Replicator(Path("/srv/git"), [Path("/mnt/replica")], Path("/srv/queue")):
+            ...
+    """
+
+    def __init__(
+        self,
+        source_root: Path | str,
+        replica_roots: list[Path | str],
+        queue_dir: Path | str,
+        max_concurrency: int = 4,
+        coalesce_delay: float = 1,
+        retry_delay: float = 5,
+        max_retry_delay: float = 300,
+    ):
+        """
+            :param source_root: Directory containing the pushed to repos
+            :param replica_roots: Directories (or mounts of other nodes) to replicate to
+            :param queue_dir: Directory to record repos waiting to be replicated
+            :param max_concurrency: Max repos replicated at once, defaults to 4
+            :param coalesce_delay: Seconds to wait for more pushes before replicating,
+                                   defaults to 1
+            :param retry_delay: Seconds before the first retry, doubling each attempt,
+                                defaults to 5
+            :param max_retry_delay: Max seconds between retries, defaults to 300
+        """
+        self._source_root = ensure_path(source_root).absolute()
+        self._replica_roots = [ensure_path(root) for root in replica_roots]
+        self._queue_dir = ensure_path(queue_dir)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._coalesce_delay = coalesce_delay
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._pending: dict[str, _PendingRepo] = {}
+        self._last_replicated: dict[str, datetime] = {}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    def get_replica_paths(self, name: str) -> list[Path]:
+        """
+        Blueprint method used to get where a repo is replicated to,
+        could be overridden to place replicas differently
+
+            :param name: The repo path relative to the source root
+            :return: The replica repo paths
+        """
+        return [root / name for root in self._replica_roots]
+
+    def _queue_path(self, name: str) -> Path:
+        return self._queue_dir / f"{quote(name, safe='')}.json"
+
+    async def _write_queue_file(self, name: str, queued_at: datetime):
+        path = self._queue_path(name)
+        tmp_path = path.with_name(path.name + ".tmp")
+        async with aiofiles.open(tmp_path, "w") as fo:
+            await fo.write(json.dumps({"name": name, "queued_at": queued_at.isoformat()}))
+        await aiofiles.os.replace(tmp_path, path)
+
+    async def start(self):
+        """
+        Resume replicating any queued repos and
+        start replicating after each successful push
+        """
+        await aiofiles.os.makedirs(self._queue_dir, exist_ok=True)
+        for path in await asyncio.to_thread(sorted, self._queue_dir.glob("*.json")):
+            async with aiofiles.open(path) as fo:
+                queued = json.loads(await fo.read())
+            state = _PendingRepo(datetime.fromisoformat(queued["queued_at"]))
+            self._pending[queued["name"]] = state
+            state.task = asyncio.create_task(self._process(queued["name"], state))
+        if self._pending:
+            logger.info("resuming replication of %d repos", len(self._pending))
+        subscribe_push_events(self._on_push)
+
+    async def close(self):
+        """
+        Stop replicating, queued repos are
+        replicated when next started
+        """
+        unsubscribe_push_events(self._on_push)
+        tasks = [state.task for state in self._pending.values() if state.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._pending.clear()
+
+    async def wait_idle(self):
+        """
+        Wait until every queued repo has been replicated
+        """
+        while tasks := [state.task for state in self._pending.values() if state.task is not None]:
+            await asyncio.wait(tasks)
+
+    async def _on_push(self, event: PushEvent):
+        if not event.success:
+            return
+        try:
+            name = event.git_repo.absolute().relative_to(self._source_root).as_posix()
+        except ValueError:
+            return
+        await self.enqueue(name)
+
+    async def enqueue(self, name: str):
+        """
+        Queue a repo to be replicated
+
+            :param name: The repo path relative to the source root
+        """
+        state = self._pending.get(name)
+        if state is None:
+            state = _PendingRepo(datetime.now(timezone.utc))
+            self._pending[name] = state
+            await self._write_queue_file(name, state.queued_at)
+        elif state.replicating and state.requeued_at is None:
+            state.requeued_at = datetime.now(timezone.utc)
+        state.generation += 1
+        if state.task is None:
+            state.task = asyncio.create_task(self._process(name, state))
+
+    async def _replicate_to(self, source: Path, replica: Path):
+        if not replica.exists():
+            replica.parent.mkdir(parents=True, exist_ok=True)
+            process_status = await subprocess_run(
+                ["git", "init", "--quiet", "--bare", str(replica)]
+            )
+            if process_status.returncode != 0:
+                raise GitException(process_status.stderr.decode())
+            # a mirror push does not include what HEAD points to
+            (replica / "HEAD").write_bytes((source / "HEAD").read_bytes())
+
+        args = ["git", "-C", str(source), "push", "--quiet", "--mirror", str(replica)]
+        process_status = await subprocess_run(args)
+        if process_status.returncode != 0:
+            raise GitException(process_status.stderr.decode())
+
+    async def _process(self, name: str, state: _PendingRepo):
+        source = self._source_root / name
+        await asyncio.sleep(self._coalesce_delay)
+        while True:
+            generation = state.generation
+            state.replicating = True
+            replicas = self.get_replica_paths(name)
+            async with self._semaphore:
+                results = await asyncio.gather(
+                    *(self._replicate_to(source, replica) for replica in replicas),
+                    return_exceptions=True,
+                )
+            state.replicating = False
+
+            errors = [result for result in results if isinstance(result, Exception)]
+            if errors:
+                state.attempts += 1
+                state.last_error = str(errors[0])
+                delay = min(self._retry_delay * 2 ** (state.attempts - 1), self._max_retry_delay)
+                logger.warning(
+                    "replication of '%s' failed (attempt %d), retrying in %ss: %s",
+                    name,
+                    state.attempts,
+                    delay,
+                    state.last_error,
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            now = datetime.now(timezone.utc)
+            self._last_replicated[name] = now
+            state.attempts = 0
+            state.last_error = None
+            if state.generation == generation:
+                await aiofiles.os.remove(self._queue_path(name))
+                if state.generation == generation:
+                    break
+            # pushed to again while replicating
+            state.queued_at = state.requeued_at or now
+            state.requeued_at = None
+            await self._write_queue_file(name, state.queued_at)
+            await asyncio.sleep(self._coalesce_delay)
+
+        del self._pending[name]
+        logger.debug("replicated '%s' to %d replicas", name, len(replicas))
+
+    def get_status(self) -> list[ReplicationStatus]:
+        """
+        Get the repos waiting to be replicated
+
+            :return: The status of each queued repo, most lagged first
+        """
+        now = datetime.now(timezone.utc)
+        statuses = [
+            ReplicationStatus(
+                name,
+                state.queued_at,
+                (now - state.queued_at).total_seconds(),
+                state.attempts,
+                state.last_error,
+            )
+            for name, state in self._pending.items()
+        ]
+        return sorted(statuses, key=lambda status: status.lag, reverse=True)
+
+    def get_lag(self, name: str) -> float:
+        """
+        Get how far behind the replicas of a repo are
+
+            :param name: The repo path relative to the source root
+            :return: Seconds since the oldest push not yet replicated, 0 when up to date
+        """
+        if (state := self._pending.get(name)) is None:
+            return 0.0
+        return (datetime.now(timezone.utc) - state.queued_at).total_seconds()
+
+    def get_last_replicated(self, name: str) -> datetime | None:
+        """
+        Get when a repo was last replicated by this replicator
+
+            :param name: The repo path relative to the source root
+            :return: The time, or None when not replicated since started
+        """
+        return self._last_replicated.get(name)
@@ -2,28 +2,51 @@
 Methods for using the 'rev-list' command
 """
 import re
+from collections.abc import AsyncGenerator, Sequence
+from contextlib import aclosing
 from pathlib import Path
 
-from .constants import UNKNOWN_REV_RE
-from .exceptions import GitException, UnknownRevisionException
-from .helpers import subprocess_run
+from .cache import LRUCache
+from .constants import BAD_REVISION_RE, UNKNOWN_REV_RE
+from .exceptions import BufferedProcessError, GitException, UnknownRevisionException
+from .helpers import (
+    QoSClass,
+    QoSProfile,
+    line_yielder,
+    subprocess_run,
+    subprocess_run_buffered,
+)
+from .rev_parse import resolve_revision
 
 __all__ = [
     "get_commit_count",
     "get_disk_usage",
     "get_rev_list",
+    "iter_rev_list",
+    "iter_rev_list_objects",
+    "count_revisions",
+    "ahead_behind_cache",
+    "get_ahead_behind",
 ]
 
+# counts only depend on the commits, so are shared between repos
+ahead_behind_cache: LRUCache[tuple[str, str], tuple[int, int]] = LRUCache(65536)
+# whether for-each-ref supports '%(ahead-behind:)' (git 2.41+), found on first use
+_supports_ahead_behind: bool | None = None
+
 
 async def _rev_list(
-    git_repo: Path | str, branch: str | None = None, operator: str | None = None
+    git_repo: Path | str,
+    branch: str | None = None,
+    operator: str | None = None,
+    qos: QoSClass | QoSProfile | None = None,
 ) -> str:
     if branch is None:
         branch = "--all"
     args = ["git", "-C", str(git_repo), "rev-list", branch]
     if operator:
         args.append(operator)
-    process_status = await subprocess_run(args)
+    process_status = await subprocess_run(args, qos=qos)
 
     if process_status.returncode != 0:
         stderr = process_status.stderr.decode()
@@ -46,17 +69,22 @@ async def get_commit_count(git_repo: Path | str, branch: str | None = None) -> i
     return int(await _rev_list(git_repo, branch, "--count"))
 
 
-async def get_disk_usage(git_repo: Path | str, branch: str | None = None) -> int:
+async def get_disk_usage(
+    git_repo: Path | str,
+    branch: str | None = None,
+    qos: QoSClass | QoSProfile | None = QoSClass.BATCH,
+) -> int:
     """
     Get a size of the repo
 
         :param git_repo: Path to the repo
         :param branch: Branch to filter, defaults to None
+        :param qos: Resource class or profile to run with, defaults to QoSClass.BATCH
         :raises UnknownRevisionException: Unknown tree_ish
         :raises GitException: Error to do with git
         :return: The size of the repo
     """
-    return int(await _rev_list(git_repo, branch, "--disk-usage"))
+    return int(await _rev_list(git_repo, branch, "--disk-usage", qos))
 
 
 async def get_rev_list(git_repo: Path | str, branch: str | None = None) -> list[str]:
@@ -70,3 +98,277 @@ async def get_rev_list(git_repo: Path | str, branch: str | None = None) -> list[
         :return: The repos revisions
     """
     return (await _rev_list(git_repo, branch)).strip().split("\n")
+
+
+def _get_walk_args(
+    git_repo: Path | str,
+    revisions: Sequence[str] | None,
+    exclude: Sequence[str],
+    objects: bool,
+    object_filter: str | None,
+    use_bitmap_index: bool,
+) -> list[str]:
+    args = ["git", "-C", str(git_repo), "rev-list"]
+    if objects:
+        args.append("--objects")
+        if object_filter is not None:
+            args.append(f"--filter={object_filter}")
+    elif object_filter is not None:
+        raise ValueError("object_filter requires objects")
+    if use_bitmap_index:
+        args.append("--use-bitmap-index")
+    if revisions is None:
+        args.append("--all")
+    # stop revisions being read as options
+    args.append("--end-of-options")
+    args.extend(revisions or ())
+    args.extend(f"^{revision}" for revision in exclude)
+    args.append("--")
+    return args
+
+
+def _walk_error(stderr: str) -> GitException:
+    if re.match(UNKNOWN_REV_RE, stderr) or re.match(BAD_REVISION_RE, stderr):
+        return UnknownRevisionException(stderr)
+    return GitException(stderr)
+
+
+async def _iter_lines(args: list[str], qos: QoSClass | QoSProfile | None):
+    try:
+        async with aclosing(subprocess_run_buffered(args, qos)) as chunks:
+            async for line in line_yielder(chunks):
+                yield line.decode()
+    except BufferedProcessError as err:
+        raise _walk_error(err.args[0].decode()) from err
+
+
+async def iter_rev_list(
+    git_repo: Path | str,
+    revisions: Sequence[str] | None = None,
+    exclude: Sequence[str] = (),
+    max_count: int | None = None,
+    qos: QoSClass | QoSProfile | None = None,
+) -> AsyncGenerator[str, None]:
+    """
+    Stream the commits reachable from revisions, newest first,
+    without buffering the whole list. Closing the
+    generator early will stop git walking.
+
+        :param git_repo: Path to the repo
+        :param revisions: Revisions or ranges (e.g. 'main', 'v1..v2'), defaults to None (all refs)
+        :param exclude: Exclude commits reachable from these, defaults to ()
+        :param max_count: Stop after this many commits, defaults to None
+        :param qos: Resource class or profile to run with, defaults to None
+        :raises UnknownRevisionException: Unknown revision
+        :raises GitException: Error to do with git
+        :yield: Each commit hash
+    """
+    args = _get_walk_args(git_repo, revisions, exclude, False, None, False)
+    if max_count is not None:
+        args.insert(4, f"--max-count={max_count}")
+    async with aclosing(_iter_lines(args, qos)) as lines:
+        async for line in lines:
+            yield line
+
+
+async def iter_rev_list_objects(
+    git_repo: Path | str,
+    revisions: Sequence[str] | None = None,
+    exclude: Sequence[str] = (),
+    object_filter: str | None = None,
+    use_bitmap_index: bool = False,
+    qos: QoSClass | QoSProfile | None = QoSClass.BATCH,
+) -> AsyncGenerator[tuple[str, str | None], None]:
+    """
+    Stream every object (commits, trees and blobs) reachable from revisions,
+    without buffering the whole list. Closing the
+    generator early will stop git walking.
+
+        :param git_repo: Path to the repo
+        :param revisions: Revisions or ranges (e.g. 'main', 'v1..v2'), defaults to None (all refs)
+        :param exclude: Exclude objects reachable from these, defaults to ()
+        :param object_filter: Omit objects using a filter spec
+                              (e.g. 'blob:limit=1m' or 'tree:0'), defaults to None
+        :param use_bitmap_index: Use the reachability bitmap when available,
+                                 paths are not known for objects found this way, defaults to False
+        :param qos: Resource class or profile to run with, defaults to QoSClass.BATCH
+        :raises UnknownRevisionException: Unknown revision
+        :raises GitException: Error to do with git, including an invalid filter
+        :yield: Each object id and its path (None for commits, '' for root trees)
+    """
+    args = _get_walk_args(git_repo, revisions, exclude, True, object_filter, use_bitmap_index)
+    async with aclosing(_iter_lines(args, qos)) as lines:
+        async for line in lines:
+            object_id, separator, path = line.partition(" ")
+            yield object_id, path if separator else None
+
+
+async def count_revisions(
+    git_repo: Path | str,
+    revisions: Sequence[str] | None = None,
+    exclude: Sequence[str] = (),
+    objects: bool = False,
+    object_filter: str | None = None,
+    use_bitmap_index: bool = True,
+    qos: QoSClass | QoSProfile | None = None,
+) -> int:
+    """
+    Count the commits (or objects) reachable from revisions,
+    using the reachability bitmap to avoid walking when available
+
+        :param git_repo: Path to the repo
+        :param revisions: Revisions or ranges (e.g. 'main', 'v1..v2'), defaults to None (all refs)
+        :param exclude: Exclude those reachable from these, defaults to ()
+        :param objects: Count every object instead of only commits, defaults to False
+        :param object_filter: Omit objects using a filter spec, requires objects, defaults to None
+        :param use_bitmap_index: Use the reachability bitmap when available, defaults to True
+        :param qos: Resource class or profile to run with, defaults to None
+        :raises ValueError: object_filter given without objects
+        :raises UnknownRevisionException: Unknown revision
+        :raises GitException: Error to do with git
+        :return: The count
+    """
+    args = _get_walk_args(git_repo, revisions, exclude, objects, object_filter, use_bitmap_index)
+    args.insert(4, "--count")
+    process_status = await subprocess_run(args, qos=qos)
+    if process_status.returncode != 0:
+        raise _walk_error(process_status.stderr.decode())
+    return int(process_status.stdout)
+
+
+async def _get_branch_heads(git_repo: Path | str) -> dict[str, str]:
+    args = [
+        "git",
+        "-C",
+        str(git_repo),
+        "for-each-ref",
+        "--format=%(objectname) %(refname:lstrip=2)",
+        "refs/heads",
+    ]
+    process_status = await subprocess_run(args)
+    if process_status.returncode != 0:
+        raise GitException(process_status.stderr.decode())
+    return dict(
+        reversed(line.split(" ", 1)) for line in process_status.stdout.decode().splitlines()
+    )
+
+
+async def _for_each_ref_ahead_behind(
+    git_repo: Path | str, base: str
+) -> dict[str, tuple[str, int, int]] | None:
+    """
+    Get the (commit, ahead, behind) of every branch,
+    or None when git does not support '%(ahead-behind:)'
+    """
+    args = [
+        "git",
+        "-C",
+        str(git_repo),
+        "for-each-ref",
+        f"--format=%(objectname) %(ahead-behind:{base}) %(refname:lstrip=2)",
+        "refs/heads",
+    ]
+    process_status = await subprocess_run(args)
+    if process_status.returncode != 0:
+        stderr = process_status.stderr.decode()
+        if "unknown field name" in stderr:
+            return None
+        raise GitException(stderr)
+    results = {}
+    for line in process_status.stdout.decode().splitlines():
+        commit, ahead, behind, name = line.split(" ", 3)
+        results[name] = (commit, int(ahead), int(behind))
+    return results
+
+
+async def _walk_ahead_behind(
+    git_repo: Path | str, base: str, tips: list[str]
+) -> dict[str, tuple[int, int]]:
+    """
+    Count ahead/behind for many tips with one walk of the commit graph.
+
+    Each commit gets a bitmask of which tips (bit 0 is base) reach it,
+    children are output before parents so a mask is complete when it is output.
+    The walk stops once every remaining commit is reached by all tips,
+    as those are not ahead or behind for any.
+    """
+    all_bits = (1 << (len(tips) + 1)) - 1
+    pending: dict[str, int] = {base: 1}
+    for index, tip in enumerate(tips, 1):
+        pending[tip] = pending.get(tip, 0) | 1 << index
+    not_full = sum(1 for mask in pending.values() if mask != all_bits)
+    ahead = [0] * (len(tips) + 1)
+    behind = [0] * (len(tips) + 1)
+
+    args = ["git", "-C", str(git_repo), "rev-list", "--topo-order", "--parents", base, *tips]
+    try:
+        async with aclosing(subprocess_run_buffered(args)) as chunks:
+            async for line in line_yielder(chunks):
+                if not_full == 0:
+                    break
+                commit, *parents = line.decode().split()
+                mask = pending.pop(commit)
+                if mask != all_bits:
+                    not_full -= 1
+                    # reached by base: behind for tips not reaching it,
+                    # else ahead for tips reaching it
+                    bits = all_bits & ~mask if mask & 1 else mask
+                    counts = behind if mask & 1 else ahead
+                    while bits:
+                        lowest = bits & -bits
+                        counts[lowest.bit_length() - 1] += 1
+                        bits ^= lowest
+                # full masks are passed on too, a parent may only be reached through them
+                for parent in parents:
+                    previous = pending.get(parent)
+                    pending[parent] = (previous or 0) | mask
+                    if previous is None and pending[parent] != all_bits:
+                        not_full += 1
+                    elif previous not in (None, all_bits) and pending[parent] == all_bits:
+                        not_full -= 1
+    except BufferedProcessError as err:
+        raise GitException(err.args[0].decode()) from err
+
+    return {tip: (ahead[index], behind[index]) for index, tip in enumerate(tips, 1)}
+
+
+async def get_ahead_behind(git_repo: Path | str, base: str) -> dict[str, tuple[int, int]]:
+    """
+    Get how many commits every branch is ahead of and behind a base,
+    using one 'for-each-ref' (git 2.41+) or a single walk of the history.
+    Counts are cached by the base and branch commits.
+
+        :param git_repo: Path to the repo
+        :param base: The commit (or revision) to compare to, e.g. the default branch
+        :raises UnknownRevisionException: Unknown base
+        :raises GitException: Error to do with git
+        :return: The (ahead, behind) counts by branch name
+    """
+    global _supports_ahead_behind
+
+    base = await resolve_revision(git_repo, f"{base}^{{commit}}")
+    heads = await _get_branch_heads(git_repo)
+    results = {}
+    missing = {}
+    for name, commit in heads.items():
+        if (cached := ahead_behind_cache.get((base, commit))) is not None:
+            results[name] = cached
+        else:
+            missing[name] = commit
+    if not missing:
+        return results
+
+    if _supports_ahead_behind is not False:
+        counts = await _for_each_ref_ahead_behind(git_repo, base)
+        _supports_ahead_behind = counts is not None
+        if counts is not None:
+            for name, (commit, ahead, behind) in counts.items():
+                ahead_behind_cache.put((base, commit), (ahead, behind))
+                results[name] = (ahead, behind)
+            return results
+
+    walked = await _walk_ahead_behind(git_repo, base, sorted(set(missing.values())))
+    for name, commit in missing.items():
+        ahead_behind_cache.put((base, commit), walked[commit])
+        results[name] = walked[commit]
+    return results
@@ -0,0 +1,45 @@
+"""
+Methods for using the 'rev-parse' command
+"""
+from pathlib import Path
+
+from .exceptions import GitException, UnknownRevisionException
+from .helpers import subprocess_run
+
+__all__ = [
+    "resolve_revision",
+]
+
+
+async def resolve_revision(git_repo: Path | str, revision: str) -> str:
+    """
+    Resolve a revision (branch name, HEAD, 'HEAD:src', 'main^{tree}')
+    into the full object id it currently points to
+
+        :param git_repo: Path to the repo
+        :param revision: The revision to resolve
+        :raises UnknownRevisionException: Unknown revision
+        :raises GitException: Error to do with git
+        :return: The full object id
+    """
+    args = [
+        "git",
+        "-C",
+        str(git_repo),
+        "rev-parse",
+        "--verify",
+        "--quiet",
+        "--end-of-options",
+        revision,
+    ]
+
+    process_status = await subprocess_run(args)
+
+    if process_status.returncode != 0:
+        stderr = process_status.stderr.decode()
+        if process_status.returncode == 1 and not stderr:
+            msg = f"Unknown revision '{revision}'"
+            raise UnknownRevisionException(msg)
+        raise GitException(stderr)
+
+    return process_status.stdout.decode().strip()
@@ -0,0 +1,376 @@
+"""
+Persistent trigram index of a ref, used to find candidate
+files for a search instead of scanning every blob
+"""
+import asyncio
+import json
+import shutil
+from collections.abc import AsyncGenerator
+from contextlib import aclosing, suppress
+from pathlib import Path
+from urllib.parse import quote
+
+import aiofiles
+import aiofiles.os
+
+from .cache import LRUCache
+from .cat_file import BatchObjectReader
+from .datatypes import GrepMatch, TreeContentTypes
+from .exceptions import GitException
+from .grep import grep
+from .helpers import get_data_dir, subprocess_run
+from .ls import ls_tree
+from .rev_parse import resolve_revision
+from .shared import logger
+
+__all__ = [
+    "extract_trigrams",
+    "TrigramIndex",
+]
+
+INDEX_VERSION = 3
+# postings are split across this many files, so a query only reads the few it needs
+SHARD_COUNT = 256
+# shards kept in memory between queries
+MAX_LOADED_SHARDS = 32
+DEFAULT_MAX_BLOB_SIZE = 1024 * 1024
+# how many candidate paths are verified by a single grep
+VERIFY_BATCH_SIZE = 512
+# same check git uses to detect binary content
+BINARY_CHECK_SIZE = 8000
+GITLINK_MODE = "160000"
+
+
+def extract_trigrams(content: bytes) -> set[int]:
+    """
+    Get the unique trigrams of some content,
+    ASCII is lowercased so the trigrams can be used for
+    both case sensitive and insensitive searches
+
+        :param content: The content
+        :return: Each trigram packed into an int
+    """
+    content = content.lower()
+    return {int.from_bytes(content[i : i + 3], "big") for i in range(len(content) - 2)}
+
+
+def _shard_of(trigram: int) -> int:
+    # multiplicative hash, so trigrams sharing a prefix are spread across shards
+    return ((trigram * 0x9E3779B1) & 0xFFFFFFFF) * SHARD_COUNT >> 32
+
+
+async def _write_json(path: Path, value):
+    tmp_path = path.with_suffix(".tmp")
+    async with aiofiles.open(tmp_path, "w") as fo:
+        await fo.write(json.dumps(value, separators=(",", ":")))
+    await aiofiles.os.replace(tmp_path, path)
+
+
+class TrigramIndex:
+    """
+    A trigram index of the blobs reachable from a ref,
+    stored inside the repo's data directory.
+    Postings are stored in shards by trigram,
+    only the shards a query needs are loaded.
+    Call update() after the ref changes (e.g. after a push),
+    only blobs that changed since the last update will be read.
+    """
+
+    def __init__(
+        self, git_repo: Path | str, ref: str = "HEAD", max_blob_size: int = DEFAULT_MAX_BLOB_SIZE
+    ):
+        """
+            :param git_repo: Path to the repo
+            :param ref: The ref to index, defaults to "HEAD"
+            :param max_blob_size: Blobs larger than this are not indexed,
+                                  so are always searched, defaults to 1MiB
+        """
+        self._git_repo = git_repo
+        self._ref = ref
+        self._max_blob_size = max_blob_size
+        index_name = quote(ref, safe="")
+        self._index_dir = get_data_dir(git_repo) / "trigram" / index_name
+        # written by version 2, which stored the whole index in one file
+        self._legacy_path = self._index_dir.parent / f"{index_name}.json"
+        self._loaded = False
+        # shards of each full rebuild are written to a new directory
+        self._generation = 0
+        self.commit_hash: str | None = None
+        self.tree_hash: str | None = None
+        self._reset()
+
+    def _reset(self):
+        self._blobs: list[str] = []
+        self._blob_ids: dict[str, int] = {}
+        self._paths: dict[str, int] = {}
+        self._unindexed: set[int] = set()
+        # postings of blobs indexed since the last save
+        self._new_postings: dict[int, list[int]] = {}
+        self._shards: LRUCache[int, dict[int, list[int]]] = LRUCache(MAX_LOADED_SHARDS)
+
+    @property
+    def _shard_dir(self) -> Path:
+        return self._index_dir / f"shards-{self._generation}"
+
+    async def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            async with aiofiles.open(self._index_dir / "meta.json", "r") as fo:
+                stored = json.loads(await fo.read())
+        except FileNotFoundError:
+            return
+        self._generation = stored.get("generation", 0)
+        if stored.get("version") != INDEX_VERSION:
+            logger.info("trigram index version changed, will rebuild: %s", self._index_dir)
+            return
+        self.commit_hash = stored["commit"]
+        self.tree_hash = stored["tree"]
+        self._blobs = stored["blobs"]
+        self._blob_ids = {oid: blob_id for blob_id, oid in enumerate(self._blobs)}
+        self._paths = stored["paths"]
+        self._unindexed = set(stored["unindexed"])
+
+    async def _reload(self):
+        self._loaded = False
+        self.commit_hash = None
+        self.tree_hash = None
+        self._reset()
+        await self._load()
+
+    async def _get_shard(self, shard: int) -> dict[int, list[int]]:
+        if (postings := self._shards.get(shard)) is not None:
+            return postings
+        async with aiofiles.open(self._shard_dir / f"{shard}.json", "r") as fo:
+            postings = {int(trigram): ids for trigram, ids in json.loads(await fo.read()).items()}
+        self._shards.put(shard, postings)
+        return postings
+
+    async def _save(self, rebuilt: bool):
+        """
+        Write the changed shards, then the metadata referencing them,
+        so an interrupted save never loses postings of indexed blobs
+        """
+        await aiofiles.os.makedirs(self._shard_dir, exist_ok=True)
+        new_shards: dict[int, dict[int, list[int]]] = {}
+        for trigram, ids in self._new_postings.items():
+            new_shards.setdefault(_shard_of(trigram), {})[trigram] = ids
+        # every shard of a rebuild is written, so a missing shard means a newer generation
+        for shard in range(SHARD_COUNT) if rebuilt else sorted(new_shards):
+            postings = {} if rebuilt else await self._get_shard(shard)
+            for trigram, ids in new_shards.get(shard, {}).items():
+                postings.setdefault(trigram, []).extend(ids)
+            await _write_json(self._shard_dir / f"{shard}.json", postings)
+            self._shards.put(shard, postings)
+        self._new_postings = {}
+
+        await _write_json(
+            self._index_dir / "meta.json",
+            {
+                "version": INDEX_VERSION,
+                "ref": self._ref,
+                "commit": self.commit_hash,
+                "tree": self.tree_hash,
+                "generation": self._generation,
+                "blobs": self._blobs,
+                "paths": self._paths,
+                "unindexed": sorted(self._unindexed),
+            },
+        )
+        if rebuilt:
+            await asyncio.to_thread(self._remove_old_generations)
+
+    def _remove_old_generations(self):
+        with suppress(FileNotFoundError):
+            self._legacy_path.unlink()
+        for path in self._index_dir.glob("shards-*"):
+            if path != self._shard_dir:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _index_blob(self, object_: str, content: bytes | None):
+        blob_id = len(self._blobs)
+        self._blobs.append(object_)
+        self._blob_ids[object_] = blob_id
+        if content is None or len(content) > self._max_blob_size:
+            self._unindexed.add(blob_id)
+        elif b"\0" not in content[:BINARY_CHECK_SIZE]:
+            # binary blobs are never searched, so have no postings
+            for trigram in extract_trigrams(content):
+                self._new_postings.setdefault(trigram, []).append(blob_id)
+
+    async def _list_all(self, tree_hash: str) -> dict[str, tuple[str, int | None]]:
+        tree = await ls_tree(self._git_repo, tree_hash, recursive=True, use_long=True)
+        return {
+            str(entry.file): (entry.object_, entry.object_size)
+            for entry in tree
+            if entry.type_ == TreeContentTypes.BLOB
+        }
+
+    async def _list_changed(self, old_tree: str, new_tree: str) -> dict[str, str | None]:
+        args = ["git", "-C", str(self._git_repo), "diff-tree", "-r", "-z", "--no-renames"]
+        args.extend((old_tree, new_tree))
+        process_status = await subprocess_run(args)
+        if process_status.returncode != 0:
+            raise GitException(process_status.stderr.decode())
+
+        # paths may not be valid UTF-8, surrogateescape keeps them usable as arguments
+        fields = process_status.stdout.decode(errors="surrogateescape").split("\0")
+        changed = {}
+        for meta, path in zip(fields[0:-1:2], fields[1::2], strict=True):
+            _, new_mode, _, new_object, status = meta.split(" ")
+            if status == "D" or new_mode == GITLINK_MODE:
+                changed[path] = None
+            else:
+                changed[path] = new_object
+        return changed
+
+    async def _get_sizes(self, objects: set[str]) -> dict[str, int]:
+        """
+        Get the size of many objects with a single 'cat-file --batch-check'
+        """
+        if not objects:
+            return {}
+        args = ["git", "-C", str(self._git_repo), "cat-file"]
+        args.append("--batch-check=%(objectname) %(objectsize)")
+        process_status = await subprocess_run(args, input="\n".join(objects).encode() + b"\n")
+        if process_status.returncode != 0:
+            raise GitException(process_status.stderr.decode())
+        sizes = {}
+        for line in process_status.stdout.decode().splitlines():
+            object_, size = line.split(" ")
+            sizes[object_] = int(size)
+        return sizes
+
+    def _garbage_count(self) -> int:
+        return len(self._blobs) - len(set(self._paths.values()))
+
+    async def update(self) -> bool:
+        """
+        Update the index to the current commit of the ref,
+        when no index exists (or it has too many removed blobs)
+        the index is fully rebuilt
+
+            :raises UnknownRevisionException: The ref does not exist
+            :raises GitException: Error to do with git
+            :return: Whether the index was changed
+        """
+        await self._load()
+        commit_hash = await resolve_revision(self._git_repo, f"{self._ref}^{{commit}}")
+        if commit_hash == self.commit_hash:
+            return False
+        tree_hash = await resolve_revision(self._git_repo, f"{commit_hash}^{{tree}}")
+
+        rebuild = self.tree_hash is None or self._garbage_count() > max(len(self._paths), 1000)
+        async with BatchObjectReader(self._git_repo) as reader:
+            if rebuild:
+                logger.debug("building trigram index for '%s' at %s", self._ref, commit_hash)
+                self._reset()
+                self._generation += 1
+                for path, (object_, object_size) in (await self._list_all(tree_hash)).items():
+                    if object_ not in self._blob_ids:
+                        content = None
+                        if object_size is not None and object_size <= self._max_blob_size:
+                            content = (await reader.read(object_)).content
+                        self._index_blob(object_, content)
+                    self._paths[path] = self._blob_ids[object_]
+            else:
+                logger.debug("updating trigram index for '%s' to %s", self._ref, commit_hash)
+                changed = await self._list_changed(self.tree_hash, tree_hash)
+                # sizes are checked first, so blobs too large to index are never read
+                sizes = await self._get_sizes(
+                    {
+                        object_
+                        for object_ in changed.values()
+                        if object_ is not None and object_ not in self._blob_ids
+                    }
+                )
+                for path, object_ in changed.items():
+                    if object_ is None:
+                        self._paths.pop(path, None)
+                        continue
+                    if object_ not in self._blob_ids:
+                        content = None
+                        if sizes[object_] <= self._max_blob_size:
+                            content = (await reader.read(object_)).content
+                        self._index_blob(object_, content)
+                    self._paths[path] = self._blob_ids[object_]
+
+        self.commit_hash = commit_hash
+        self.tree_hash = tree_hash
+        await self._save(rebuild)
+        return True
+
+    async def get_candidates(self, query: str) -> list[str]:
+        """
+        Get the paths that may contain a query,
+        queries shorter than a trigram match every path
+
+            :param query: The fixed string to search for
+            :return: The candidate paths, sorted
+        """
+        await self._load()
+        try:
+            candidate_ids = await self._match(query)
+        except FileNotFoundError:
+            # another process rebuilt the index, removing the shards of this generation
+            await self._reload()
+            candidate_ids = await self._match(query)
+        if candidate_ids is None:
+            return sorted(self._paths)
+        candidate_ids |= self._unindexed
+        return sorted(path for path, blob_id in self._paths.items() if blob_id in candidate_ids)
+
+    async def _match(self, query: str) -> set[int] | None:
+        """
+        Get the ids of blobs containing every trigram of a query,
+        None when the query has no trigrams
+        """
+        candidate_ids = None
+        for trigram in extract_trigrams(query.encode()):
+            if self.tree_hash is None:
+                return set()
+            posting = (await self._get_shard(_shard_of(trigram))).get(trigram, ())
+            candidate_ids = set(posting) if candidate_ids is None else candidate_ids & set(posting)
+            if not candidate_ids:
+                break
+        return candidate_ids
+
+    async def search(
+        self, query: str, ignore_case: bool = False, max_results: int | None = None
+    ) -> AsyncGenerator[GrepMatch, None]:
+        """
+        Search the indexed commit for a fixed string, using the
+        index to pick candidate files which are then verified by 'grep'
+
+            :param query: The fixed string to search for
+            :param ignore_case: Whether to ignore case, defaults to False
+            :param max_results: Stop after this many matches, defaults to None
+            :raises GitException: Index has not been built or error to do with git
+            :yield: Each match
+        """
+        await self._load()
+        if self.commit_hash is None:
+            raise GitException("trigram index has not been built, call update() first")
+
+        candidates = await self.get_candidates(query)
+        result_count = 0
+
+        for i in range(0, len(candidates), VERIFY_BATCH_SIZE):
+            pathspecs = [f":(literal){path}" for path in candidates[i : i + VERIFY_BATCH_SIZE]]
+            remaining = None if max_results is None else max_results - result_count
+            matches = grep(
+                self._git_repo,
+                query,
+                self.commit_hash,
+                pathspecs,
+                ignore_case=ignore_case,
+                fixed_strings=True,
+                max_results=remaining,
+            )
+            async with aclosing(matches):
+                async for match in matches:
+                    yield match
+                    result_count += 1
+            if max_results is not None and result_count >= max_results:
+                return
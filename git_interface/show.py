@@ -5,6 +5,8 @@ import re
 from collections.abc import AsyncGenerator
 from pathlib import Path
 
+from .cache import LRUCache
+from .cat_file import get_blob_cached
 from .constants import INVALID_OBJECT_NAME, PATH_DOES_NOT_EXIST
 from .exceptions import (
     BufferedProcessError,
@@ -13,10 +15,12 @@ from .exceptions import (
     UnknownRevisionException,
 )
 from .helpers import subprocess_run, subprocess_run_buffered
+from .rev_parse import resolve_revision
 
 __all__ = [
     "show_file",
     "show_file_buffered",
+    "show_file_cached",
 ]
 
 
@@ -80,3 +84,32 @@ async def show_file_buffered(
             exception = GitException(stderr)
 
         raise exception from err
+
+
+async def show_file_cached(
+    git_repo: Path | str,
+    tree_ish: str,
+    file_path: str,
+    cache: LRUCache[str, bytes] | None = None,
+) -> memoryview:
+    """
+    Read a file from a repository, using the shared object cache
+    (see cat_file.object_cache) so frequently read files are not
+    fetched every time
+
+        :param git_repo: Path to the repo
+        :param tree_ish: The tree ish (branch name, HEAD)
+        :param file_path: The file in the repo to read
+        :param cache: The cache to use, defaults to None (uses cat_file.object_cache)
+        :raises UnknownRevisionException: Unknown tree_ish
+        :raises PathDoesNotExistInRevException: File not found in repo
+        :raises GitException: Error to do with git
+        :return: The read file, as a read-only memoryview
+    """
+    try:
+        return await get_blob_cached(git_repo, f"{tree_ish}:{file_path}", cache)
+    except UnknownRevisionException as err:
+        # find out whether it was the tree_ish or file_path that was unknown
+        await resolve_revision(git_repo, f"{tree_ish}^{{tree}}")
+        msg = f"'{file_path}' not found in repo"
+        raise PathDoesNotExistInRevException(msg) from err
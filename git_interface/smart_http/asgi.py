@@ -0,0 +1,329 @@
+"""
+Smart HTTP Git server as a plain ASGI application,
+not requiring any web framework.
+
+.. code-block:: python
+
+    app = SmartHTTPApp(resolve_from_root(Path("/srv/git")))
+"""
+import asyncio
+import re
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import aclosing
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from ..constants import ALLOWED_PACK_TYPES
+from ..exceptions import PayloadTooLargeError, UnsupportedEncodingError
+from ..helpers import ensure_path
+from ..pack import advertise_pack, exchange_pack
+from ..registry import RepositoryRegistry
+from ..shared import logger
+from ..storage import StorageRouter
+from .compression import (
+    DEFAULT_MAX_DECOMPRESSED_SIZE,
+    choose_response_encoding,
+    compress_stream,
+    decompress_stream,
+)
+
+__all__ = [
+    "RepoResolver",
+    "Authorizer",
+    "resolve_from_root",
+    "resolve_from_registry",
+    "resolve_from_storage",
+    "SmartHTTPApp",
+]
+
+RepoResolver = Callable[[str], Awaitable[Path | None]]
+"""
+Gets the path of a requested repo (e.g. 'user/project.git'),
+or None when it does not exist
+"""
+Authorizer = Callable[[dict, str, str], Awaitable[bool]]
+"""
+Decides whether a request (ASGI scope) can use a pack-type on a requested repo
+"""
+
+INFO_REFS_RE = r"^/(.+)/info/refs$"
+PACK_RE = r"^/(.+)/(git-upload-pack|git-receive-pack)$"
+
+
+def _is_safe_repo_path(requested_repo: str) -> bool:
+    """
+    Whether a requested repo is a relative path without
+    empty (e.g. a leading '/'), '.' or '..' segments
+    """
+    return all(segment not in ("", ".", "..") for segment in requested_repo.split("/"))
+
+
+def resolve_from_root(root_repo_path: Path | str) -> RepoResolver:
+    """
+    Create a resolver that finds repos in a directory
+
+        :param root_repo_path: The directory containing repos
+        :return: The resolver
+    """
+    root_repo_path = ensure_path(root_repo_path)
+
+    def resolve_path(requested_repo: str) -> Path | None:
+        if not _is_safe_repo_path(requested_repo):
+            return None
+        repo_path = root_repo_path / requested_repo
+        # also catches symlinks pointing out of the root
+        if not repo_path.resolve().is_relative_to(root_repo_path.resolve()):
+            return None
+        if repo_path.is_dir():
+            return repo_path
+        return None
+
+    async def resolve(requested_repo: str) -> Path | None:
+        # filesystem access would otherwise block the event loop
+        return await asyncio.to_thread(resolve_path, requested_repo)
+
+    return resolve
+
+
+def resolve_from_registry(registry: RepositoryRegistry) -> RepoResolver:
+    """
+    Create a resolver that finds repos in a started registry
+
+        :param registry: The registry
+        :return: The resolver
+    """
+
+    async def resolve(requested_repo: str) -> Path | None:
+        return registry.resolve(requested_repo)
+
+    return resolve
+
+
+def resolve_from_storage(router: StorageRouter) -> RepoResolver:
+    """
+    Create a resolver that finds repos across storage roots
+
+        :param router: The storage router
+        :return: The resolver
+    """
+
+    async def resolve(requested_repo: str) -> Path | None:
+        return await asyncio.to_thread(router.resolve, requested_repo)
+
+    return resolve
+
+
+async def _allow_all(scope: dict, requested_repo: str, pack_type: str) -> bool:  # noqa: ARG001
+    return True
+
+
+class _ClientDisconnectedError(Exception):
+    pass
+
+
+class _BodyTimeoutError(Exception):
+    pass
+
+
+class SmartHTTPApp:
+    """
+    ASGI application serving 'info/refs', 'git-upload-pack' and 'git-receive-pack',
+    request and response bodies are streamed to and from git without buffering
+    """
+
+    def __init__(
+        self,
+        resolve_repo: RepoResolver,
+        authorize: Authorizer = _allow_all,
+        auth_realm: str = "git",
+        max_decompressed_size: int | None = DEFAULT_MAX_DECOMPRESSED_SIZE,
+        compress_advertisements: bool = True,
+        body_timeout: float | None = 60,
+    ):
+        """
+            :param resolve_repo: Gets the path of a requested repo
+            :param authorize: Decides whether a request is allowed, defaults to allowing all
+            :param auth_realm: Realm sent when a request is not allowed, defaults to "git"
+            :param max_decompressed_size: Max size of a decompressed request body,
+                                          defaults to 64MiB
+            :param compress_advertisements: Compress advertisements when accepted by the client,
+                                            defaults to True
+            :param body_timeout: Seconds to wait for each part of a request body,
+                                 None to wait forever, defaults to 60
+        """
+        self._resolve_repo = resolve_repo
+        self._authorize = authorize
+        self._auth_realm = auth_realm
+        self._max_decompressed_size = max_decompressed_size
+        self._compress_advertisements = compress_advertisements
+        self._body_timeout = body_timeout
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope["type"] == "lifespan":
+            await self._handle_lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        path = scope["path"]
+        method = scope["method"]
+        headers = {name.decode().lower(): value.decode() for name, value in scope["headers"]}
+
+        if method in ("GET", "HEAD") and (match := re.match(INFO_REFS_RE, path)):
+            query = parse_qs(scope.get("query_string", b"").decode())
+            pack_type = query.get("service", [""])[0]
+            await self._handle_info_refs(scope, send, match.group(1), pack_type, headers)
+        elif method == "POST" and (match := re.match(PACK_RE, path)):
+            await self._handle_pack(
+                scope, receive, send, match.group(1), match.group(2), headers
+            )
+        elif re.match(INFO_REFS_RE, path) or re.match(PACK_RE, path):
+            await self._send_error(send, 405, b"Method Not Allowed")
+        else:
+            await self._send_error(send, 404, b"Not Found")
+
+    @staticmethod
+    async def _handle_lifespan(receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _send_error(send: Callable, status: int, message: bytes, headers=()):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"text/plain"), *headers],
+            }
+        )
+        await send({"type": "http.response.body", "body": message})
+
+    async def _get_repo(self, scope: dict, send: Callable, requested_repo: str, pack_type: str):
+        """
+        Get the repo path, sending a error response
+        (and returning None) when it cannot be used
+        """
+        if pack_type not in ALLOWED_PACK_TYPES:
+            await self._send_error(send, 403, b"Unsupported service")
+            return None
+        if not _is_safe_repo_path(requested_repo):
+            await self._send_error(send, 404, b"Repository not found")
+            return None
+        if not await self._authorize(scope, requested_repo, pack_type):
+            await self._send_error(
+                send,
+                401,
+                b"Unauthorized",
+                [(b"www-authenticate", f'Basic realm="{self._auth_realm}"'.encode())],
+            )
+            return None
+        repo_path = await self._resolve_repo(requested_repo)
+        if repo_path is None:
+            await self._send_error(send, 404, b"Repository not found")
+        return repo_path
+
+    @staticmethod
+    async def _send_stream(
+        send: Callable, stream: AsyncGenerator[bytes, None], first_chunk: bytes = b""
+    ):
+        async with aclosing(stream):
+            if first_chunk:
+                await send({"type": "http.response.body", "body": first_chunk, "more_body": True})
+            async for chunk in stream:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _handle_info_refs(
+        self, scope: dict, send: Callable, requested_repo: str, pack_type: str, headers: dict
+    ):
+        repo_path = await self._get_repo(scope, send, requested_repo, pack_type)
+        if repo_path is None:
+            return
+
+        stream = advertise_pack(repo_path, pack_type)
+        response_headers = [
+            (b"content-type", f"application/x-{pack_type}-advertisement".encode()),
+            (b"cache-control", b"no-store"),
+            (b"expires", b"0"),
+        ]
+        encoding = None
+        if self._compress_advertisements:
+            encoding = choose_response_encoding(headers.get("accept-encoding"))
+        if encoding is not None:
+            stream = compress_stream(stream, encoding)
+            response_headers.append((b"content-encoding", encoding.encode()))
+            response_headers.append((b"vary", b"Accept-Encoding"))
+
+        await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await self._send_stream(send, stream)
+
+    async def _handle_pack(
+        self,
+        scope: dict,
+        receive: Callable,
+        send: Callable,
+        requested_repo: str,
+        pack_type: str,
+        headers: dict,
+    ):
+        repo_path = await self._get_repo(scope, send, requested_repo, pack_type)
+        if repo_path is None:
+            return
+
+        async def receive_body() -> AsyncGenerator[bytes, None]:
+            while True:
+                try:
+                    message = await asyncio.wait_for(receive(), self._body_timeout)
+                except asyncio.TimeoutError:
+                    raise _BodyTimeoutError from None
+                if message["type"] == "http.disconnect":
+                    raise _ClientDisconnectedError
+                if body := message.get("body"):
+                    yield body
+                if not message.get("more_body"):
+                    return
+
+        body = decompress_stream(
+            receive_body(), headers.get("content-encoding"), self._max_decompressed_size
+        )
+        stream = exchange_pack(repo_path, pack_type, body)
+
+        # the whole request is read before git responds,
+        # so a invalid body can be rejected before the response starts
+        try:
+            first_chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            first_chunk = b""
+        except PayloadTooLargeError:
+            await self._send_error(send, 413, b"Request body too large")
+            return
+        except UnsupportedEncodingError:
+            await self._send_error(send, 415, b"Unsupported content encoding")
+            return
+        except _BodyTimeoutError:
+            await self._send_error(send, 408, b"Request body timed out")
+            return
+        except _ClientDisconnectedError:
+            logger.debug("client disconnected during pack request for: %s", requested_repo)
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", f"application/x-{pack_type}-result".encode()),
+                    (b"cache-control", b"no-store"),
+                    (b"expires", b"0"),
+                ],
+            }
+        )
+        await self._send_stream(send, stream, first_chunk)
@@ -0,0 +1,149 @@
+"""
+Compression of smart-http request and response bodies,
+not tied to a web framework.
+
+zstd support requires the 'zstandard' package (zstd extra).
+"""
+import zlib
+from collections.abc import AsyncGenerator, AsyncIterable
+
+from ..constants import DEFAULT_BUFFER_SIZE
+from ..exceptions import PayloadTooLargeError, UnsupportedEncodingError
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+__all__ = [
+    "DEFAULT_MAX_DECOMPRESSED_SIZE",
+    "get_response_encodings",
+    "choose_response_encoding",
+    "decompress_stream",
+    "compress_stream",
+]
+
+DEFAULT_MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024
+
+_ZLIB_WBITS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "x-gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+
+
+def get_response_encodings() -> tuple[str, ...]:
+    """
+    Get the response encodings that can be used, in order of preference
+
+        :return: The encodings
+    """
+    if zstandard is not None:
+        return ("zstd", "gzip")
+    return ("gzip",)
+
+
+def choose_response_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Choose a response encoding from a 'Accept-Encoding' header
+
+        :param accept_encoding: The header value
+        :return: The chosen encoding, or None when none are accepted
+    """
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, *params = (value.strip() for value in part.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.lower())
+    for encoding in get_response_encodings():
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+async def decompress_stream(
+    stream: AsyncIterable[bytes],
+    content_encoding: str | None,
+    max_size: int | None = DEFAULT_MAX_DECOMPRESSED_SIZE,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Decompress a request body as it is received,
+    (supports gzip and deflate, as used by git clients)
+
+        :param stream: The received body
+        :param content_encoding: The 'Content-Encoding' header value
+        :param max_size: Max decompressed size, defaults to 64MiB
+        :raises UnsupportedEncodingError: Unknown content encoding
+        :raises PayloadTooLargeError: Decompressed body is larger than max_size
+        :yield: Each decompressed chunk
+    """
+    content_encoding = (content_encoding or "identity").strip().lower()
+    if content_encoding == "identity":
+        async for chunk in stream:
+            yield chunk
+        return
+    if content_encoding not in _ZLIB_WBITS:
+        msg = f"unsupported content encoding '{content_encoding}'"
+        raise UnsupportedEncodingError(msg)
+
+    decompressor = zlib.decompressobj(_ZLIB_WBITS[content_encoding])
+    size = 0
+
+    def check_size(decompressed: bytes):
+        nonlocal size
+        size += len(decompressed)
+        if max_size is not None and size > max_size:
+            msg = f"decompressed body larger than {max_size} bytes"
+            raise PayloadTooLargeError(msg)
+
+    try:
+        async for chunk in stream:
+            # limit output of each step, so large bodies are never fully in memory
+            while chunk and not decompressor.eof:
+                decompressed = decompressor.decompress(chunk, DEFAULT_BUFFER_SIZE)
+                chunk = decompressor.unconsumed_tail
+                check_size(decompressed)
+                if decompressed:
+                    yield decompressed
+        decompressed = decompressor.flush()
+    except zlib.error as err:
+        msg = f"invalid {content_encoding} body"
+        raise UnsupportedEncodingError(msg) from err
+    check_size(decompressed)
+    if decompressed:
+        yield decompressed
+
+
+async def compress_stream(
+    stream: AsyncIterable[bytes], encoding: str
+) -> AsyncGenerator[bytes, None]:
+    """
+    Compress a response body as it is sent
+
+        :param stream: The body
+        :param encoding: The encoding to use (see get_response_encodings)
+        :raises UnsupportedEncodingError: Unknown encoding
+        :yield: Each compressed chunk
+    """
+    if encoding == "zstd" and zstandard is not None:
+        compressor = zstandard.ZstdCompressor().compressobj()
+    elif encoding in ("gzip", "x-gzip"):
+        compressor = zlib.compressobj(wbits=_ZLIB_WBITS[encoding])
+    else:
+        msg = f"unsupported encoding '{encoding}'"
+        raise UnsupportedEncodingError(msg)
+
+    async for chunk in stream:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
@@ -1,12 +1,20 @@
 """
 Smart HTTP Git helpers for quart
 """
+from collections.abc import AsyncGenerator
 from pathlib import Path
 
 from async_timeout import timeout
-from quart import Response, current_app, make_response, request
+from quart import Response, abort, current_app, make_response, request
 
+from ..exceptions import PayloadTooLargeError, UnsupportedEncodingError
 from ..pack import advertise_pack, exchange_pack
+from .compression import (
+    DEFAULT_MAX_DECOMPRESSED_SIZE,
+    choose_response_encoding,
+    compress_stream,
+    decompress_stream,
+)
 
 __all__ = [
     "post_pack_response",
@@ -14,25 +22,47 @@ __all__ = [
 ]
 
 
+async def _prepend(first_chunk: bytes, stream: AsyncGenerator[bytes, None]):
+    yield first_chunk
+    async for chunk in stream:
+        yield chunk
+
+
 async def post_pack_response(repo_path: Path, pack_type: str) -> Response:
     """
     Make the response for handling exchange pack responses,
     uses 'BODY_TIMEOUT' for a timeout of a request.
 
+    Compressed request bodies ('Content-Encoding: gzip') are
+    decompressed as they are received, up to 'MAX_DECOMPRESSED_BODY_SIZE'
+    (defaults to 64MiB) bytes.
+
     A matching route should be: '/<repo_name>.git/<pack_type>'.
 
         :param repo_path: Path to the repo
         :param pack_type: The pack-type
         :return: The created response
     """
-    async with timeout(current_app.config["BODY_TIMEOUT"]):
-        response = await make_response(
-            exchange_pack(
-                repo_path,
-                pack_type,
-                request.body,
-            )
-        )
+    body = decompress_stream(
+        request.body,
+        request.headers.get("Content-Encoding"),
+        current_app.config.get("MAX_DECOMPRESSED_BODY_SIZE", DEFAULT_MAX_DECOMPRESSED_SIZE),
+    )
+    output_stream = exchange_pack(repo_path, pack_type, body)
+
+    # the whole request is read before git responds,
+    # so a invalid body can be rejected before the response starts
+    try:
+        async with timeout(current_app.config["BODY_TIMEOUT"]):
+            first_chunk = await output_stream.__anext__()
+    except PayloadTooLargeError:
+        abort(413)
+    except UnsupportedEncodingError:
+        abort(415)
+    except StopAsyncIteration:
+        first_chunk = b""
+
+    response = await make_response(_prepend(first_chunk, output_stream))
     response.content_type = f"application/x-{pack_type}-result"
     response.headers.add_header("Cache-Control", "no-store")
     response.headers.add_header("Expires", "0")
@@ -41,7 +71,9 @@ async def post_pack_response(repo_path: Path, pack_type: str) -> Response:
 
 async def get_info_refs_response(repo_path, pack_type) -> Response:
     """
-    Make the response for handling advertisements.
+    Make the response for handling advertisements,
+    compressed when the client accepts it unless
+    'COMPRESS_ADVERTISEMENTS' is set to False.
 
     A matching route should be: '/<repo_name>.git/info/refs',
     accessing the 'service' argument for pack_type.
@@ -50,13 +82,18 @@ async def get_info_refs_response(repo_path, pack_type) -> Response:
         :param pack_type: The pack-type
         :return: The created response
     """
-    response = await make_response(
-        advertise_pack(
-            repo_path,
-            pack_type,
-        )
-    )
+    stream = advertise_pack(repo_path, pack_type)
+    encoding = None
+    if current_app.config.get("COMPRESS_ADVERTISEMENTS", True):
+        encoding = choose_response_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is not None:
+        stream = compress_stream(stream, encoding)
+
+    response = await make_response(stream)
     response.content_type = f"application/x-{pack_type}-advertisement"
     response.headers.add_header("Cache-Control", "no-store")
     response.headers.add_header("Expires", "0")
+    if encoding is not None:
+        response.headers.add_header("Content-Encoding", encoding)
+        response.headers.add_header("Vary", "Accept-Encoding")
     return response
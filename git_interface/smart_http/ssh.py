@@ -1,18 +1,29 @@
 import asyncio
 import re
 import sys
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
 from os import environ
 from pathlib import Path
 
 import asyncssh
 
-from ..constants import VALID_SSH_COMMAND_RE
-from ..pack import ssh_pack_exchange
+from ..constants import DEFAULT_BUFFER_SIZE, VALID_SSH_COMMAND_RE
+from ..exceptions import BufferedProcessError
+from ..pack import ssh_pack_exchange, ssh_pack_session
+from ..registry import RepositoryRegistry
 from ..shared import logger
+from ..storage import StorageRouter
 
 __all__ = ["NoAuthHandler", "Server"]
 
 
+async def _read_chunks(reader: asyncssh.SSHReader) -> AsyncGenerator[bytes, None]:
+    # iterating a SSHReader splits on newlines, which is slow for pack data
+    while chunk := await reader.read(DEFAULT_BUFFER_SIZE):
+        yield chunk
+
+
 class NoAuthHandler(asyncssh.SSHServer):
     """
     basic ssh server handler that provides no authentication
@@ -43,10 +54,43 @@ class Server:
 
     _no_command_msg = b"Successfully authenticated, but this server does not provide shell access"
     _no_repo_msg = b"request path does not exist, or you do not have access"
-
-    def __init__(self, root_repo_path: Path, handler_class: asyncssh.SSHServer = NoAuthHandler):
+    _too_many_channels_msg = b"too many concurrent sessions on this connection"
+
+    def __init__(
+        self,
+        root_repo_path: Path | StorageRouter,
+        handler_class: asyncssh.SSHServer = NoAuthHandler,
+        max_channels: int | None = 4,
+        window: int = 2 * 1024 * 1024,
+        max_pktsize: int = 32768,
+        write_buffer_size: int = 64 * 1024,
+        stateful_sessions: bool = True,
+        registry: RepositoryRegistry | None = None,
+    ):
+        """
+            :param root_repo_path: Directory containing the repos,
+                                   or a router for repos across storage roots
+            :param handler_class: The ssh server handler, defaults to NoAuthHandler
+            :param max_channels: Max concurrent sessions per connection, defaults to 4
+            :param window: SSH receive window size, defaults to 2MiB
+            :param max_pktsize: Max SSH packet size, defaults to 32KiB
+            :param write_buffer_size: Buffered output per session before
+                                      reading from git is paused, defaults to 64KiB
+            :param stateful_sessions: Use one stateful git process per session,
+                                      instead of stateless processes as used by http,
+                                      defaults to True
+            :param registry: Started registry used to find repos,
+                             instead of checking the filesystem, defaults to None
+        """
         self._root_repo_path = root_repo_path
         self._handler_class = handler_class
+        self._max_channels = max_channels
+        self._window = window
+        self._max_pktsize = max_pktsize
+        self._write_buffer_size = write_buffer_size
+        self._stateful_sessions = stateful_sessions
+        self._registry = registry
+        self._channel_counts: dict[asyncssh.SSHServerConnection, int] = {}
 
     def ensure_valid_repo(self, requested_repo: str, username: str) -> Path | None:  # noqa: ARG002
         """
@@ -58,6 +102,10 @@ class Server:
             :param username: The username for the connected client
             :return: The absolute repo path, or None if path was invalid
         """
+        if self._registry is not None:
+            return self._registry.resolve(requested_repo)
+        if isinstance(self._root_repo_path, StorageRouter):
+            return self._root_repo_path.resolve(requested_repo)
         repo_path: Path = self._root_repo_path / requested_repo.removeprefix("/")
         if repo_path.exists():
             return repo_path
@@ -88,10 +136,30 @@ class Server:
         Method used when client has been authenticated,
         provides git pack exchange,
         validation provided by:
-        ensure_valid_repo, peer_allowed and username_valid
+        ensure_valid_repo, peer_allowed and username_valid.
+
+        Limited to 'max_channels' concurrent sessions per connection.
 
             :param process: The SSHServerProcess
         """
+        conn = process.channel.get_connection()
+        channel_count = self._channel_counts.get(conn, 0)
+        if self._max_channels is not None and channel_count >= self._max_channels:
+            peer_name = conn.get_extra_info("peername")[0]
+            logger.debug("too many channels for connection from: %s", peer_name)
+            process.stderr.write(self._too_many_channels_msg)
+            process.exit(1)
+            return
+
+        self._channel_counts[conn] = channel_count + 1
+        try:
+            await self._handle_client(process)
+        finally:
+            self._channel_counts[conn] -= 1
+            if self._channel_counts[conn] == 0:
+                del self._channel_counts[conn]
+
+    async def _handle_client(self, process: asyncssh.SSHServerProcess):
         peer_name = process.get_extra_info("peername")[0]
         username = process.get_extra_info("username")
 
@@ -126,8 +194,30 @@ class Server:
                 process.exit(0)
                 return
 
-            async for chunk in ssh_pack_exchange(repo_path, pack_type, process.stdin):
-                process.stdout.write(chunk)
+            # waiting for the channel to drain stops reading from git,
+            # so slow clients do not cause output to buffer in memory
+            process.channel.set_write_buffer_limits(high=self._write_buffer_size)
+            if self._stateful_sessions:
+                stream = ssh_pack_session(
+                    repo_path,
+                    pack_type,
+                    _read_chunks(process.stdin),
+                    process.env.get("GIT_PROTOCOL"),
+                )
+            else:
+                stream = ssh_pack_exchange(repo_path, pack_type, process.stdin)
+            try:
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        process.stdout.write(chunk)
+                        await process.stdout.drain()
+            except BufferedProcessError as err:
+                # pass on git's failure, so the client does not see success
+                stderr, return_code = err.args
+                logger.debug("git exited with %d for: %s", return_code, repo_path)
+                process.stderr.write(stderr)
+                process.exit(return_code)
+                return
 
         process.exit(0)
 
@@ -147,6 +237,8 @@ class Server:
             server_host_keys=host_keys,
             process_factory=self.handle_client,
             encoding=None,
+            window=self._window,
+            max_pktsize=self._max_pktsize,
         )
 
 
@@ -0,0 +1,248 @@
+"""
+Persistent contributor statistics of a ref (commits and lines
+added/removed per author and period), updated incrementally
+"""
+import json
+from contextlib import aclosing
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+import aiofiles
+import aiofiles.os
+
+from .datatypes import ContributorStat, PeriodStat, StatsPeriod
+from .exceptions import BufferedProcessError, GitException
+from .helpers import QoSClass, get_data_dir, line_yielder, subprocess_run, subprocess_run_buffered
+from .rev_parse import resolve_revision
+from .shared import logger
+
+__all__ = [
+    "ContributorStats",
+]
+
+STATS_VERSION = 1
+COMMIT_MARKER = b"\x1e"
+FIELD_SEPARATOR = "\x1f"
+
+
+def _get_period(timestamp: int, period: StatsPeriod) -> str:
+    date = datetime.fromtimestamp(timestamp, timezone.utc).date()
+    if period == StatsPeriod.DAY:
+        return date.isoformat()
+    if period == StatsPeriod.WEEK:
+        year, week, _ = date.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == StatsPeriod.MONTH:
+        return f"{date.year}-{date.month:02d}"
+    return str(date.year)
+
+
+class ContributorStats:
+    """
+    Contributor statistics of the history of a ref,
+    stored inside the repo's data directory.
+    Call update() after the ref changes (e.g. after a push),
+    only commits made since the last update will be read,
+    unless history was rewritten in which case they are recomputed.
+    """
+
+    def __init__(
+        self, git_repo: Path | str, ref: str = "HEAD", period: StatsPeriod = StatsPeriod.MONTH
+    ):
+        """
+            :param git_repo: Path to the repo
+            :param ref: The ref to get statistics of, defaults to "HEAD"
+            :param period: What to group totals over time by, defaults to StatsPeriod.MONTH
+        """
+        self._git_repo = git_repo
+        self._ref = ref
+        self._period = period
+        self._stats_path = (
+            get_data_dir(git_repo) / "stats" / f"{quote(ref, safe='')}-{period.value}.json"
+        )
+        self._loaded = False
+        self.commit_hash: str | None = None
+        self._reset()
+
+    def _reset(self):
+        # totals by email: name, commits, additions, deletions, first and last timestamp
+        self._authors: dict[str, list] = {}
+        # totals by email then period: commits, additions, deletions
+        self._periods: dict[str, dict[str, list[int]]] = {}
+
+    async def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            async with aiofiles.open(self._stats_path, "r") as fo:
+                stored = json.loads(await fo.read())
+        except FileNotFoundError:
+            return
+        if stored.get("version") != STATS_VERSION:
+            logger.info("contributor stats version changed, will rebuild: %s", self._stats_path)
+            return
+        self.commit_hash = stored["commit"]
+        self._authors = stored["authors"]
+        self._periods = stored["periods"]
+
+    async def _save(self):
+        stored = {
+            "version": STATS_VERSION,
+            "ref": self._ref,
+            "commit": self.commit_hash,
+            "authors": self._authors,
+            "periods": self._periods,
+        }
+        await aiofiles.os.makedirs(self._stats_path.parent, exist_ok=True)
+        tmp_path = self._stats_path.with_suffix(".tmp")
+        async with aiofiles.open(tmp_path, "w") as fo:
+            await fo.write(json.dumps(stored, separators=(",", ":")))
+        await aiofiles.os.replace(tmp_path, self._stats_path)
+
+    async def _is_ancestor(self, old_commit: str, new_commit: str) -> bool:
+        args = ["git", "-C", str(self._git_repo), "merge-base", "--is-ancestor"]
+        process_status = await subprocess_run([*args, old_commit, new_commit])
+        # also false when the old commit no longer exists
+        return process_status.returncode == 0
+
+    def _add_commit(self, email: str, name: str, timestamp: int, additions: int, deletions: int):
+        author = self._authors.get(email)
+        if author is None:
+            self._authors[email] = [name, 1, additions, deletions, timestamp, timestamp]
+        else:
+            if timestamp >= author[5]:
+                # keep the most recently used name
+                author[0] = name
+            author[1] += 1
+            author[2] += additions
+            author[3] += deletions
+            author[4] = min(author[4], timestamp)
+            author[5] = max(author[5], timestamp)
+        totals = self._periods.setdefault(email, {}).setdefault(
+            _get_period(timestamp, self._period), [0, 0, 0]
+        )
+        totals[0] += 1
+        totals[1] += additions
+        totals[2] += deletions
+
+    async def _process(self, revisions: list[str]) -> int:
+        """
+        Add the commits of revisions with a single
+        streamed 'log', returning how many were added
+        """
+        args = [
+            "git",
+            "-C",
+            str(self._git_repo),
+            "log",
+            "--numstat",
+            "-z",
+            "--format=%x1e%H%x1f%aN%x1f%aE%x1f%at",
+            "--end-of-options",
+            *revisions,
+            "--",
+        ]
+        commit_count = 0
+        current = None
+        skip = 0
+
+        def flush():
+            if current is not None:
+                self._add_commit(*current)
+
+        try:
+            async with aclosing(subprocess_run_buffered(args, QoSClass.BATCH)) as chunks:
+                async for record in line_yielder(chunks, b"\0"):
+                    record = record.removeprefix(b"\n")
+                    if skip:
+                        skip -= 1
+                    elif record.startswith(COMMIT_MARKER):
+                        flush()
+                        _, name, email, timestamp = record[1:].decode().split(FIELD_SEPARATOR)
+                        current = [email, name, int(timestamp), 0, 0]
+                        commit_count += 1
+                    elif record:
+                        additions, deletions, path = record.split(b"\t", 2)
+                        # binary files have '-' counts
+                        if additions != b"-":
+                            current[3] += int(additions)
+                            current[4] += int(deletions)
+                        if not path:
+                            # a rename, the old and new paths follow
+                            skip = 2
+            flush()
+        except BufferedProcessError as err:
+            raise GitException(err.args[0].decode()) from err
+        return commit_count
+
+    async def update(self) -> bool:
+        """
+        Update the statistics to the current commit of the ref
+
+            :raises UnknownRevisionException: The ref does not exist
+            :raises GitException: Error to do with git
+            :return: Whether the statistics were changed
+        """
+        await self._load()
+        commit_hash = await resolve_revision(self._git_repo, f"{self._ref}^{{commit}}")
+        if commit_hash == self.commit_hash:
+            return False
+
+        if self.commit_hash is not None and await self._is_ancestor(self.commit_hash, commit_hash):
+            commit_count = await self._process([commit_hash, f"^{self.commit_hash}"])
+            logger.debug("added %d commits to contributor stats of '%s'", commit_count, self._ref)
+        else:
+            # first update or history was rewritten
+            self._reset()
+            commit_count = await self._process([commit_hash])
+            logger.debug(
+                "computed contributor stats of '%s' from %d commits", self._ref, commit_count
+            )
+
+        self.commit_hash = commit_hash
+        await self._save()
+        return True
+
+    async def get_contributors(self) -> list[ContributorStat]:
+        """
+        Get the totals of every author, as of the last update
+
+            :return: The totals, most commits first
+        """
+        await self._load()
+        contributors = [
+            ContributorStat(
+                email,
+                name,
+                commits,
+                additions,
+                deletions,
+                datetime.fromtimestamp(first, timezone.utc),
+                datetime.fromtimestamp(last, timezone.utc),
+            )
+            for email, (name, commits, additions, deletions, first, last) in self._authors.items()
+        ]
+        return sorted(contributors, key=lambda stat: (-stat.commits, stat.email))
+
+    async def get_periods(self, email: str | None = None) -> list[PeriodStat]:
+        """
+        Get the totals of each period, as of the last update
+
+            :param email: Only include this author, defaults to None
+            :return: The totals, ordered by period (periods without commits are left out)
+        """
+        await self._load()
+        if email is not None:
+            by_author = [self._periods.get(email, {})]
+        else:
+            by_author = self._periods.values()
+        totals: dict[str, list[int]] = {}
+        for periods in by_author:
+            for period, (commits, additions, deletions) in periods.items():
+                total = totals.setdefault(period, [0, 0, 0])
+                total[0] += commits
+                total[1] += additions
+                total[2] += deletions
+        return [PeriodStat(period, *totals[period]) for period in sorted(totals)]
@@ -0,0 +1,269 @@
+"""
+Routing of repos across multiple storage roots (e.g. disks or mounts),
+using a weighted consistent-hash ring so adding a root only moves
+a share of repos proportional to its weight.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+from bisect import bisect
+from pathlib import Path
+from secrets import token_hex
+
+from .exceptions import AlreadyExistsException, DoesNotExistException, MigrationException
+from .helpers import ensure_path, subprocess_run
+from .shared import logger
+
+__all__ = [
+    "StorageRouter",
+]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def _check_name(name: str) -> str:
+    name = name.strip("/")
+    if not name or ".." in name.split("/"):
+        msg = f"invalid repo name '{name}'"
+        raise ValueError(msg)
+    return name
+
+
+async def _get_refs(repo_path: Path) -> str:
+    args = ["git", "-C", str(repo_path), "for-each-ref", "--format=%(objectname) %(refname)"]
+    process_status = await subprocess_run(args)
+    if process_status.returncode != 0:
+        raise MigrationException(process_status.stderr.decode())
+    return process_status.stdout.decode()
+
+
+async def _run_git(*args: str):
+    process_status = await subprocess_run(["git", *args])
+    if process_status.returncode != 0:
+        raise MigrationException(process_status.stderr.decode())
+
+
+class StorageRouter:
+    """
+    Maps repo names (e.g. 'user/project.git') to one of several storage roots.
+
+    Repos that have been migrated away from where the ring places them
+    are remembered in the placement file (when given), so placement
+    stays stable across restarts.
+
+    .. code-block:: python
+
+        router = StorageRouter({"disk-a": Path("/mnt/a"), "disk-b": Path("/mnt/b")})
+        repo_path = router.get_path("user/project.git")
+    """
+
+    def __init__(
+        self,
+        roots: dict[str, Path | str],
+        weights: dict[str, int] | None = None,
+        virtual_nodes: int = 64,
+        placement_file: Path | str | None = None,
+    ):
+        """
+            :param roots: Storage root paths by their id
+            :param weights: Relative weight of each root, missing roots default to 1
+            :param virtual_nodes: Ring points per unit of weight, defaults to 64
+            :param placement_file: JSON file to persist migrated placements,
+                                   defaults to None
+            :raises ValueError: No roots or a invalid weight given
+        """
+        if not roots:
+            raise ValueError("at least one storage root is required")
+        weights = weights or {}
+        self._roots = {root_id: ensure_path(path) for root_id, path in roots.items()}
+        self._placement_file = ensure_path(placement_file) if placement_file else None
+        self._placements: dict[str, str] = {}
+        self._migration_locks: dict[str, asyncio.Lock] = {}
+
+        ring = []
+        for root_id in self._roots:
+            weight = weights.get(root_id, 1)
+            if weight < 1:
+                msg = f"weight for '{root_id}' must be at least 1"
+                raise ValueError(msg)
+            ring.extend(
+                (_hash(f"{root_id}#{index}"), root_id) for index in range(weight * virtual_nodes)
+            )
+        ring.sort()
+        self._ring_hashes = [point for point, _ in ring]
+        self._ring_roots = [root_id for _, root_id in ring]
+
+        if self._placement_file is not None and self._placement_file.exists():
+            self._placements = {
+                name: root_id
+                for name, root_id in json.loads(self._placement_file.read_text()).items()
+                if root_id in self._roots
+            }
+
+    @property
+    def roots(self) -> dict[str, Path]:
+        """
+        The storage root paths by their id
+        """
+        return dict(self._roots)
+
+    def get_ring_root(self, name: str) -> str:
+        """
+        Get the root the ring places a repo on, ignoring migrations
+
+            :param name: The repo name
+            :return: The root id
+        """
+        index = bisect(self._ring_hashes, _hash(_check_name(name)))
+        return self._ring_roots[index % len(self._ring_roots)]
+
+    def get_root(self, name: str) -> str:
+        """
+        Get the root a repo is placed on
+
+            :param name: The repo name
+            :raises ValueError: Invalid repo name
+            :return: The root id
+        """
+        name = _check_name(name)
+        return self._placements.get(name) or self.get_ring_root(name)
+
+    def get_path(self, name: str) -> Path:
+        """
+        Get where a repo is (or will be) stored
+
+            :param name: The repo name
+            :raises ValueError: Invalid repo name
+            :return: The repo path
+        """
+        name = _check_name(name)
+        return self._roots[self.get_root(name)] / name
+
+    def resolve(self, name: str) -> Path | None:
+        """
+        Get the path of a existing repo, other roots are checked
+        when it is not where expected (e.g. after roots were added)
+
+            :param name: The repo name
+            :return: The repo path, or None when it does not exist
+        """
+        try:
+            name = _check_name(name)
+        except ValueError:
+            return None
+        repo_path = self.get_path(name)
+        if repo_path.is_dir():
+            return repo_path
+        for root_id, root_path in self._roots.items():
+            if (root_path / name).is_dir():
+                logger.info("repo '%s' found on storage root '%s'", name, root_id)
+                self._placements[name] = root_id
+                return root_path / name
+        return None
+
+    def _save_placements(self):
+        if self._placement_file is None:
+            return
+        tmp_path = self._placement_file.with_name(self._placement_file.name + ".tmp")
+        tmp_path.write_text(json.dumps(self._placements, indent=2, sort_keys=True))
+        os.replace(tmp_path, self._placement_file)
+
+    def _set_placement(self, name: str, root_id: str):
+        if self.get_ring_root(name) == root_id:
+            self._placements.pop(name, None)
+        else:
+            self._placements[name] = root_id
+        self._save_placements()
+
+    async def _sync(self, source: Path, target: Path, max_attempts: int):
+        """
+        Fetch into target until its refs match source,
+        writes to source are still allowed while syncing
+        """
+        for _ in range(max_attempts):
+            if await _get_refs(source) == await _get_refs(target):
+                return
+            await _run_git(
+                "-C", str(target), "fetch", "--quiet", "--prune", str(source), "+refs/*:refs/*"
+            )
+        if await _get_refs(source) != await _get_refs(target):
+            msg = f"refs of '{source}' still changing after {max_attempts} attempts"
+            raise MigrationException(msg)
+
+    async def migrate(
+        self, name: str, target_root: str, delete_delay: float = 60, max_sync_attempts: int = 5
+    ) -> Path:
+        """
+        Move a repo to another storage root while it is in use:
+        copy, verify (fsck and refs), switch placement then delete the original.
+
+        Updates to refs that happen between switching and the
+        original being deleted are fetched (as fast-forwards only) into the copy.
+
+            :param name: The repo name
+            :param target_root: The root id to move to
+            :param delete_delay: Seconds to wait before deleting the original,
+                                 so in-progress operations can finish, defaults to 60
+            :param max_sync_attempts: Max fetches when refs change while copying, defaults to 5
+            :raises ValueError: Unknown root or invalid repo name
+            :raises DoesNotExistException: Repo does not exist
+            :raises AlreadyExistsException: Repo already exists on target
+            :raises MigrationException: Copy could not be verified
+            :return: The new repo path
+        """
+        name = _check_name(name)
+        if target_root not in self._roots:
+            msg = f"unknown storage root '{target_root}'"
+            raise ValueError(msg)
+
+        async with self._migration_locks.setdefault(name, asyncio.Lock()):
+            source = self.resolve(name)
+            if source is None:
+                msg = f"repo '{name}' does not exist"
+                raise DoesNotExistException(msg)
+            target = self._roots[target_root] / name
+            if source == target:
+                return target
+            if target.exists():
+                msg = f"repo '{name}' already exists on '{target_root}'"
+                raise AlreadyExistsException(msg)
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_target = target.with_name(f".{target.name}.migrating-{token_hex(4)}")
+            try:
+                await _run_git(
+                    "clone", "--quiet", "--mirror", "--no-hardlinks", str(source), str(tmp_target)
+                )
+                # keep the original's settings (e.g. receive options) instead of the clone's
+                for filename in ("config", "description"):
+                    if (source / filename).exists():
+                        shutil.copy2(source / filename, tmp_target / filename)
+                await self._sync(source, tmp_target, max_sync_attempts)
+                await _run_git(
+                    "-C", str(tmp_target), "fsck", "--connectivity-only", "--no-progress"
+                )
+                os.replace(tmp_target, target)
+            except BaseException:
+                await asyncio.to_thread(shutil.rmtree, tmp_target, True)
+                raise
+
+            self._set_placement(name, target_root)
+            logger.info("repo '%s' switched to storage root '%s'", name, target_root)
+
+            await asyncio.sleep(delete_delay)
+            if await _get_refs(source) != await _get_refs(target):
+                # catch up with pushes that started before the switch,
+                # without overwriting any that were made after it
+                try:
+                    await _run_git(
+                        "-C", str(target), "fetch", "--quiet", str(source), "refs/*:refs/*"
+                    )
+                except MigrationException as err:
+                    logger.warning("not all refs of '%s' could be caught up: %s", name, err)
+            await asyncio.to_thread(shutil.rmtree, source)
+            logger.info("repo '%s' removed from previous storage root", name)
+            return target
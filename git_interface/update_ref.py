@@ -0,0 +1,245 @@
+"""
+Methods for updating many refs at once,
+using the transaction commands of 'update-ref --stdin'
+"""
+import asyncio
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from typing_extensions import Self
+
+from .constants import OBJECT_ID_RE, REF_UPDATE_CONFLICT_RE
+from .datatypes import RefUpdateFailure
+from .exceptions import GitException, RefUpdateConflictException
+from .helpers import create_subprocess, kill_process_group, subprocess_run
+
+__all__ = [
+    "RefTransaction",
+]
+
+
+@dataclass
+class _RefOperation:
+    command: str
+    ref: str
+    values: tuple[str, ...]
+
+    def to_line(self) -> bytes:
+        return " ".join((self.command, self.ref, *self.values)).encode() + b"\n"
+
+
+def _find_failed_ref(stderr: str, refs: set[str]) -> str | None:
+    """
+    Find which ref git stopped at, it is named in the error
+    (e.g. "fatal: prepare: cannot lock ref 'refs/heads/a': ...")
+    """
+    for token in re.findall(r"[^\s':]+", stderr):
+        if token in refs:
+            return token
+    return None
+
+
+class RefTransaction:
+    """
+    Queues ref creates, updates, deletes and verifies,
+    applying them with a single 'update-ref' process.
+
+    When atomic either every ref is changed or none are,
+    otherwise refs that fail are skipped and the rest are still changed
+    (refs not at their old value are found up front with 'for-each-ref').
+    Giving a old value to check makes a change only apply
+    if the ref has not been changed since it was read.
+
+    .. code-block:: python
+
+        async with RefTransaction(git_repo, "cleanup", atomic=False) as transaction:
+            for branch, commit in stale_branches.items():
+                transaction.delete(f"refs/heads/{branch}", commit)
+        print(transaction.failures)
+    """
+
+    def __init__(self, git_repo: Path | str, message: str | None = None, atomic: bool = True):
+        """
+            :param git_repo: Path to the repo
+            :param message: Message for the reflog, defaults to None
+            :param atomic: Whether all changes must succeed together, defaults to True
+        """
+        self._git_repo = git_repo
+        self._message = message
+        self._atomic = atomic
+        self._operations: list[_RefOperation] = []
+        self.failures: list[RefUpdateFailure] = []
+        """refs skipped by the last commit, when not atomic"""
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, exc_type, *_):
+        if exc_type is None:
+            await self.commit()
+
+    def __len__(self) -> int:
+        return len(self._operations)
+
+    def create(self, ref: str, new_value: str):
+        """
+        Queue creating a ref, that must not already exist
+
+            :param ref: The full ref (e.g. 'refs/heads/main')
+            :param new_value: The object id (or revision) to point to
+        """
+        self._operations.append(_RefOperation("create", ref, (new_value,)))
+
+    def update(self, ref: str, new_value: str, old_value: str | None = None):
+        """
+        Queue updating (or creating) a ref
+
+            :param ref: The full ref
+            :param new_value: The object id (or revision) to point to
+            :param old_value: Only update if the ref is at this object id,
+                              defaults to None
+        """
+        values = (new_value,) if old_value is None else (new_value, old_value)
+        self._operations.append(_RefOperation("update", ref, values))
+
+    def delete(self, ref: str, old_value: str | None = None):
+        """
+        Queue deleting a ref, deleting a missing ref (with no old value) is not a failure
+
+            :param ref: The full ref
+            :param old_value: Only delete if the ref is at this object id,
+                              defaults to None
+        """
+        values = () if old_value is None else (old_value,)
+        self._operations.append(_RefOperation("delete", ref, values))
+
+    def verify(self, ref: str, old_value: str | None = None):
+        """
+        Queue checking a ref's value without changing it
+
+            :param ref: The full ref
+            :param old_value: The object id the ref must be at,
+                              None when it must not exist, defaults to None
+        """
+        values = () if old_value is None else (old_value,)
+        self._operations.append(_RefOperation("verify", ref, values))
+
+    async def _run(self, operations: list[_RefOperation]) -> str | None:
+        """
+        Run a transaction, returning the error when it failed
+        """
+        args = ["git", "-C", str(self._git_repo), "update-ref", "--stdin"]
+        if self._message is not None:
+            args.extend(("-m", self._message))
+        process = await create_subprocess(args, stdin=asyncio.subprocess.PIPE)
+        try:
+            process.stdin.write(b"start\n")
+            for operation in operations:
+                process.stdin.write(operation.to_line())
+                await process.stdin.drain()
+            process.stdin.write(b"prepare\ncommit\n")
+            process.stdin.write_eof()
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # update-ref exited early, the reason is in stderr
+            pass
+        except BaseException:
+            await kill_process_group(process)
+            raise
+        if await process.wait() == 0:
+            return None
+        return (await process.stderr.read()).decode()
+
+    async def _get_ref_values(self, refs: set[str]) -> dict[str, str]:
+        """
+        Get the current object id of refs with a single 'for-each-ref',
+        listing only the namespaces (e.g. 'refs/heads') they are in
+        """
+        namespaces = {"/".join(ref.split("/", 2)[:2]) for ref in refs}
+        args = ["git", "-C", str(self._git_repo), "for-each-ref"]
+        args.extend(("--format=%(objectname) %(refname)", *sorted(namespaces)))
+        process_status = await subprocess_run(args)
+        if process_status.returncode != 0:
+            raise GitException(process_status.stderr.decode())
+        values = {}
+        for line in process_status.stdout.decode().splitlines():
+            value, ref = line.split(" ", 1)
+            if ref in refs:
+                values[ref] = value
+        return values
+
+    async def _find_failures(self, operations: list[_RefOperation]) -> list[RefUpdateFailure]:
+        """
+        Find operations that will fail because a ref is not at the
+        expected value, only checking old values given as object ids
+        (others are left for git to check)
+        """
+        refs = {operation.ref for operation in operations if operation.ref.startswith("refs/")}
+        if not refs:
+            return []
+        current_values = await self._get_ref_values(refs)
+        failures = {}
+        for operation in operations:
+            if operation.ref not in refs or operation.ref in failures:
+                continue
+            current = current_values.get(operation.ref)
+            if operation.command == "create":
+                expected = None
+            elif operation.command == "update" and len(operation.values) == 2:
+                expected = operation.values[1]
+            elif operation.command in ("delete", "verify") and operation.values:
+                expected = operation.values[0]
+            elif operation.command == "verify":
+                expected = None
+            else:
+                # no old value to check
+                continue
+            if expected is not None and re.match(OBJECT_ID_RE, expected) is None:
+                continue
+            if expected is not None and not expected.strip("0"):
+                # the null object id, so must not exist
+                expected = None
+            if current == expected:
+                continue
+            if current is None:
+                state = f"reference is missing but expected {expected}"
+            elif expected is None:
+                state = "reference already exists"
+            else:
+                state = f"is at {current} but expected {expected}"
+            reason = f"cannot lock ref '{operation.ref}': {state}"
+            failures[operation.ref] = RefUpdateFailure(operation.ref, reason)
+        return list(failures.values())
+
+    async def commit(self) -> list[RefUpdateFailure]:
+        """
+        Apply the queued changes, called automatically when used as a context manager
+
+            :raises RefUpdateConflictException: A ref was not at the
+                                                expected value (when atomic)
+            :raises GitException: Error to do with git
+            :return: The refs that were skipped, always empty when atomic
+        """
+        operations, self._operations = self._operations, []
+        self.failures = []
+        if not self._atomic and operations:
+            # skip refs known to fail up front, so usually only a single run is needed
+            self.failures = await self._find_failures(operations)
+            failed_refs = {failure.ref for failure in self.failures}
+            operations = [operation for operation in operations if operation.ref not in failed_refs]
+        while operations:
+            stderr = await self._run(operations)
+            if stderr is None:
+                break
+            if self._atomic:
+                if re.search(REF_UPDATE_CONFLICT_RE, stderr):
+                    raise RefUpdateConflictException(stderr)
+                raise GitException(stderr)
+            ref = _find_failed_ref(stderr, {operation.ref for operation in operations})
+            if ref is None:
+                raise GitException(stderr)
+            # changed since checked, git stops at the first failure so retry without that ref
+            self.failures.append(RefUpdateFailure(ref, stderr.strip().removeprefix("fatal: ")))
+            operations = [operation for operation in operations if operation.ref != ref]
+        return self.failures
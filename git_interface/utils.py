@@ -7,7 +7,8 @@ from pathlib import Path
 import aiofiles
 
 from .exceptions import AlreadyExistsException, GitException
-from .helpers import ensure_path, subprocess_run
+from .helpers import QoSClass, QoSProfile, ensure_path, subprocess_run
+from .storage import StorageRouter
 
 __all__ = [
     "get_version",
@@ -36,13 +37,16 @@ async def get_version() -> str:
 
 
 async def init_repo(
-    repo_dir: Path, repo_name: str, bare: bool = True, default_branch: str | None = None
+    repo_dir: Path | StorageRouter,
+    repo_name: str,
+    bare: bool = True,
+    default_branch: str | None = None,
 ):
     """
     Creates a new git repo in the directory with the given name,
     if bare the repo name will have .git added at the end.
 
-        :param repo_dir: Where the repo will be
+        :param repo_dir: Where the repo will be, or a router to place it with
         :param repo_name: The name of the repo
         :param bare: Whether the repo is bare, defaults to True
         :param default_branch: The branch name to use, defaults to None
@@ -51,7 +55,10 @@ async def init_repo(
     """
     if bare:
         repo_name = repo_name + ".git"
-    repo_path = repo_dir / repo_name
+    if isinstance(repo_dir, StorageRouter):
+        repo_path = repo_dir.get_path(repo_name)
+    else:
+        repo_path = repo_dir / repo_name
 
     if repo_path.exists():
         msg = f"path already exists for '{repo_name}'"
@@ -68,20 +75,28 @@ async def init_repo(
 
 
 async def clone_repo(
-    git_repo: Path | str, src: str, bare=False, mirror=False, depth: None | int = None
+    git_repo: Path | str,
+    src: str,
+    bare=False,
+    mirror=False,
+    depth: None | int = None,
+    storage: StorageRouter | None = None,
 ):
     """
     Clone an exiting repo, please note this
     method has no way of passing passwords+usernames
 
-        :param git_repo: Repo path to clone into
+        :param git_repo: Repo path to clone into, or the repo name when storage is given
         :param src: Where to clone from
         :param bare: Use --bare git argument, defaults to False
         :param mirror: Use --mirror git argument, defaults to False
         :param depth: Use --depth git argument, defaults to None
+        :param storage: Router used to place the repo, defaults to None
         :raises ValueError: Both bare and mirror are True
         :raises GitException: Error to do with git
     """
+    if storage is not None:
+        git_repo = storage.get_path(str(git_repo))
     args = ["git", "clone", src, str(git_repo)]
 
     # disables interactive password prompt
@@ -125,15 +140,18 @@ async def set_description(git_repo: Path | str, description: str):
         await fo.write(description)
 
 
-async def run_maintenance(git_repo: Path | str):
+async def run_maintenance(
+    git_repo: Path | str, qos: QoSClass | QoSProfile | None = QoSClass.BACKGROUND
+):
     """
     Run a maintenance git command to specified repo
 
         :param git_repo: Where the repo is
+        :param qos: Resource class or profile to run with, defaults to QoSClass.BACKGROUND
         :raises GitException: Error to do with git
     """
     args = ["git", "-C", str(git_repo), "maintenance", "run"]
-    process = await subprocess_run(args)
+    process = await subprocess_run(args, qos=qos)
     if process.returncode != 0:
         raise GitException(process.stderr.decode())
 
@@ -1,6 +1,64 @@
 from pathlib import Path
+from secrets import token_hex
+import hashlib
+import os
 import shutil
+import subprocess
 import pytest
+from git_interface import pack
+from git_interface.pkt_line import FLUSH_PKT, encode_pkt_line
+
+GIT_ENV = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "Tester",
+    "GIT_AUTHOR_EMAIL": "tester@example.com",
+    "GIT_COMMITTER_NAME": "Tester",
+    "GIT_COMMITTER_EMAIL": "tester@example.com",
+}
+
+
+def git(repo_path: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", str(repo_path), *args],
+        check=True,
+        capture_output=True,
+        env=GIT_ENV,
+    ).stdout.decode().strip()
+
+
+def commit_files(repo_path: Path, files: dict[str, str | None], message: str) -> str:
+    """
+    write (or delete when None) files and commit them, returning the commit hash
+    """
+    for name, content in files.items():
+        path = repo_path / name
+        if content is None:
+            path.unlink()
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    git(repo_path, "add", "--all")
+    git(repo_path, "commit", "--quiet", "-m", message)
+    return git(repo_path, "rev-parse", "HEAD")
+
+
+def empty_pack() -> bytes:
+    header = b"PACK" + (2).to_bytes(4, "big") + (0).to_bytes(4, "big")
+    return header + hashlib.sha1(header).digest()
+
+
+async def push_ref(repo_path: Path, ref: str, new_hash: str):
+    """
+    create a ref to a existing commit with a 'git-receive-pack' exchange,
+    so push events are published
+    """
+    command = f"{'0' * len(new_hash)} {new_hash} {ref}\0report-status\n"
+
+    async def request():
+        yield encode_pkt_line(command.encode()) + FLUSH_PKT
+        yield empty_pack()
+
+    [chunk async for chunk in pack.exchange_pack(repo_path, pack.RECEIVE_PACK_TYPE, request())]
 
 
 @pytest.fixture(scope="session")
@@ -9,3 +67,21 @@ def testdata_path():
     path.mkdir(parents=True, exist_ok=True)
     yield path
     shutil.rmtree(path)
+
+
+@pytest.fixture
+def example_repo(testdata_path: Path) -> Path:
+    """
+    a non-bare repo on branch 'main' with two commits
+    """
+    repo_path = testdata_path / ("example-" + token_hex(4))
+    subprocess.run(
+        ["git", "init", "--quiet", "--initial-branch=main", str(repo_path)], check=True
+    )
+    commit_files(
+        repo_path,
+        {"README.md": "# Example\n", "src/main.py": "print('hello')\nprint('world')\n"},
+        "initial commit",
+    )
+    commit_files(repo_path, {"src/main.py": "print('hello')\nprint('there')\n"}, "change greeting")
+    return repo_path
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import pytest
+from git_interface import blame
+from git_interface.exceptions import PathDoesNotExistInRevException
+
+from .conftest import git
+
+
+@pytest.mark.asyncio
+async def test_get_blame(example_repo: Path):
+    head = git(example_repo, "rev-parse", "HEAD")
+    first = git(example_repo, "rev-parse", "HEAD~1")
+
+    blame_ranges = await blame.get_blame(example_repo, "main", "src/main.py")
+
+    assert [(r.commit_hash, r.final_line, r.line_count) for r in blame_ranges] == [
+        (first, 1, 1),
+        (head, 2, 1),
+    ]
+    assert blame_ranges[1].summary == "change greeting"
+    assert blame_ranges[1].author_email == "tester@example.com"
+    assert blame_ranges[1].previous_hash == first
+    assert (head, "src/main.py") in blame.blame_cache
+
+
+@pytest.mark.asyncio
+async def test_blame_missing_path(example_repo: Path):
+    with pytest.raises(PathDoesNotExistInRevException):
+        await blame.get_blame(example_repo, "HEAD", "missing.txt")
@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import pytest
+
+from git_interface.commit import create_commit, write_blobs
+from git_interface.exceptions import RefUpdateConflictException
+
+from .conftest import git
+
+BOT = ("Bot", "bot@example.com")
+
+
+async def as_stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.fixture
+def bare_repo(example_repo: Path, testdata_path: Path) -> Path:
+    bare_repo = testdata_path / (example_repo.name + ".git")
+    git(testdata_path, "clone", "--quiet", "--bare", example_repo.name, bare_repo.name)
+    return bare_repo
+
+
+@pytest.mark.asyncio
+async def test_write_blobs(bare_repo: Path):
+    blob_ids = await write_blobs(bare_repo, [b"one\n", as_stream(b"tw", b"o\n")])
+
+    assert [git(bare_repo, "cat-file", "blob", blob_id) for blob_id in blob_ids] == ["one", "two"]
+
+
+@pytest.mark.asyncio
+async def test_create_commit(bare_repo: Path):
+    base = git(bare_repo, "rev-parse", "main")
+
+    commit = await create_commit(
+        bare_repo,
+        "refs/heads/main",
+        {
+            "README.md": None,
+            "src/main.py": b"print('changed')\n",
+            "docs/deep/guide\tnotes.md": as_stream(b"# Guide\n"),
+        },
+        "bulk update",
+        base,
+        author=BOT,
+    )
+
+    assert git(bare_repo, "rev-parse", "main") == commit
+    assert git(bare_repo, "rev-parse", "main^") == base
+    assert git(bare_repo, "log", "-1", "--format=%an <%ae>%n%B", "main") == (
+        "Bot <bot@example.com>\nbulk update"
+    )
+    assert git(bare_repo, "ls-tree", "-r", "--name-only", "-z", "main").split("\0")[:-1] == [
+        "docs/deep/guide\tnotes.md",
+        "src/main.py",
+    ]
+    assert git(bare_repo, "show", "main:src/main.py") == "print('changed')"
+
+
+@pytest.mark.asyncio
+async def test_create_commit_conflict(bare_repo: Path):
+    base = git(bare_repo, "rev-parse", "main^")
+
+    with pytest.raises(RefUpdateConflictException):
+        await create_commit(
+            bare_repo, "refs/heads/main", {"new.txt": b"new\n"}, "stale", base, BOT
+        )
+
+
+@pytest.mark.asyncio
+async def test_create_root_commit(bare_repo: Path):
+    commit = await create_commit(
+        bare_repo, "refs/heads/orphan", {"a/b.txt": b"b\n"}, "root", None, BOT
+    )
+
+    assert git(bare_repo, "rev-list", "--count", commit) == "1"
+    with pytest.raises(RefUpdateConflictException):
+        await create_commit(
+            bare_repo, "refs/heads/orphan", {"c.txt": b"c\n"}, "again", None, BOT
+        )
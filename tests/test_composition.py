@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import pytest
+
+from git_interface.composition import composition_cache, detect_language, get_composition
+from git_interface.datatypes import LanguageStat
+
+from .conftest import commit_files
+
+
+def test_detect_language():
+    assert detect_language("main.PY") == "Python"
+    assert detect_language("Makefile") == "Makefile"
+    assert detect_language("run", b"#!/usr/bin/env bash\necho hi\n") == "Shell"
+    assert detect_language("run", b"echo hi\n") is None
+
+
+@pytest.mark.asyncio
+async def test_get_composition(example_repo: Path):
+    commit_files(
+        example_repo,
+        {
+            "docs/guide.md": "# Guide\n\nText\n",
+            "scripts/run": "#!/bin/sh\necho run\n",
+            "image.png": "\0PNG",
+        },
+        "more files",
+    )
+
+    assert await get_composition(example_repo) == [
+        LanguageStat("Python", 1, 2, 30),
+        LanguageStat("Markdown", 2, 4, 24),
+        LanguageStat("Shell", 1, 2, 19),
+    ]
+
+    commit_files(example_repo, {"src/util.py": "x = 1\n"}, "add util")
+    hits = composition_cache.stats.hits
+    misses = composition_cache.stats.misses
+
+    stats = await get_composition(example_repo)
+
+    assert stats[0] == LanguageStat("Python", 2, 3, 36)
+    # only the root and 'src' changed, so were recomputed
+    assert composition_cache.stats.misses - misses == 2
+    assert composition_cache.stats.hits - hits == 2
+
+
+@pytest.mark.asyncio
+async def test_get_composition_non_ascii(example_repo: Path):
+    commit_files(example_repo, {"src/héllo.py": "print('héllo')\n"}, "non-ascii")
+
+    assert await get_composition(example_repo) == [
+        LanguageStat("Python", 2, 3, 46),
+        LanguageStat("Markdown", 1, 1, 10),
+    ]
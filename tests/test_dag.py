@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from git_interface.dag import load_commit_dag
+
+from .conftest import commit_files, git
+
+
+@pytest.mark.asyncio
+async def test_load_commit_dag(example_repo: Path):
+    git(example_repo, "checkout", "--quiet", "-b", "feature", "main~1")
+    commit_files(example_repo, {"a.txt": "a\n"}, "a")
+    git(example_repo, "checkout", "--quiet", "main")
+    git(example_repo, "merge", "--quiet", "--no-edit", "feature")
+
+    dag = await load_commit_dag(example_repo)
+
+    assert len(dag) == 4
+    assert set(dag.object_ids) == set(git(example_repo, "rev-list", "--all").split())
+    merge = dag.indexes[git(example_repo, "rev-parse", "main")]
+    assert [dag.object_ids[parent] for parent in dag.get_parents(merge)] == git(
+        example_repo, "log", "-1", "--format=%P", "main"
+    ).split()
+    for index in dag.topo_order():
+        assert all(parent < index for parent in dag.get_parents(index))
+    assert list(dag.generations) == [1, 2, 2, 3]
+    assert len(dag.authors) == 1
+
+    feature = dag.reachable([dag.indexes[git(example_repo, "rev-parse", "feature")]])
+    assert sum(feature) == 2
+    assert not feature[merge]
+
+    today = datetime.fromtimestamp(dag.timestamps[0], timezone.utc).date()
+    assert dag.commits_per_day() == {today: 4}
+    assert dag.commits_per_day(feature) == {today: 2}
+    assert list(dag.commits_per_author(feature).values()) == [2]
@@ -0,0 +1,123 @@
+from datetime import datetime, timezone
+from pathlib import Path
+from secrets import token_hex
+
+import pytest
+
+from git_interface.datatypes import FastImportProgress
+from git_interface.exceptions import GitException
+from git_interface.fast_import import EXECUTABLE_MODE, SYMLINK_MODE, FastImportWriter
+
+from .conftest import git
+
+BOT = ("Bot", "bot@example.com", datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+
+@pytest.fixture
+def bare_repo(testdata_path: Path) -> Path:
+    bare_repo = testdata_path / f"import-{token_hex(4)}.git"
+    git(testdata_path, "init", "--quiet", "--bare", bare_repo.name)
+    return bare_repo
+
+
+@pytest.mark.asyncio
+async def test_write_history(bare_repo: Path):
+    progress: list[FastImportProgress] = []
+
+    async with FastImportWriter(bare_repo, on_progress=progress.append) as writer:
+        await writer.write_blob(1, b"shared\n")
+        await writer.write_commit(
+            "refs/heads/main", 2, "first", BOT, {"a.txt": b"a\n", "dir/b.txt": ":1"}
+        )
+        await writer.write_commit(
+            "refs/heads/main", 3, "second", BOT, {"a.txt": None, "new\nline": b"c\n"}, [2]
+        )
+        await writer.reset("refs/tags/v1", 2)
+
+    assert git(bare_repo, "log", "--format=%s", "main") == "second\nfirst"
+    assert git(bare_repo, "show", "v1:dir/b.txt") == "shared"
+    assert git(bare_repo, "ls-tree", "--name-only", "main") == 'dir\n"new\\nline"'
+    assert git(bare_repo, "log", "-1", "--format=%an %ct", "main") == "Bot 1704067200"
+    assert progress[-1].commits == 2
+    assert progress[-1].blobs == 3
+
+
+@pytest.mark.asyncio
+async def test_write_modes(bare_repo: Path):
+    async with FastImportWriter(bare_repo) as writer:
+        await writer.write_blob(1, b"#!/bin/sh\n")
+        await writer.write_commit(
+            "refs/heads/main",
+            2,
+            "modes",
+            BOT,
+            {
+                "run": (EXECUTABLE_MODE, ":1"),
+                "build": (EXECUTABLE_MODE, b"#!/bin/sh\nmake\n"),
+                "link": (SYMLINK_MODE, b"run"),
+            },
+        )
+
+    assert git(bare_repo, "ls-tree", "--format=%(objectmode) %(path)", "main").split("\n") == [
+        "100755 build",
+        "120000 link",
+        "100755 run",
+    ]
+    assert git(bare_repo, "cat-file", "blob", "main:link") == "run"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("object_format", ["sha1", "sha256"])
+async def test_reset_delete(testdata_path: Path, object_format: str):
+    bare_repo = testdata_path / f"import-{token_hex(4)}.git"
+    args = ("init", "--quiet", "--bare", f"--object-format={object_format}", bare_repo.name)
+    git(testdata_path, *args)
+
+    async with FastImportWriter(bare_repo) as writer:
+        await writer.write_commit("refs/heads/main", 1, "first", BOT, {"a.txt": b"a\n"})
+        await writer.reset("refs/tags/v1", 1)
+    async with FastImportWriter(bare_repo) as writer:
+        await writer.reset("refs/tags/v1")
+
+    assert git(bare_repo, "for-each-ref", "--format=%(refname)") == "refs/heads/main"
+
+
+@pytest.mark.asyncio
+async def test_resume_from_marks(bare_repo: Path):
+    writer = FastImportWriter(bare_repo, checkpoint_interval=None)
+    await writer.start()
+    await writer.write_commit("refs/heads/main", 1, "first", BOT, {"a.txt": b"a\n"})
+    await writer.checkpoint()
+    await writer.write_commit("refs/heads/main", 2, "lost", BOT, {"b.txt": b"b\n"}, [1])
+    # interrupted after the checkpoint
+    await writer.abort()
+
+    async with FastImportWriter(bare_repo) as writer:
+        assert writer.is_imported(1)
+        assert not writer.is_imported(2)
+        await writer.write_commit("refs/heads/main", 2, "second", BOT, {"b.txt": b"b\n"}, [1])
+
+    assert git(bare_repo, "log", "--format=%s", "main") == "second\nfirst"
+
+
+@pytest.mark.asyncio
+async def test_resume_follows_ref(bare_repo: Path):
+    async with FastImportWriter(bare_repo) as writer:
+        await writer.write_commit("refs/heads/main", 1, "first", BOT, {"a.txt": b"a\n"})
+
+    # a new process, without parents given
+    async with FastImportWriter(bare_repo) as writer:
+        await writer.write_commit("refs/heads/main", 2, "second", BOT, {"b.txt": b"b\n"})
+        await writer.write_commit("refs/heads/main", 3, "third", BOT, {"c.txt": b"c\n"})
+        await writer.write_commit("refs/heads/new", 4, "root", BOT, {"d.txt": b"d\n"})
+
+    assert git(bare_repo, "log", "--format=%s", "main") == "third\nsecond\nfirst"
+    assert git(bare_repo, "ls-tree", "--name-only", "main") == "a.txt\nb.txt\nc.txt"
+    assert git(bare_repo, "log", "--format=%s", "new") == "root"
+
+
+@pytest.mark.asyncio
+async def test_invalid_command(bare_repo: Path):
+    with pytest.raises(GitException):
+        async with FastImportWriter(bare_repo) as writer:
+            await writer.write_commit("refs/heads/main", 1, "first", BOT, {}, [":unknown"])
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+import pytest
+from git_interface import grep
+from git_interface.exceptions import UnknownRevisionException
+
+
+@pytest.mark.asyncio
+async def test_grep(example_repo: Path):
+    matches = [match async for match in grep.grep(example_repo, "hel+o", "main")]
+
+    assert len(matches) == 1
+    assert matches[0].path == "src/main.py"
+    assert matches[0].line_number == 1
+    assert matches[0].column == 8
+    assert matches[0].line == "print('hello')"
+
+
+@pytest.mark.asyncio
+async def test_grep_no_matches(example_repo: Path):
+    assert [match async for match in grep.grep(example_repo, "missing", "main")] == []
+
+
+@pytest.mark.asyncio
+async def test_grep_unknown_revision(example_repo: Path):
+    with pytest.raises(UnknownRevisionException):
+        [match async for match in grep.grep(example_repo, "hello", "unknown")]
+
+
+@pytest.mark.asyncio
+async def test_grep_repos_max_results(example_repo: Path):
+    repos = [example_repo] * 3
+    results = [result async for result in grep.grep_repos(repos, "print", max_results=4)]
+
+    assert len(results) == 4
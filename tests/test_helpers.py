@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+from git_interface import helpers
+
+
+@pytest.mark.asyncio
+async def test_subprocess_run_buffered_closed_early():
+    aborted = helpers.subprocess_stats.aborted
+    chunks = helpers.subprocess_run_buffered(["yes"])
+
+    assert await chunks.__anext__()
+    await chunks.aclose()
+
+    assert helpers.subprocess_stats.aborted == aborted + 1
+
+
+@pytest.mark.asyncio
+async def test_kill_process_group_reaped(monkeypatch: pytest.MonkeyPatch):
+    aborted = helpers.subprocess_stats.aborted
+    process = await helpers.create_subprocess(["true"])
+    await process.wait()
+
+    def killpg(pid: int, sig: int):
+        raise AssertionError("signalled a reaped process group")
+
+    monkeypatch.setattr(helpers.os, "killpg", killpg)
+    await helpers.kill_process_group(process)
+
+    assert helpers.subprocess_stats.aborted == aborted
+
+
+@pytest.mark.asyncio
+async def test_subprocess_run_timeout():
+    timed_out = helpers.subprocess_stats.timed_out
+
+    with pytest.raises(asyncio.TimeoutError):
+        await helpers.subprocess_run(["sleep", "5"], timeout=0.1)
+
+    assert helpers.subprocess_stats.timed_out == timed_out + 1
+
+
+@pytest.mark.asyncio
+async def test_subprocess_run_qos():
+    profile = helpers.QoSProfile(nice=5, git_config={"core.abbrev": "12"})
+
+    process_status = await helpers.subprocess_run(
+        ["git", "config", "--get", "core.abbrev"], qos=profile
+    )
+    assert process_status.stdout == b"12\n"
+
+    process_status = await helpers.subprocess_run(["nice"], qos=profile)
+    assert process_status.stdout == b"5\n"
+
+
+def test_quote_path():
+    assert helpers.quote_path("dir/héllo.txt".encode()) == "dir/héllo.txt".encode()
+    assert helpers.quote_path(b'new\nline "x"') == b'"new\\nline \\"x\\""'
+    assert helpers.quote_path(b"bell\x07") == b'"bell\\007"'
@@ -0,0 +1,64 @@
+import os
+from pathlib import Path
+
+import pytest
+from git_interface import log
+
+from .conftest import commit_files, git
+
+
+@pytest.mark.asyncio
+async def test_get_last_commits(example_repo: Path):
+    commit_files(example_repo, {"src/lib/util.py": "pass\n"}, "add util")
+
+    last_commits, complete = await log.get_last_commits(example_repo, "main")
+    assert complete
+    assert {name: commit.subject for name, commit in last_commits.items()} == {
+        "README.md": "initial commit",
+        "src": "add util",
+    }
+
+    last_commits, complete = await log.get_last_commits(example_repo, "main", "src")
+    assert complete
+    assert {name: commit.subject for name, commit in last_commits.items()} == {
+        "main.py": "change greeting",
+        "lib": "add util",
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_last_commits_non_ascii(example_repo: Path):
+    commit_files(example_repo, {"src/héllo.py": "pass\n"}, "add héllo")
+
+    last_commits, complete = await log.get_last_commits(example_repo, "main", "src")
+    assert complete
+    assert {name: commit.subject for name, commit in last_commits.items()} == {
+        "main.py": "change greeting",
+        "héllo.py": "add héllo",
+    }
+    assert (git(example_repo, "rev-parse", "main"), "src") in log.last_commits_cache
+
+
+@pytest.mark.asyncio
+async def test_get_last_commits_non_utf8(example_repo: Path):
+    # a filename and message that are not valid UTF-8,
+    # a unknown encoding stops git converting the message
+    name = os.fsdecode(b"latin-\xe9.py")
+    (example_repo / "src" / name).write_text("pass\n")
+    git(example_repo, "add", "--all")
+    message = os.fsdecode(b"add caf\xe9")
+    git(example_repo, "-c", "i18n.commitEncoding=x-unknown", "commit", "--quiet", "-m", message)
+
+    last_commits, complete = await log.get_last_commits(example_repo, "main", "src")
+    assert complete
+    assert {name: commit.subject for name, commit in last_commits.items()} == {
+        "main.py": "change greeting",
+        name: "add caf\ufffd",
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_last_commits_no_time(example_repo: Path):
+    last_commits, complete = await log.get_last_commits(example_repo, "main~1", time_budget=0)
+    assert not complete
+    assert last_commits == {}
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+import pytest
+from git_interface import ls
+from git_interface.cache import DiskCache
+from git_interface.exceptions import UnknownRevisionException
+
+from .conftest import git
+
+
+@pytest.mark.asyncio
+async def test_ls_tree_cached(example_repo: Path, testdata_path: Path):
+    disk_cache = DiskCache(testdata_path / "tree-cache")
+    src_tree = git(example_repo, "rev-parse", "HEAD:src")
+
+    tree = await ls.ls_tree_cached(example_repo, "main", False, True, "src/", disk_cache)
+
+    assert [(str(entry.file), entry.object_size) for entry in tree] == [("main.py", 30)]
+    assert (src_tree, False, True) in ls.tree_cache
+    # sizes not needed, but listing with sizes can be used
+    assert await ls.ls_tree_cached(example_repo, "HEAD", False, False, "src") is tree
+
+    ls.tree_cache.clear()
+    assert await ls.ls_tree_cached(example_repo, "HEAD", False, True, "src", disk_cache) == tree
+
+
+@pytest.mark.asyncio
+async def test_ls_tree_cached_other_repo(example_repo: Path, testdata_path: Path):
+    other_repo = testdata_path / f"{example_repo.name}-other"
+    git(testdata_path, "init", "--quiet", other_repo.name)
+    commit = git(example_repo, "rev-parse", "HEAD")
+    await ls.ls_tree_cached(example_repo, commit, False, False, "src")
+
+    with pytest.raises(UnknownRevisionException):
+        await ls.ls_tree_cached(other_repo, commit, False, False, "src")
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from git_interface.exceptions import MergeConflictException
+from git_interface.merge import check_mergeable, create_merge_commit, merge_commits
+
+from .conftest import commit_files, git
+
+BOT = ("Bot", "bot@example.com")
+
+
+@pytest.fixture
+def branched_repo(example_repo: Path) -> Path:
+    """
+    'main' and 'clean' change different files, 'conflict' changes the same file as 'main'
+    """
+    git(example_repo, "branch", "clean")
+    git(example_repo, "branch", "conflict")
+    commit_files(example_repo, {"main.txt": "main\n", "shared.txt": "main\n"}, "main")
+    git(example_repo, "checkout", "--quiet", "clean")
+    commit_files(example_repo, {"clean.txt": "clean\n"}, "clean")
+    git(example_repo, "checkout", "--quiet", "conflict")
+    commit_files(example_repo, {"shared.txt": "conflict\n"}, "conflict")
+    git(example_repo, "checkout", "--quiet", "main")
+    return example_repo
+
+
+@pytest.mark.asyncio
+async def test_merge_commits(branched_repo: Path):
+    clean = await merge_commits(branched_repo, "main", "clean")
+    conflict = await merge_commits(branched_repo, "main", "conflict")
+
+    assert clean.clean
+    assert git(branched_repo, "ls-tree", "--name-only", clean.tree).split("\n") == [
+        "README.md",
+        "clean.txt",
+        "main.txt",
+        "shared.txt",
+        "src",
+    ]
+    assert not conflict.clean
+    assert conflict.conflicted_paths == ("shared.txt",)
+    assert [(c.conflict_type, c.paths) for c in conflict.conflicts] == [
+        ("contents", ("shared.txt",))
+    ]
+    assert await check_mergeable(branched_repo, [("main", "conflict"), ("main", "clean")]) == [
+        conflict,
+        clean,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_create_merge_commit(branched_repo: Path):
+    main = git(branched_repo, "rev-parse", "main")
+
+    with pytest.raises(MergeConflictException):
+        await create_merge_commit(branched_repo, "refs/heads/main", "conflict", "merge", BOT)
+
+    commit = await create_merge_commit(branched_repo, "refs/heads/main", "clean", "merge", BOT)
+
+    assert git(branched_repo, "rev-parse", "main") == commit
+    assert git(branched_repo, "log", "-1", "--format=%P", "main") == (
+        f"{main} {git(branched_repo, 'rev-parse', 'clean')}"
+    )
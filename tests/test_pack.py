@@ -0,0 +1,72 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from git_interface import pack
+from git_interface.datatypes import PushEvent
+from git_interface.pkt_line import FLUSH_PKT, encode_pkt_line
+
+from .conftest import empty_pack, git
+
+ZERO_HASH = "0" * 40
+
+
+async def as_stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("single_chunk", [False, True])
+async def test_receive_pack_publishes_events(
+    example_repo: Path, testdata_path: Path, single_chunk: bool
+):
+    bare_repo = testdata_path / (example_repo.name + ".git")
+    git(testdata_path, "clone", "--quiet", "--bare", example_repo.name, bare_repo.name)
+    head = git(bare_repo, "rev-parse", "HEAD")
+    events: list[PushEvent] = []
+
+    async def subscriber(event: PushEvent):
+        events.append(event)
+
+    commands = (
+        encode_pkt_line(f"{ZERO_HASH} {head} refs/heads/new\0report-status side-band-64k\n".encode())
+        + encode_pkt_line(f"{head} {ZERO_HASH} refs/heads/missing\n".encode())
+        + FLUSH_PKT
+    )
+
+    pack.subscribe_push_events(subscriber)
+    try:
+        # commands and pack data may arrive together
+        chunks = [commands + empty_pack()] if single_chunk else [commands, empty_pack()]
+        stream = pack.exchange_pack(bare_repo, pack.RECEIVE_PACK_TYPE, as_stream(*chunks))
+        [chunk async for chunk in stream]
+    finally:
+        pack.unsubscribe_push_events(subscriber)
+
+    assert git(bare_repo, "rev-parse", "refs/heads/new") == head
+    assert [(e.ref, e.old_hash, e.new_hash, e.success) for e in events] == [
+        ("refs/heads/new", ZERO_HASH, head, True),
+        ("refs/heads/missing", head, ZERO_HASH, False),
+    ]
+    assert events[0].git_repo == bare_repo
+
+
+@pytest.mark.asyncio
+async def test_upload_pack_large_negotiation(example_repo: Path):
+    head = git(example_repo, "rev-parse", "HEAD")
+    # git sends a 'ACK' for each 'have', more than fits in its output pipe
+    request = [
+        encode_pkt_line(f"want {head} multi_ack_detailed side-band-64k\n".encode()) + FLUSH_PKT,
+        *(encode_pkt_line(f"have {head}\n".encode()) for _ in range(6000)),
+        encode_pkt_line(b"done\n"),
+    ]
+
+    async def exchange() -> bytes:
+        stream = pack.exchange_pack(example_repo, pack.UPLOAD_PACK_TYPE, as_stream(*request))
+        return b"".join([chunk async for chunk in stream])
+
+    response = await asyncio.wait_for(exchange(), 15)
+
+    assert response.count(f"ACK {head} common".encode()) == 6000
+    assert b"PACK" in response
@@ -0,0 +1,93 @@
+import asyncio
+import shutil
+from secrets import token_hex
+from pathlib import Path
+
+import pytest
+
+from git_interface import registry
+from git_interface.registry import RepositoryRegistry
+
+from .conftest import git, push_ref
+
+
+def init_bare(path: Path) -> Path:
+    git(path.parent, "init", "--quiet", "--bare", "--initial-branch=main", path.name)
+    return path
+
+
+@pytest.fixture
+def repo_root(testdata_path: Path) -> Path:
+    root = (testdata_path / ("repos-" + token_hex(4))).absolute()
+    (root / "user").mkdir(parents=True)
+    (root / "user" / "nested" / "too-deep").mkdir(parents=True)
+    init_bare(root / "top.git")
+    init_bare(root / "user" / "project.git")
+    init_bare(root / "user" / "nested" / "too-deep" / "hidden.git")
+    (root / "top.git" / "description").write_text("Top repo\n")
+    return root
+
+
+@pytest.mark.asyncio
+async def test_scan(repo_root: Path):
+    async with RepositoryRegistry(repo_root, max_depth=2) as repos:
+        assert [info.name for info in repos.list_repos()] == ["top.git", "user/project.git"]
+        assert repos.resolve("/user/project.git") == repo_root / "user" / "project.git"
+        assert repos.resolve("user/nested/too-deep/hidden.git") is None
+
+        info = repos.get("top.git")
+        assert info.head == "refs/heads/main"
+        assert info.description == "Top repo\n"
+        assert info.last_push is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_size(repo_root: Path):
+    async with RepositoryRegistry(repo_root, max_depth=2) as repos:
+        assert repos.get("top.git").size == 0
+        repo_path = repo_root / "top.git"
+        (repo_root / "blob.txt").write_text("content\n" * 1000)
+        blob = git(repo_path, "hash-object", "-w", str(repo_root / "blob.txt"))
+        assert (await repos.refresh("top.git")).size > 0
+
+        # packed objects are counted too
+        git(repo_path, "update-ref", "refs/tags/blob", blob)
+        git(repo_path, "repack", "-a", "-d", "-q")
+        assert "count: 0" in git(repo_path, "count-objects", "-v")
+        assert (await repos.refresh("top.git")).size > 0
+
+
+@pytest.mark.asyncio
+async def test_push_updates_last_push(repo_root: Path):
+    async with RepositoryRegistry(repo_root, max_depth=2) as repos:
+        repo_path = repo_root / "top.git"
+        tree = git(repo_path, "hash-object", "-t", "tree", "-w", "/dev/null")
+        await push_ref(repo_path, "refs/heads/main", git(repo_path, "commit-tree", tree, "-m", "push"))
+        assert repos.get("top.git").last_push is not None
+
+
+@pytest.mark.asyncio
+async def test_poll_finds_new_repos(repo_root: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(registry, "Inotify", None)
+
+    async with RepositoryRegistry(repo_root, poll_interval=0.05) as repos:
+        init_bare(repo_root / "user" / "new.git")
+        await asyncio.sleep(0.2)
+        assert "user/new.git" in repos
+
+
+@pytest.mark.asyncio
+async def test_inotify_follows_changes(repo_root: Path):
+    pytest.importorskip("asyncinotify")
+
+    async with RepositoryRegistry(repo_root, debounce=0.05) as repos:
+        (repo_root / "other").mkdir()
+        await asyncio.sleep(0.2)
+        init_bare(repo_root / "other" / "new.git")
+        git(repo_root / "top.git", "symbolic-ref", "HEAD", "refs/heads/develop")
+        shutil.rmtree(repo_root / "user" / "project.git")
+        await asyncio.sleep(0.3)
+
+        assert "other/new.git" in repos
+        assert repos.get("top.git").head == "refs/heads/develop"
+        assert "user/project.git" not in repos
@@ -0,0 +1,54 @@
+from pathlib import Path
+from secrets import token_hex
+
+import pytest
+
+from git_interface.replication import Replicator
+
+from .conftest import git, push_ref
+
+
+@pytest.fixture
+def roots(example_repo: Path, testdata_path: Path) -> tuple[Path, list[Path], Path]:
+    base = (testdata_path / ("replication-" + token_hex(4))).absolute()
+    source_root = base / "source"
+    source_root.mkdir(parents=True)
+    git(source_root, "clone", "--quiet", "--bare", example_repo.absolute(), "project.git")
+    return source_root, [base / "replica-a", base / "replica-b"], base / "queue"
+
+
+@pytest.mark.asyncio
+async def test_replicates_after_push(roots: tuple[Path, list[Path], Path]):
+    source_root, replica_roots, queue_dir = roots
+    source = source_root / "project.git"
+
+    async with Replicator(source_root, replica_roots, queue_dir, coalesce_delay=0) as replicator:
+        head = git(source, "rev-parse", "main")
+        await push_ref(source, "refs/heads/first", head)
+        await push_ref(source, "refs/heads/second", head)
+        assert [status.name for status in replicator.get_status()] == ["project.git"]
+        assert replicator.get_lag("project.git") >= 0
+        await replicator.wait_idle()
+
+        assert replicator.get_lag("project.git") == 0
+        assert replicator.get_last_replicated("project.git") is not None
+
+    for replica_root in replica_roots:
+        assert git(replica_root / "project.git", "rev-parse", "HEAD") == head
+        assert git(replica_root / "project.git", "rev-parse", "refs/heads/second") == head
+    assert list(queue_dir.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_queue_survives_restart(roots: tuple[Path, list[Path], Path]):
+    source_root, replica_roots, queue_dir = roots
+    source = source_root / "project.git"
+
+    async with Replicator(source_root, replica_roots, queue_dir, coalesce_delay=60):
+        await push_ref(source, "refs/heads/new", git(source, "rev-parse", "main"))
+    assert not (replica_roots[0] / "project.git").exists()
+
+    async with Replicator(source_root, replica_roots, queue_dir, coalesce_delay=0) as replicator:
+        await replicator.wait_idle()
+
+    assert (replica_roots[0] / "project.git").exists()
@@ -0,0 +1,97 @@
+from pathlib import Path
+
+import pytest
+
+from git_interface import rev_list
+from git_interface.exceptions import UnknownRevisionException
+from git_interface.rev_list import (
+    ahead_behind_cache,
+    count_revisions,
+    get_ahead_behind,
+    iter_rev_list,
+    iter_rev_list_objects,
+)
+
+from .conftest import commit_files, git
+
+
+def count_ahead_behind(git_repo: Path, base: str, branch: str) -> tuple[int, int]:
+    behind, ahead = git(git_repo, "rev-list", "--left-right", "--count", f"{base}...{branch}").split()
+    return int(ahead), int(behind)
+
+
+@pytest.mark.asyncio
+async def test_get_ahead_behind(example_repo: Path):
+    git(example_repo, "branch", "old", "main~1")
+    git(example_repo, "branch", "same", "main")
+    git(example_repo, "checkout", "--quiet", "-b", "feature", "main~1")
+    commit_files(example_repo, {"a.txt": "a\n"}, "a")
+    commit_files(example_repo, {"b.txt": "b\n"}, "b")
+    git(example_repo, "checkout", "--quiet", "-b", "merged")
+    git(example_repo, "merge", "--quiet", "--no-edit", "main")
+    commit_files(example_repo, {"c.txt": "c\n"}, "c")
+    git(example_repo, "checkout", "--quiet", "main")
+    commit_files(example_repo, {"main.txt": "main\n"}, "main")
+
+    results = await get_ahead_behind(example_repo, "main")
+
+    assert results == {
+        branch: count_ahead_behind(example_repo, "main", branch)
+        for branch in ("feature", "main", "merged", "old", "same")
+    }
+    assert results["feature"] == (2, 2)
+    assert results["main"] == (0, 0)
+    hits = ahead_behind_cache.stats.hits
+    assert await get_ahead_behind(example_repo, "main") == results
+    assert ahead_behind_cache.stats.hits == hits + len(results)
+
+
+@pytest.mark.asyncio
+async def test_get_ahead_behind_merged_base(
+    example_repo: Path, monkeypatch: pytest.MonkeyPatch
+):
+    # the graph walk used before git 2.41
+    monkeypatch.setattr(rev_list, "_supports_ahead_behind", False)
+    commit_files(example_repo, {"b.txt": "b\n"}, "b")
+    root = git(example_repo, "rev-list", "--max-parents=0", "main")
+    git(example_repo, "checkout", "--quiet", "-b", "feature", root)
+    commit_files(example_repo, {"c.txt": "c\n"}, "c")
+    git(example_repo, "merge", "--quiet", "--no-edit", "main")
+    git(example_repo, "checkout", "--quiet", "main")
+
+    results = await get_ahead_behind(example_repo, "main")
+
+    assert results == {"feature": (2, 0), "main": (0, 0)}
+    assert results["feature"] == count_ahead_behind(example_repo, "main", "feature")
+
+
+@pytest.mark.asyncio
+async def test_iter_rev_list(example_repo: Path):
+    main = git(example_repo, "rev-parse", "main")
+    first = git(example_repo, "rev-parse", "main~1")
+
+    assert [commit async for commit in iter_rev_list(example_repo)] == [main, first]
+    assert [commit async for commit in iter_rev_list(example_repo, ["main~1..main"])] == [main]
+    assert [commit async for commit in iter_rev_list(example_repo, ["main"], ["main~1"])] == [main]
+    assert [commit async for commit in iter_rev_list(example_repo, max_count=1)] == [main]
+    with pytest.raises(UnknownRevisionException):
+        [commit async for commit in iter_rev_list(example_repo, ["--output=x"])]
+
+
+@pytest.mark.asyncio
+async def test_iter_rev_list_objects(example_repo: Path):
+    objects = [entry async for entry in iter_rev_list_objects(example_repo, ["main"])]
+    paths = {path for _, path in objects}
+
+    assert len(objects) == git(example_repo, "rev-list", "--objects", "main").count("\n") + 1
+    assert {None, "", "README.md", "src", "src/main.py"} == paths
+    assert await count_revisions(example_repo, ["main"], objects=True) == len(objects)
+
+    without_blobs = [
+        path async for _, path in iter_rev_list_objects(example_repo, object_filter="blob:none")
+    ]
+    assert "README.md" not in without_blobs
+    assert await count_revisions(example_repo, object_filter="blob:none", objects=True) == len(
+        without_blobs
+    )
+    assert await count_revisions(example_repo, ["main"], ["main~1"]) == 1
@@ -0,0 +1,115 @@
+import os
+from pathlib import Path
+
+import aiofiles
+import pytest
+from git_interface.cat_file import BatchObjectReader
+from git_interface.helpers import get_data_dir
+from git_interface.search_index import TrigramIndex
+
+from .conftest import commit_files, git
+
+
+@pytest.mark.asyncio
+async def test_trigram_index_update(example_repo: Path):
+    index = TrigramIndex(example_repo, "main")
+    assert await index.update()
+
+    assert await index.get_candidates("there") == ["src/main.py"]
+    assert await index.get_candidates("missing") == []
+    matches = [match async for match in index.search("THERE", ignore_case=True)]
+    assert [(m.path, m.line_number) for m in matches] == [("src/main.py", 2)]
+
+    commit_files(example_repo, {"docs/there.txt": "over there\n", "README.md": None}, "docs")
+
+    # reloaded from disk, then updated incrementally
+    index = TrigramIndex(example_repo, "main")
+    assert await index.update()
+    assert not await index.update()
+    assert await index.get_candidates("there") == ["docs/there.txt", "src/main.py"]
+    assert await index.get_candidates("Example") == []
+
+
+@pytest.mark.asyncio
+async def test_trigram_index_non_ascii_path(example_repo: Path):
+    commit_files(example_repo, {"héllo.py": "bonjour\n"}, "non-ascii")
+    index = TrigramIndex(example_repo, "main")
+    assert await index.update()
+
+    commit_files(example_repo, {"héllo.py": "bonjour encore\n"}, "change non-ascii")
+    assert await index.update()
+
+    # full and incremental updates use the same (unquoted) path
+    assert await index.get_candidates("bonjour") == ["héllo.py"]
+    matches = [match async for match in index.search("encore")]
+    assert [(m.path, m.line_number) for m in matches] == [("héllo.py", 1)]
+
+
+@pytest.mark.asyncio
+async def test_trigram_index_max_blob_size(example_repo: Path, monkeypatch: pytest.MonkeyPatch):
+    index = TrigramIndex(example_repo, "main", max_blob_size=40)
+    assert await index.update()
+
+    large = commit_files(
+        example_repo, {"large.txt": "a large file, which is over the size limit\n"}, "large"
+    )
+    read_objects = []
+    read = BatchObjectReader.read
+
+    async def record_read(self, object_name: str):
+        read_objects.append(object_name)
+        return await read(self, object_name)
+
+    monkeypatch.setattr(BatchObjectReader, "read", record_read)
+    assert await index.update()
+
+    # too large, so never read and always a candidate
+    assert git(example_repo, "rev-parse", f"{large}:large.txt") not in read_objects
+    assert await index.get_candidates("missing") == ["large.txt"]
+    assert [match.path async for match in index.search("limit")] == ["large.txt"]
+
+
+@pytest.mark.asyncio
+async def test_trigram_index_non_utf8_path(example_repo: Path):
+    index = TrigramIndex(example_repo, "main")
+    assert await index.update()
+    # a filename that is not valid UTF-8
+    (example_repo / os.fsdecode(b"latin-\xe9.txt")).write_text("bonjour\n")
+    commit_files(example_repo, {}, "non-utf-8")
+
+    assert await index.update()
+
+    path = os.fsdecode(b"latin-\xe9.txt")
+    assert await index.get_candidates("bonjour") == [path]
+    assert [match.path async for match in index.search("bonjour")] == [path]
+    # a full rebuild also lists it
+    rebuilt = TrigramIndex(example_repo, "HEAD")
+    assert await rebuilt.update()
+    assert await rebuilt.get_candidates("bonjour") == [path]
+
+
+@pytest.mark.asyncio
+async def test_trigram_index_loads_needed_shards(
+    example_repo: Path, monkeypatch: pytest.MonkeyPatch
+):
+    assert await TrigramIndex(example_repo, "main").update()
+    commit_files(example_repo, {"docs/there.txt": "over there\n"}, "docs")
+    # updated incrementally, into the same shards
+    assert await TrigramIndex(example_repo, "main").update()
+    index_dir = get_data_dir(example_repo) / "trigram" / "main"
+    assert sorted(path.name for path in index_dir.iterdir() if path.is_dir()) == ["shards-1"]
+
+    opened = []
+    open_ = aiofiles.open
+
+    def record_open(path, *args, **kwargs):
+        opened.append(Path(path))
+        return open_(path, *args, **kwargs)
+
+    monkeypatch.setattr(aiofiles, "open", record_open)
+    index = TrigramIndex(example_repo, "main")
+    assert await index.get_candidates("there") == ["docs/there.txt", "src/main.py"]
+
+    shards = [path for path in opened if path.parent.name.startswith("shards-")]
+    # 'the', 'her' and 'ere'
+    assert 0 < len(shards) <= 3
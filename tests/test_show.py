@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+from git_interface import show
+from git_interface.cache import LRUCache
+from git_interface.cat_file import get_blob_cached
+from git_interface.exceptions import PathDoesNotExistInRevException, UnknownRevisionException
+from git_interface.helpers import subprocess_stats
+
+from .conftest import commit_files, git
+
+
+@pytest.mark.asyncio
+async def test_show_file_cached(example_repo: Path):
+    cache = LRUCache(max_weight=1024, weigher=len, max_item_weight=16)
+
+    content = await show.show_file_cached(example_repo, "main", "README.md", cache)
+    assert isinstance(content, memoryview)
+    assert content == b"# Example\n"
+    assert await show.show_file_cached(example_repo, "HEAD", "README.md", cache) == content
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+    # too large to be cached
+    await show.show_file_cached(example_repo, "main", "src/main.py", cache)
+    assert cache.stats.rejections == 1
+    assert len(cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_show_file_cached_missing(example_repo: Path):
+    with pytest.raises(PathDoesNotExistInRevException):
+        await show.show_file_cached(example_repo, "main", "missing.txt")
+    with pytest.raises(UnknownRevisionException):
+        await show.show_file_cached(example_repo, "unknown", "README.md")
+
+
+@pytest.mark.asyncio
+async def test_show_file_cached_no_process(example_repo: Path):
+    cache = LRUCache(max_weight=1024, weigher=len)
+    commit = git(example_repo, "rev-parse", "main")
+    readme = git(example_repo, "rev-parse", "main:README.md")
+    await show.show_file_cached(example_repo, commit, "README.md", cache)
+    await get_blob_cached(example_repo, readme, cache)
+    started = subprocess_stats.started
+
+    # object ids and names that cannot change are not resolved again
+    assert await get_blob_cached(example_repo, readme, cache) == b"# Example\n"
+    assert await show.show_file_cached(example_repo, commit, "README.md", cache) == b"# Example\n"
+    assert subprocess_stats.started == started
+
+
+@pytest.mark.asyncio
+async def test_show_file_cached_other_repo(example_repo: Path, testdata_path: Path):
+    other_repo = testdata_path / f"{example_repo.name}-other"
+    git(testdata_path, "init", "--quiet", other_repo.name)
+    commit = commit_files(example_repo, {"s.txt": "secret\n"}, "secret")
+    blob = git(example_repo, "rev-parse", f"{commit}:s.txt")
+    assert await show.show_file_cached(example_repo, commit, "s.txt") == b"secret\n"
+
+    # cached content is shared, but only for objects in the repo
+    with pytest.raises(UnknownRevisionException):
+        await show.show_file_cached(other_repo, commit, "s.txt")
+    with pytest.raises(UnknownRevisionException):
+        await get_blob_cached(other_repo, blob)
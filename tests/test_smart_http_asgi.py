@@ -0,0 +1,168 @@
+import asyncio
+import gzip
+from pathlib import Path
+
+import pytest
+
+from git_interface.pack import RECEIVE_PACK_TYPE, UPLOAD_PACK_TYPE
+from git_interface.pkt_line import FLUSH_PKT, encode_pkt_line
+from git_interface.smart_http.asgi import SmartHTTPApp, resolve_from_root
+
+from .conftest import git
+
+
+async def call_app(
+    app: SmartHTTPApp,
+    method: str,
+    path: str,
+    query_string: bytes = b"",
+    headers: list[tuple[bytes, bytes]] | None = None,
+    body_chunks: list[bytes] | None = None,
+) -> tuple[int, dict[bytes, bytes], bytes]:
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "headers": headers or [],
+    }
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": True}
+        for chunk in body_chunks or []
+    ]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    assert sent[-1].get("more_body", False) is False
+    return (
+        sent[0]["status"],
+        dict(sent[0]["headers"]),
+        b"".join(message.get("body", b"") for message in sent[1:]),
+    )
+
+
+@pytest.fixture
+def app(example_repo: Path) -> SmartHTTPApp:
+    return SmartHTTPApp(resolve_from_root(example_repo.parent))
+
+
+@pytest.mark.asyncio
+async def test_info_refs(app: SmartHTTPApp, example_repo: Path):
+    status, headers, body = await call_app(
+        app,
+        "GET",
+        f"/{example_repo.name}/info/refs",
+        query_string=b"service=git-upload-pack",
+        headers=[(b"accept-encoding", b"gzip")],
+    )
+
+    assert status == 200
+    assert headers[b"content-encoding"] == b"gzip"
+    assert gzip.decompress(body).startswith(
+        encode_pkt_line(b"# service=git-upload-pack\n") + FLUSH_PKT
+    )
+
+
+@pytest.mark.asyncio
+async def test_upload_pack_streamed_body(app: SmartHTTPApp, example_repo: Path):
+    head = git(example_repo, "rev-parse", "HEAD")
+    request_body = gzip.compress(
+        encode_pkt_line(f"want {head} side-band-64k\n".encode())
+        + FLUSH_PKT
+        + encode_pkt_line(b"done\n")
+    )
+
+    status, headers, body = await call_app(
+        app,
+        "POST",
+        f"/{example_repo.name}/{UPLOAD_PACK_TYPE}",
+        headers=[(b"content-encoding", b"gzip")],
+        body_chunks=[request_body[:10], request_body[10:]],
+    )
+
+    assert status == 200
+    assert headers[b"content-type"] == b"application/x-git-upload-pack-result"
+    assert b"PACK" in body
+
+
+@pytest.mark.asyncio
+async def test_unknown_repo(app: SmartHTTPApp):
+    status, _, _ = await call_app(
+        app, "GET", "/missing.git/info/refs", query_string=b"service=git-upload-pack"
+    )
+
+    assert status == 404
+
+
+@pytest.mark.asyncio
+async def test_auth_hook(example_repo: Path):
+    async def authorize(scope: dict, requested_repo: str, pack_type: str) -> bool:
+        return pack_type != RECEIVE_PACK_TYPE
+
+    app = SmartHTTPApp(resolve_from_root(example_repo.parent), authorize)
+
+    status, headers, _ = await call_app(
+        app,
+        "GET",
+        f"/{example_repo.name}/info/refs",
+        query_string=b"service=git-receive-pack",
+    )
+
+    assert status == 401
+    assert headers[b"www-authenticate"] == b'Basic realm="git"'
+
+
+@pytest.mark.asyncio
+async def test_repo_outside_root(example_repo: Path):
+    root_path = example_repo.parent / f"{example_repo.name}-root"
+    root_path.mkdir()
+    (root_path / "linked.git").symlink_to(example_repo.resolve())
+    app = SmartHTTPApp(resolve_from_root(root_path))
+    outside = example_repo.resolve()
+
+    for method, path in (
+        ("GET", f"/{outside}/info/refs"),
+        ("POST", f"/{outside}/{RECEIVE_PACK_TYPE}"),
+        ("GET", f"/../{example_repo.name}/info/refs"),
+        ("GET", f"/./../{example_repo.name}/info/refs"),
+        ("GET", "/linked.git/info/refs"),
+    ):
+        status, _, _ = await call_app(
+            app, method, path, query_string=b"service=git-receive-pack"
+        )
+        assert status == 404, path
+
+
+@pytest.mark.asyncio
+async def test_body_timeout(example_repo: Path):
+    app = SmartHTTPApp(resolve_from_root(example_repo.parent), body_timeout=0.1)
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": f"/{example_repo.name}/{UPLOAD_PACK_TYPE}",
+        "query_string": b"",
+        "headers": [],
+    }
+    sent = []
+    received = []
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {"type": "http.request", "body": b"0032want ", "more_body": True}
+        # client stops sending the rest of the body
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    await asyncio.wait_for(app(scope, receive, send), 10)
+
+    assert sent[0]["status"] == 408
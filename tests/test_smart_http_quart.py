@@ -0,0 +1,76 @@
+import gzip
+from pathlib import Path
+
+import pytest
+
+quart = pytest.importorskip("quart")
+
+from git_interface.pack import UPLOAD_PACK_TYPE  # noqa: E402
+from git_interface.pkt_line import FLUSH_PKT, encode_pkt_line  # noqa: E402
+from git_interface.smart_http.quart import (  # noqa: E402
+    get_info_refs_response,
+    post_pack_response,
+)
+
+from .conftest import git  # noqa: E402
+
+
+def create_app(repo_path: Path, max_body_size: int = 1024):
+    app = quart.Quart(__name__)
+    app.config["BODY_TIMEOUT"] = 10
+    app.config["MAX_DECOMPRESSED_BODY_SIZE"] = max_body_size
+
+    @app.get("/repo.git/info/refs")
+    async def info_refs():
+        return await get_info_refs_response(repo_path, quart.request.args["service"])
+
+    @app.post("/repo.git/<pack_type>")
+    async def exchange(pack_type: str):
+        return await post_pack_response(repo_path, pack_type)
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_info_refs_compressed(example_repo: Path):
+    client = create_app(example_repo).test_client()
+
+    response = await client.get(
+        "/repo.git/info/refs",
+        query_string={"service": UPLOAD_PACK_TYPE},
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    body = gzip.decompress(await response.get_data())
+    assert body.startswith(encode_pkt_line(b"# service=git-upload-pack\n") + FLUSH_PKT)
+
+
+@pytest.mark.asyncio
+async def test_upload_pack_gzip_body(example_repo: Path):
+    head = git(example_repo, "rev-parse", "HEAD")
+    request_body = (
+        encode_pkt_line(f"want {head} side-band-64k\n".encode())
+        + FLUSH_PKT
+        + encode_pkt_line(b"done\n")
+    )
+
+    response = await create_app(example_repo).test_client().post(
+        f"/repo.git/{UPLOAD_PACK_TYPE}",
+        data=gzip.compress(request_body),
+        headers={"Content-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert b"PACK" in await response.get_data()
+
+
+@pytest.mark.asyncio
+async def test_upload_pack_body_too_large(example_repo: Path):
+    response = await create_app(example_repo, max_body_size=8).test_client().post(
+        f"/repo.git/{UPLOAD_PACK_TYPE}",
+        data=gzip.compress(b"0" * 64),
+        headers={"Content-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 413
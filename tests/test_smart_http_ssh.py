@@ -0,0 +1,118 @@
+import asyncio
+from pathlib import Path
+
+import asyncssh
+import pytest
+
+from git_interface import pack
+from git_interface.datatypes import PushEvent
+from git_interface.pkt_line import FLUSH_PKT, encode_pkt_line
+from git_interface.smart_http.ssh import Server
+
+from .conftest import GIT_ENV, commit_files, git
+
+
+async def start_server(root_repo_path: Path, **kwargs) -> tuple[asyncssh.SSHAcceptor, int]:
+    host_key = asyncssh.generate_private_key("ssh-ed25519")
+    acceptor = await Server(root_repo_path, **kwargs).create_server(
+        "127.0.0.1", 0, [host_key]
+    )
+    return acceptor, acceptor.sockets[0].getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_upload_pack_advertisement(example_repo: Path):
+    acceptor, port = await start_server(example_repo.parent, write_buffer_size=16)
+    try:
+        async with asyncssh.connect(
+            "127.0.0.1", port, username="git", known_hosts=None
+        ) as conn:
+            process = await conn.create_process(
+                f"git-upload-pack '{example_repo.name}'", encoding=None
+            )
+            advertisement = await process.stdout.readuntil(FLUSH_PKT)
+            process.stdin.write(FLUSH_PKT)
+            process.stdin.write_eof()
+            await process.wait()
+    finally:
+        acceptor.close()
+
+    assert b"refs/heads/main" in advertisement
+
+
+@pytest.mark.asyncio
+async def test_channel_limit(example_repo: Path):
+    acceptor, port = await start_server(example_repo.parent, max_channels=0)
+    try:
+        async with asyncssh.connect(
+            "127.0.0.1", port, username="git", known_hosts=None
+        ) as conn:
+            result = await conn.run(f"git-upload-pack '{example_repo.name}'", encoding=None)
+    finally:
+        acceptor.close()
+
+    assert result.exit_status == 1
+    assert b"too many concurrent sessions" in result.stderr
+
+
+@pytest.mark.asyncio
+async def test_git_failure_exit_status(example_repo: Path):
+    acceptor, port = await start_server(example_repo.parent)
+    try:
+        async with asyncssh.connect(
+            "127.0.0.1", port, username="git", known_hosts=None
+        ) as conn:
+            process = await conn.create_process(
+                f"git-upload-pack '{example_repo.name}'", encoding=None
+            )
+            await process.stdout.readuntil(FLUSH_PKT)
+            # a object git does not have
+            process.stdin.write(encode_pkt_line(f"want {'1' * 40}\n".encode()) + FLUSH_PKT)
+            process.stdin.write(encode_pkt_line(b"done\n"))
+            process.stdin.write_eof()
+            result = await process.wait()
+    finally:
+        acceptor.close()
+
+    assert result.exit_status not in (0, None)
+    assert b"not our ref" in result.stderr
+
+
+async def run_git(*args: str, cwd: Path, port: int) -> int:
+    env = {
+        **GIT_ENV,
+        "GIT_SSH_COMMAND": (
+            f"ssh -p {port} -o StrictHostKeyChecking=no"
+            " -o UserKnownHostsFile=/dev/null -o LogLevel=ERROR"
+        ),
+    }
+    process = await asyncio.create_subprocess_exec("git", *args, cwd=cwd, env=env)
+    return await process.wait()
+
+
+@pytest.mark.asyncio
+async def test_stateful_clone_and_push(example_repo: Path, testdata_path: Path):
+    bare_repo = testdata_path / (example_repo.name + ".git")
+    git(testdata_path, "clone", "--quiet", "--bare", example_repo.name, bare_repo.name)
+    events: list[PushEvent] = []
+
+    async def subscriber(event: PushEvent):
+        events.append(event)
+
+    acceptor, port = await start_server(testdata_path)
+    pack.subscribe_push_events(subscriber)
+    try:
+        url = f"ssh://git@127.0.0.1/{bare_repo.name}"
+        assert await run_git("clone", "--quiet", url, "cloned", cwd=testdata_path, port=port) == 0
+        cloned = testdata_path / "cloned"
+        commit_files(cloned, {"new.txt": "new\n"}, "add new")
+        assert await run_git("push", "--quiet", "origin", "main", cwd=cloned, port=port) == 0
+    finally:
+        pack.unsubscribe_push_events(subscriber)
+        acceptor.close()
+
+    head = git(cloned, "rev-parse", "HEAD")
+    assert git(bare_repo, "rev-parse", "main") == head
+    assert [(event.ref, event.new_hash, event.success) for event in events] == [
+        ("refs/heads/main", head, True)
+    ]
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import pytest
+
+from git_interface.datatypes import StatsPeriod
+from git_interface.stats import ContributorStats
+
+from .conftest import commit_files, git
+
+
+@pytest.mark.asyncio
+async def test_contributor_stats(example_repo: Path):
+    stats = ContributorStats(example_repo, "main", StatsPeriod.YEAR)
+
+    assert await stats.update()
+    assert not await stats.update()
+    [contributor] = await stats.get_contributors()
+    assert (contributor.commits, contributor.additions, contributor.deletions) == (2, 4, 1)
+
+    git(example_repo, "mv", "README.md", "README.txt")
+    commit_files(example_repo, {"README.txt": "# Example\nmore\n"}, "rename")
+    # a new instance continues from the saved stats
+    stats = ContributorStats(example_repo, "main", StatsPeriod.YEAR)
+    assert await stats.update()
+    [contributor] = await stats.get_contributors()
+    assert (contributor.commits, contributor.additions, contributor.deletions) == (3, 5, 1)
+    [period] = await stats.get_periods(contributor.email)
+    assert period.period == str(contributor.last_commit.year)
+    assert period.commits == 3
+
+    # rewritten history is recomputed
+    git(example_repo, "reset", "--quiet", "--hard", "main~2")
+    assert await stats.update()
+    [contributor] = await stats.get_contributors()
+    assert (contributor.commits, contributor.additions, contributor.deletions) == (1, 3, 0)
+    assert await stats.get_periods("unknown@example.com") == []
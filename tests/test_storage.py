@@ -0,0 +1,70 @@
+from collections import Counter
+from pathlib import Path
+from secrets import token_hex
+
+import pytest
+
+from git_interface import utils
+from git_interface.storage import StorageRouter
+
+from .conftest import commit_files, git
+
+NAMES = [f"user-{index}/project.git" for index in range(2000)]
+
+
+@pytest.fixture
+def roots(testdata_path: Path) -> dict[str, Path]:
+    base = testdata_path / ("storage-" + token_hex(4))
+    return {root_id: base / root_id for root_id in ("a", "b", "c")}
+
+
+def test_weights(roots: dict[str, Path]):
+    router = StorageRouter(roots, weights={"a": 2})
+
+    counts = Counter(router.get_root(name) for name in NAMES)
+
+    assert counts["a"] > counts["b"] * 1.5
+    assert counts["a"] > counts["c"] * 1.5
+
+
+def test_adding_root_moves_only_its_share(roots: dict[str, Path]):
+    before = StorageRouter({"a": roots["a"], "b": roots["b"]})
+    after = StorageRouter(roots)
+
+    moved = [name for name in NAMES if before.get_root(name) != after.get_root(name)]
+
+    assert all(after.get_root(name) == "c" for name in moved)
+    assert len(moved) < len(NAMES) / 2
+
+
+def test_invalid_name(roots: dict[str, Path]):
+    router = StorageRouter(roots)
+
+    with pytest.raises(ValueError):
+        router.get_path("../escape.git")
+    assert router.resolve("../escape.git") is None
+
+
+@pytest.mark.asyncio
+async def test_init_and_migrate(roots: dict[str, Path], testdata_path: Path):
+    placement_file = testdata_path / ("placements-" + token_hex(4) + ".json")
+    router = StorageRouter(roots, placement_file=placement_file)
+
+    await utils.init_repo(router, "user/project", default_branch="main")
+    source = router.resolve("user/project.git")
+    assert source == router.get_path("user/project.git")
+
+    work_repo = testdata_path / ("work-" + token_hex(4))
+    git(testdata_path, "clone", "--quiet", source.absolute(), work_repo.name)
+    commit_files(work_repo, {"README.md": "# Project\n"}, "initial commit")
+    git(work_repo, "push", "--quiet", "origin", "main")
+    head = git(source, "rev-parse", "main")
+
+    source_root = router.get_root("user/project.git")
+    target_root = next(root_id for root_id in roots if root_id != source_root)
+    target = await router.migrate("user/project.git", target_root, delete_delay=0)
+
+    assert target == roots[target_root] / "user/project.git"
+    assert not source.exists()
+    assert git(target, "rev-parse", "main") == head
+    assert StorageRouter(roots, placement_file=placement_file).resolve("user/project.git") == target
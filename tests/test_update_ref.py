@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import pytest
+
+from git_interface.branch import delete_branches
+from git_interface.exceptions import RefUpdateConflictException
+from git_interface.update_ref import RefTransaction
+
+from .conftest import git
+
+
+def get_refs(git_repo: Path) -> list[str]:
+    return git(git_repo, "for-each-ref", "--format=%(refname)").split("\n")
+
+
+@pytest.mark.asyncio
+async def test_atomic_transaction(example_repo: Path):
+    main = git(example_repo, "rev-parse", "main")
+    first = git(example_repo, "rev-parse", "main~1")
+
+    async with RefTransaction(example_repo, "test") as transaction:
+        transaction.create("refs/heads/a", main)
+        transaction.create("refs/tags/v1", first)
+        transaction.verify("refs/heads/main", main)
+
+    assert get_refs(example_repo) == ["refs/heads/a", "refs/heads/main", "refs/tags/v1"]
+
+    transaction = RefTransaction(example_repo)
+    transaction.update("refs/heads/a", first, main)
+    transaction.delete("refs/tags/v1", main)
+    with pytest.raises(RefUpdateConflictException):
+        await transaction.commit()
+
+    # nothing was changed
+    assert git(example_repo, "rev-parse", "a") == main
+    assert get_refs(example_repo) == ["refs/heads/a", "refs/heads/main", "refs/tags/v1"]
+
+
+@pytest.mark.asyncio
+async def test_partial_transaction(example_repo: Path):
+    main = git(example_repo, "rev-parse", "main")
+    first = git(example_repo, "rev-parse", "main~1")
+
+    transaction = RefTransaction(example_repo, atomic=False)
+    transaction.create("refs/heads/a", main)
+    transaction.create("refs/heads/main", main)
+    transaction.update("refs/heads/b", main, first)
+    transaction.create("refs/heads/c", first)
+    failures = await transaction.commit()
+
+    assert [failure.ref for failure in failures] == ["refs/heads/main", "refs/heads/b"]
+    assert "reference already exists" in failures[0].reason
+    assert get_refs(example_repo) == ["refs/heads/a", "refs/heads/c", "refs/heads/main"]
+
+
+@pytest.mark.asyncio
+async def test_delete_branches(example_repo: Path):
+    main = git(example_repo, "rev-parse", "main")
+    first = git(example_repo, "rev-parse", "main~1")
+    for branch in ("a", "b", "c"):
+        git(example_repo, "branch", branch, main)
+
+    failures = await delete_branches(example_repo, ["a", "b", "missing"], {"b": first})
+
+    assert [failure.ref for failure in failures] == ["refs/heads/b"]
+    assert get_refs(example_repo) == ["refs/heads/b", "refs/heads/c", "refs/heads/main"]
+
+
+@pytest.mark.asyncio
+async def test_partial_transaction_single_run(
+    example_repo: Path, monkeypatch: pytest.MonkeyPatch
+):
+    main = git(example_repo, "rev-parse", "main")
+    first = git(example_repo, "rev-parse", "main~1")
+    for index in range(20):
+        git(example_repo, "branch", f"stale-{index}", first if index % 5 == 0 else main)
+    runs = []
+    run = RefTransaction._run
+
+    async def record_run(self, operations):
+        runs.append(len(operations))
+        return await run(self, operations)
+
+    monkeypatch.setattr(RefTransaction, "_run", record_run)
+    transaction = RefTransaction(example_repo, atomic=False)
+    for index in range(20):
+        transaction.delete(f"refs/heads/stale-{index}", main)
+    failures = await transaction.commit()
+
+    # refs not at the expected value are skipped before running 'update-ref'
+    assert runs == [16]
+    assert [failure.ref for failure in failures] == [
+        f"refs/heads/stale-{index}" for index in range(0, 20, 5)
+    ]
+    assert get_refs(example_repo) == [
+        "refs/heads/main",
+        *(f"refs/heads/stale-{index}" for index in (0, 10, 15, 5)),
+    ]